@@ -0,0 +1,39 @@
+"""Time duplicating a large board.
+
+    python benchmarks/bench_cloning.py --cards 20000
+
+Duplicates board 1, which holds ``--cards`` cards in ``--columns``
+columns, through the duplicate route, with and without its cards.
+"""
+import argparse
+import os
+import tempfile
+
+from common import make_app, create_schema, build_dataset, login, measure, format_row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cards', type=int, default=20_000)
+    parser.add_argument('--columns', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        app = make_app(db_path)
+        create_schema(app)
+        total = build_dataset(db_path, users=1, boards=1, columns=args.columns, cards=args.cards)
+        print(f'{total} cards in {args.columns} columns\n')
+
+        client = app.test_client()
+        login(client)
+        json = {'Accept': 'application/json'}
+        for label, data in (('with cards', {'title': 'Copy', 'include_cards': 'y'}),
+                            ('columns only', {'title': 'Copy'})):
+            stats = measure(lambda: client.post('/board/1/duplicate', data=data, headers=json), args.repeat)
+            print(format_row(f'duplicate, {label}', stats))
+
+
+if __name__ == '__main__':
+    main()
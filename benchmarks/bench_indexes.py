@@ -0,0 +1,106 @@
+"""Board render and card move latency with and without the hot-path indexes.
+
+    python benchmarks/bench_indexes.py --cards 1000000
+
+Builds a database with the requested number of cards spread over many
+boards, then times rendering one board and moving cards on it, first with
+the indexes from models.py dropped and then with them in place. The cards
+of the sampled board are put back where they were before each pass, so
+both passes measure the same data.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+
+from common import make_app, create_schema, build_dataset, login, measure, format_row
+
+INDEXES = {
+    'ix_board_user_id': 'CREATE INDEX ix_board_user_id ON board (user_id)',
+    'ix_board_shares_board_id': 'CREATE INDEX ix_board_shares_board_id ON board_shares (board_id)',
+    'ix_column_board_position': 'CREATE INDEX ix_column_board_position ON "column" (board_id, position)',
+    'ix_card_column_position': 'CREATE INDEX ix_card_column_position ON card (column_id, position)',
+}
+
+
+def set_indexes(db_path, enabled):
+    conn = sqlite3.connect(db_path)
+    for name, ddl in INDEXES.items():
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+        if enabled:
+            conn.execute(ddl)
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+
+
+def snapshot_cards(db_path, board_id):
+    """Column and position of every card on ``board_id``."""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('SELECT card.id, card.column_id, card.position FROM card '
+                        'JOIN "column" ON "column".id = card.column_id WHERE "column".board_id = ?',
+                        (board_id,)).fetchall()
+    conn.close()
+    return rows
+
+
+def restore_cards(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    conn.executemany('UPDATE card SET column_id = ?, position = ? WHERE id = ?',
+                     [(column_id, position, card_id) for card_id, column_id, position in rows])
+    conn.commit()
+    conn.close()
+
+
+def run(app, board_id, repeat):
+    client = app.test_client()
+    login(client)
+    with app.app_context():
+        from app.models import Card, Column
+        columns = Column.query.filter_by(board_id=board_id).order_by(Column.position).all()
+        card_ids = [card.id for card in Card.query.filter_by(column_id=columns[0].id).limit(repeat).all()]
+    targets = iter(range(10 ** 9))
+
+    def render():
+        assert client.get(f'/board/{board_id}').status_code == 200
+
+    def move():
+        step = next(targets)
+        card_id = card_ids[step % len(card_ids)]
+        column = columns[step % len(columns)]
+        response = client.post(f'/card/{card_id}/move', json={'columnId': column.id, 'position': step % 7})
+        assert response.status_code == 200
+
+    return measure(render, repeat), measure(move, repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cards', type=int, default=1_000_000)
+    parser.add_argument('--boards', type=int, default=2000)
+    parser.add_argument('--columns', type=int, default=10, help='columns per board')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    if args.cards < args.boards * args.columns:
+        parser.error(f'--cards must be at least --boards x --columns ({args.boards * args.columns}), '
+                     'so that every column has a card to move')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        app = make_app(db_path)
+        create_schema(app)
+        total = build_dataset(db_path, boards=args.boards, columns=args.columns, cards=args.cards)
+        print(f'{total} cards on {args.boards} boards of {args.columns} columns\n')
+        board_id = max(args.boards // 2, 1)
+        cards = snapshot_cards(db_path, board_id)
+
+        for label, enabled in (('without indexes', False), ('with indexes', True)):
+            restore_cards(db_path, cards)
+            set_indexes(db_path, enabled)
+            render, move = run(app, board_id=board_id, repeat=args.repeat)
+            print(format_row(f'board render, {label}', render))
+            print(format_row(f'card move, {label}', move))
+
+
+if __name__ == '__main__':
+    main()
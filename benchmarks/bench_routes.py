@@ -0,0 +1,282 @@
+"""Time the key routes against a synthetic large tenant.
+
+    python benchmarks/bench_routes.py --users 50 --boards 200 --cards-per-column 100
+    python benchmarks/bench_routes.py --gunicorn --workers 4 --threads 8 --json after.json --compare before.json
+
+Builds a database of ``--users`` users owning ``--boards`` boards between
+them, each board shared with ``--shares`` other users and holding
+``--columns`` columns of ``--cards-per-column`` cards. Then, as the owner
+of board 1, it times each route ``--repeat`` times after ``--warmup``
+untimed calls:
+
+    board      render board 1
+    boards     the boards dashboard
+    move_card  move a card of board 1 to another column
+    new_card   add a card to board 1
+    share      share board 1 with a user (unshared again between calls)
+    login      log in from a fresh session
+    delete     delete a copy of board 1 (copied between calls)
+
+Requests go through the Flask test client, or with ``--gunicorn`` over
+HTTP to a gunicorn started on the same database; jobs then run in the
+background, so ``delete`` covers handing the deletion to a job. Reports
+latency percentiles in ms, and ``--json`` writes them with the scale,
+commit and versions, so that runs on two commits can be set side by side
+with ``--compare``.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+
+from common import PASSWORD, make_app, create_schema, build_dataset, measure, format_row
+
+ROUTES = ('board', 'boards', 'move_card', 'new_card', 'share', 'login', 'delete')
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+
+_CSRF = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+class TestClientSession:
+    """A logged-out user of the app, through the Flask test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, json=None, headers=None):
+        response = self.client.open(path, method=method, data=data, json=json, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """A logged-out user of a live server, with a cookie jar.
+
+    Forms are sent with the session's CSRF token, read from the login page.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+        _, body = self.request('GET', '/login')
+        self.csrf_token = _CSRF.search(body.decode()).group(1)
+
+    def request(self, method, path, data=None, json=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if json is not None:
+            body = _dumps(json)
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            body = urllib.parse.urlencode(dict(data, csrf_token=self.csrf_token)).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+
+def _dumps(value):
+    return json.dumps(value).encode()
+
+
+def start_gunicorn(db_path, port, workers, threads):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.abspath(db_path)}', BOARD_CACHE_MAX_BYTES='0')
+    env.pop('BOARD_CACHE_DIR', None)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+         '--worker-class', 'gthread', '--threads', str(threads), '--log-level', 'warning', 'run:app'],
+        cwd=SRC, env=env
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/login').close()
+            return server, base_url
+        except OSError:
+            if server.poll() is not None:
+                raise SystemExit('gunicorn exited during startup')
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit('gunicorn did not start within 30 seconds')
+
+
+def expect(result, *statuses):
+    status, body = result
+    assert status in statuses, f'unexpected status {status}: {body[:200]!r}'
+    return body
+
+
+def scenarios(new_session, columns, cards_per_column, users):
+    """Return ``{route: (fn, setup)}`` for ``measure``."""
+    owner = new_session()
+    expect(owner.request('POST', '/login', data={'email': 'user1@example.com', 'password': PASSWORD}), 302)
+    as_json = {'Accept': 'application/json'}
+    # Board 1 has columns 1..columns, and its first column cards 1..cards_per_column
+    movable = range(1, min(cards_per_column, 100) + 1)
+    steps = iter(range(10 ** 9))
+
+    def move_card():
+        step = next(steps)
+        card_id = movable[step % len(movable)]
+        column_id = step % columns + 1
+        expect(owner.request('POST', f'/card/{card_id}/move', json={'columnId': column_id, 'position': step % 7}),
+               200)
+
+    def new_card():
+        expect(owner.request('POST', '/column/1/card/new', data={'title': f'Card {next(steps)}'},
+                             headers=as_json), 200, 201)
+
+    def unshare():
+        expect(owner.request('POST', '/board/1/user/2/remove', data={}), 302)
+
+    def share(_):
+        expect(owner.request('POST', '/board/1/share',
+                             data={'user_email': 'user2@example.com', 'permission': 'view'}), 302)
+
+    def login(session):
+        expect(session.request('POST', '/login', data={'email': 'user1@example.com', 'password': PASSWORD}), 302)
+
+    def copy_board():
+        body = expect(owner.request('POST', '/board/1/duplicate', data={'title': 'Copy', 'include_cards': 'y'},
+                                    headers=as_json), 201)
+        return json.loads(body)['board']['id']
+
+    def delete(board_id):
+        expect(owner.request('POST', f'/board/{board_id}/delete', data={}, headers=as_json), 200, 202)
+
+    routes = {
+        'board': (lambda: expect(owner.request('GET', '/board/1'), 200), None),
+        'boards': (lambda: expect(owner.request('GET', '/boards'), 200), None),
+        'move_card': (move_card, None),
+        'new_card': (new_card, None),
+        'share': (share, unshare),
+        'login': (login, new_session),
+        'delete': (delete, copy_board),
+    }
+    if users < 2:
+        del routes['share']
+    return routes
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, scale, path):
+    with open(path) as f:
+        base = json.load(f)
+    print(f"\nAgainst {path} ({base['meta'].get('commit') or 'unknown commit'})", file=sys.stderr)
+    if base['meta']['scale'] != scale:
+        print(f"Warning: that run used a different scale, {base['meta']['scale']}", file=sys.stderr)
+    for route, stats in results.items():
+        before = base['routes'].get(route)
+        if before is None:
+            continue
+        changes = '   '.join(f"{key} {(stats[key] - before[key]) / before[key] * 100:+7.1f}%"
+                             for key in ('p50', 'p95', 'p99'))
+        print(f'{route:<32} {changes}', file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--boards', type=int, default=200)
+    parser.add_argument('--shares', type=int, default=3, help='users each board is shared with')
+    parser.add_argument('--columns', type=int, default=8, help='columns per board')
+    parser.add_argument('--cards-per-column', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--routes', nargs='+', choices=ROUTES, default=ROUTES)
+    parser.add_argument('--gunicorn', action='store_true', help='time a local gunicorn over HTTP')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', metavar='PATH', help="write the results as JSON, '-' for stdout")
+    parser.add_argument('--compare', metavar='PATH', help='JSON results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    scale = {key: getattr(args, key) for key in ('users', 'boards', 'shares', 'columns', 'cards_per_column', 'seed')}
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        # Jobs run inside the request under the test client, so that a
+        # delete is timed to the end rather than racing the next call
+        app = make_app(db_path, JOBS_INLINE=not args.gunicorn)
+        create_schema(app)
+        total = build_dataset(db_path, users=args.users, boards=args.boards, columns=args.columns,
+                              cards=args.boards * args.columns * args.cards_per_column, shares=args.shares,
+                              seed=args.seed)
+        print(f'{args.users} users, {args.boards} boards, {total} cards'
+              f" via {'gunicorn' if args.gunicorn else 'the test client'}\n", file=sys.stderr)
+        try:
+            if args.gunicorn:
+                server, base_url = start_gunicorn(db_path, args.port, args.workers, args.threads)
+                new_session = lambda: HttpSession(base_url)
+            else:
+                new_session = lambda: TestClientSession(app)
+
+            routes = scenarios(new_session, args.columns, args.cards_per_column, args.users)
+            results = {}
+            for route in args.routes:
+                if route not in routes:
+                    continue
+                fn, setup = routes[route]
+                measure(fn, args.warmup, setup)
+                results[route] = measure(fn, args.repeat, setup)
+                print(format_row(route, results[route]), file=sys.stderr)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'server': f'gunicorn {args.workers}x{args.threads}' if args.gunicorn else 'test client',
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'scale': scale,
+            'cards': total,
+            'repeat': args.repeat,
+        },
+        'routes': results,
+    }
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, scale, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Search latency on a large database.
+
+    python benchmarks/bench_search.py --cards 1000000
+
+Times the search endpoint for a user who owns a handful of the boards, for
+a word on a single card, a word (and its prefix) on one card in a thousand,
+and a word on every card in the database.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+
+from common import make_app, create_schema, build_dataset, login, measure, format_row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cards', type=int, default=1_000_000)
+    parser.add_argument('--boards', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--columns', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        app = make_app(db_path)
+        create_schema(app)
+        total = build_dataset(db_path, users=args.users, boards=args.boards, columns=args.columns,
+                              cards=args.cards)
+        print(f'{total} cards on {args.boards} boards of {args.users} users\n')
+
+        # A rare word on one card of user 1, and a less rare one on a card
+        # in every thousand
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE card SET title = 'Find the needle' WHERE id = 1")
+        conn.execute("UPDATE card SET description = 'urgent' WHERE id % 1000 = 0")
+        conn.commit()
+        conn.close()
+
+        client = app.test_client()
+        login(client)
+        json = {'Accept': 'application/json'}
+        for label, query in (('single card', 'needle'), ('one in a thousand', 'urgent'),
+                             ('prefix', 'urg'), ('every card', 'card')):
+            stats = measure(lambda: client.get('/search', query_string={'q': query}, headers=json),
+                            args.repeat)
+            print(format_row(f'search, {label}', stats))
+
+
+if __name__ == '__main__':
+    main()
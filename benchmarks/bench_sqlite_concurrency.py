@@ -0,0 +1,103 @@
+"""Card move throughput under concurrent workers, per SQLite profile.
+
+    python benchmarks/bench_sqlite_concurrency.py --workers 4 --threads 8
+
+Starts ``--workers`` processes with ``--threads`` threads each, like the
+gunicorn deployment, all moving cards on shared boards and re-reading them
+for ``--seconds``. Reports successful moves per second and the moves that
+failed with "database is locked", once for each profile.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from common import make_app, create_schema, build_dataset, login
+
+
+def worker(db_path, profile, worker_id, threads, seconds, boards, columns, results):
+    app = make_app(db_path, SQLITE_PROFILE=profile)
+    counts = {'moves': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def run(thread_id):
+        client = app.test_client()
+        login(client)
+        board_id = (worker_id * threads + thread_id) % boards + 1
+        first_column = (board_id - 1) * columns + 1
+        step = 0
+        moves = locked = 0
+        while time.monotonic() < deadline:
+            step += 1
+            try:
+                # The dataset puts ten cards in each column, in id order
+                card_id = (first_column - 1) * 10 + 1 + step % 10
+                response = client.post(f'/card/{card_id}/move', json={
+                    'columnId': first_column + step % columns, 'position': step % 5
+                })
+                client.get(f'/board/{board_id}')
+                if response.status_code == 200:
+                    moves += 1
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                locked += 1
+        with lock:
+            counts['moves'] += moves
+            counts['locked'] += locked
+
+    pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(counts)
+
+
+def measure(profile, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        create_schema(make_app(db_path))
+        build_dataset(db_path, boards=args.boards, columns=args.columns,
+                      cards=args.boards * args.columns * 10)
+
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        processes = [
+            ctx.Process(target=worker, args=(db_path, profile, i, args.threads, args.seconds,
+                                             args.boards, args.columns, results))
+            for i in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    moves = sum(total['moves'] for total in totals)
+    locked = sum(total['locked'] for total in totals)
+    print(f'{profile:<12} {moves / args.seconds:9.1f} moves/s   {locked:6d} locked')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--boards', type=int, default=8)
+    parser.add_argument('--columns', type=int, default=4)
+    parser.add_argument('--profile', action='append', choices=['default', 'production'],
+                        help='profile to measure, may be repeated (default: both)')
+    args = parser.parse_args()
+
+    for profile in args.profile or ['default', 'production']:
+        measure(profile, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Helpers shared by the benchmark scripts.
+
+The benchmarks build a SQLite database on disk, point a Flask app at it and
+time requests through the test client, so they need nothing but the app's
+own requirements.
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from app import create_app, db
+from app.seed import seed_database
+from config import Config
+
+PASSWORD = 'benchmark'
+
+
+def make_config(db_path, **overrides):
+    """Return a Config subclass pointed at ``db_path``, with caches off."""
+    attrs = {
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(db_path)}',
+        # Measure the database, not the fragment cache
+        'BOARD_CACHE_MAX_BYTES': 0,
+        'BOARD_CACHE_DIR': None,
+    }
+    attrs.update(overrides)
+    return type('BenchmarkConfig', (Config,), attrs)
+
+
+def make_app(db_path, **overrides):
+    return create_app(make_config(db_path, **overrides))
+
+
+def create_schema(app):
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+
+
+def build_dataset(db_path, users=1, boards=1, columns=10, cards=1000, shares=0, seed=0):
+    """Fill an empty schema with synthetic data through ``flask seed``.
+
+    ``cards`` is the total number of cards, spread evenly over every column
+    of every board. Each board is shared with the ``shares`` users after
+    its owner. Board, column and card ids start at 1 and follow each other,
+    so board 1 of user 1 is always present, its columns are 1 to
+    ``columns`` and the cards of each column have consecutive ids. Returns
+    the number of cards written.
+    """
+    per_column = max(cards // (boards * columns), 1)
+    app = make_app(db_path)
+    with app.app_context():
+        counts = seed_database(users, boards, shares, columns, per_column, seed, PASSWORD)
+        db.engine.dispose()
+    return counts['cards']
+
+
+def login(client, user_id=1):
+    response = client.post('/login', data={'email': f'user{user_id}@example.com', 'password': PASSWORD})
+    assert response.status_code == 302, 'benchmark login failed'
+
+
+def percentile(timings, fraction):
+    """Nearest-rank percentile of sorted ``timings``."""
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def measure(fn, repeat, setup=None):
+    """Call ``fn`` ``repeat`` times and return latency percentiles in ms.
+
+    ``setup``, if given, runs untimed before each call and its result is
+    passed to ``fn``.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = (setup(),) if setup is not None else ()
+        start = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'n': len(timings),
+        'mean': statistics.fmean(timings),
+        'p50': statistics.median(timings),
+        'p90': percentile(timings, 0.90),
+        'p95': percentile(timings, 0.95),
+        'p99': percentile(timings, 0.99),
+        'max': timings[-1],
+    }
+
+
+def format_row(label, stats):
+    return (f"{label:<32} p50 {stats['p50']:9.2f} ms   p95 {stats['p95']:9.2f} ms   "
+            f"p99 {stats['p99']:9.2f} ms   max {stats['max']:9.2f} ms")
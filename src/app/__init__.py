@@ -12,7 +12,10 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    from app import sqlite
+    sqlite.configure_engine(app)
     db.init_app(app)
+    sqlite.init_app(app)
     login_manager.init_app(app)
 
     from app.routes import main, auth, kanban
@@ -20,8 +23,23 @@ def create_app(config_class=Config):
     app.register_blueprint(auth)
     app.register_blueprint(kanban)
 
-    with app.app_context():
-        db.create_all()
+    from app import access, archive, assets, cache, events, jobs, metrics, migrations, passwords, ranking, seed, transfer, user_cache
+    access.init_app(app)
+    archive.init_app(app)
+    assets.init_app(app)
+    cache.init_app(app)
+    events.init_app(app)
+    jobs.init_app(app)
+    metrics.init_app(app)
+    migrations.init_app(app)
+    passwords.init_app(app)
+    ranking.init_app(app)
+    seed.init_app(app)
+    transfer.init_app(app)
+    user_cache.init_app(app)
+
+    # The schema is created and upgraded by `flask db upgrade`, not on
+    # every worker boot
 
     return app
 
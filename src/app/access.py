@@ -0,0 +1,53 @@
+from flask import g
+from flask_login import current_user
+from app import db
+from app.models import board_shares
+
+
+class AccessResolver:
+    """Answers board permission questions for a single user.
+
+    All of the user's share rows are loaded with one query the first time a
+    non-owned board is checked and kept for the rest of the request, so any
+    number of checks costs at most one round trip.
+    """
+
+    def __init__(self, user):
+        self.user_id = user.id
+        self._shares = None
+
+    @property
+    def shares(self):
+        """Map of board id to can_edit for every board shared with the user."""
+        if self._shares is None:
+            rows = db.session.execute(
+                db.select(board_shares.c.board_id, board_shares.c.can_edit)
+                .where(board_shares.c.user_id == self.user_id)
+            )
+            self._shares = {board_id: bool(can_edit) for board_id, can_edit in rows}
+        return self._shares
+
+    def is_owner(self, board):
+        return board.user_id == self.user_id
+
+    def can_view(self, board):
+        return self.is_owner(board) or board.id in self.shares
+
+    def can_edit(self, board):
+        return self.is_owner(board) or self.shares.get(board.id, False)
+
+
+def get_access():
+    """Return the AccessResolver for current_user, built once per request."""
+    resolver = g.get('access')
+    if resolver is None or resolver.user_id != current_user.id:
+        resolver = g.access = AccessResolver(current_user)
+    return resolver
+
+
+def _reset_access():
+    g.pop('access', None)
+
+
+def init_app(app):
+    app.before_request(_reset_access)
@@ -0,0 +1,142 @@
+"""Card archive.
+
+Finished cards otherwise stay in ``card`` forever, and every board render,
+``max(position)`` lookup and search pays for them. Archiving moves cards
+to the ``card_archive`` table, which has its own index by column and
+archive time and its own search index, so they stay searchable and can be
+restored while the hot table only holds what is on the boards.
+
+A move is two set-based statements in the caller's transaction, an
+``INSERT ... SELECT`` into the archive and a ``DELETE ... RETURNING`` from
+``card``, whether it covers one card or a hundred thousand. Each board
+that lost cards gets a version bump and one ``cards_archived`` event.
+
+Cards can be archived one at a time, a column at a time, or by policy:
+cards that have been in a column titled one of ``ARCHIVE_COLUMNS`` for
+more than ``ARCHIVE_AFTER_DAYS`` days, going by ``Card.moved_at``.
+``flask archive-cards`` applies the policy to every board, committing
+board by board, and is meant to be run from cron. A restored card goes
+back to its column at its old position, with a new id.
+"""
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from app import db, events, jobs
+from app.models import Board, Column, Card, ArchivedCard
+
+_FIELDS = ('title', 'description', 'position', 'created_at', 'moved_at', 'column_id')
+
+# Bounds of an age in days; anything older than MAX_DAYS is as good as never
+MIN_DAYS = 1
+MAX_DAYS = 36500
+
+
+def archive_where(*conditions):
+    """Move the cards matching ``conditions`` into the archive.
+
+    The conditions may only refer to the card table. Returns
+    ``{board_id: [card ids]}`` for the cards moved. The caller commits.
+    """
+    db.session.execute(
+        db.insert(ArchivedCard).from_select(
+            [*_FIELDS, 'archived_at'],
+            db.select(*(getattr(Card, field) for field in _FIELDS), db.literal(datetime.utcnow()))
+            .where(*conditions)
+        )
+    )
+    moved = db.session.execute(
+        db.delete(Card).where(*conditions).returning(Card.id, Card.column_id)
+        # Drops the moved cards from the session; the ids come back with RETURNING anyway
+        .execution_options(synchronize_session='fetch')
+    ).all()
+    if not moved:
+        return {}
+
+    boards = dict(db.session.execute(
+        db.select(Column.id, Column.board_id).where(Column.id.in_({row.column_id for row in moved}))
+    ).all())
+    archived = {}
+    for row in moved:
+        archived.setdefault(boards[row.column_id], []).append(row.id)
+    for board_id, card_ids in archived.items():
+        version = Board.bump_version(board_id)
+        events.publish(board_id, version, 'cards_archived', cardIds=card_ids)
+    return archived
+
+
+def archive_column(column_id, older_than=None):
+    """Archive the cards of a column, or those in it for longer than ``older_than``."""
+    conditions = [Card.column_id == column_id]
+    if older_than is not None:
+        conditions.append(Card.moved_at < datetime.utcnow() - older_than)
+    return archive_where(*conditions)
+
+
+def _policy_columns(column_titles=None):
+    if column_titles is None:
+        column_titles = current_app.config['ARCHIVE_COLUMNS']
+    return db.func.lower(Column.title).in_([title.lower() for title in column_titles])
+
+
+def archive_stale(days=None, column_titles=None, board_id=None):
+    """Apply the archive policy, to one board or to all of them.
+
+    Defaults to ``ARCHIVE_AFTER_DAYS`` and ``ARCHIVE_COLUMNS``; column
+    titles match regardless of case.
+    """
+    if days is None:
+        days = current_app.config['ARCHIVE_AFTER_DAYS']
+    columns = db.select(Column.id).where(_policy_columns(column_titles))
+    if board_id is not None:
+        columns = columns.where(Column.board_id == board_id)
+    return archive_where(
+        Card.column_id.in_(columns),
+        Card.moved_at < datetime.utcnow() - timedelta(days=days)
+    )
+
+
+def restore(archived):
+    """Put an archived card back in its column and return the new card.
+
+    The caller commits.
+    """
+    card = Card(**{field: getattr(archived, field) for field in _FIELDS})
+    # Back on the board now; the policy should not take it again at once
+    card.moved_at = datetime.utcnow()
+    db.session.add(card)
+    db.session.delete(archived)
+    db.session.flush()
+    board_id = db.session.execute(db.select(Column.board_id).where(Column.id == card.column_id)).scalar()
+    version = Board.bump_version(board_id)
+    events.publish(board_id, version, 'card_created', card=card.to_dict())
+    return card
+
+
+@jobs.handler('archive_stale')
+def archive_stale_job(progress, board_id, days):
+    archived = archive_stale(days, board_id=board_id)
+    db.session.commit()
+    return {'boardId': board_id, 'cards': sum(len(card_ids) for card_ids in archived.values())}
+
+
+@click.command('archive-cards')
+@click.option('--days', type=click.IntRange(MIN_DAYS, MAX_DAYS), help='Archive cards older than this. Default: ARCHIVE_AFTER_DAYS.')
+@click.option('--column', 'column_titles', multiple=True, help='Column title to archive from; repeatable. '
+              'Default: ARCHIVE_COLUMNS.')
+def archive_cards_command(days, column_titles):
+    """Archive cards that have been done for a while, board by board."""
+    column_titles = column_titles or None
+    board_ids = db.session.execute(
+        db.select(Column.board_id).where(_policy_columns(column_titles)).distinct().order_by(Column.board_id)
+    ).scalars().all()
+    total = 0
+    for board_id in board_ids:
+        archived = archive_stale(days, column_titles, board_id)
+        # One short transaction per board keeps the write lock free for requests
+        db.session.commit()
+        total += sum(len(card_ids) for card_ids in archived.values())
+    click.echo(f'Archived {total} cards.')
+
+
+def init_app(app):
+    app.cli.add_command(archive_cards_command)
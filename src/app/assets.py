@@ -0,0 +1,291 @@
+"""Self-hosted, fingerprinted and precompressed static assets.
+
+``flask assets build`` first vendors the third-party CSS and JavaScript
+listed in ``VENDOR`` into ``static/vendor``, along with the fonts their
+stylesheets load, so that pages never wait on a CDN. Files already there
+are kept, and ``--offline`` builds from a copied ``static/vendor`` without
+touching the network; either way the build fails if a vendored file is
+missing. It then copies every static file to ``static/dist`` under a name
+holding a hash of its content, with ``.gz`` and, when the optional
+``brotli`` package is installed, ``.br`` variants of the files that
+compress, and writes ``static/dist/manifest.json`` mapping each file to
+its copy. Stylesheet ``url()`` references are rewritten to the
+fingerprinted names before the stylesheet itself is hashed.
+
+At startup the manifest is read and ``url_for('static', ...)`` returns
+the fingerprinted copy of any file it lists, except in debug mode where
+files are edited in place. A fingerprinted name only ever has one
+content, so those are served with a far-future ``immutable`` cache
+header, precompressed in the best encoding the client accepts. Files
+from an earlier build are left in place, so pages rendered just before
+a deploy still load their assets.
+
+Templates link vendored files with ``vendor_url``, which falls back to the
+CDN in a checkout where the build has not been run.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import urllib.parse
+import urllib.request
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:  # Optional: only .gz variants are written without it
+    brotli = None
+
+# Vendored files under static/, and where they are fetched from
+VENDOR = {
+    'vendor/bootstrap/css/bootstrap.min.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/js/bootstrap.bundle.min.js':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/js/bootstrap.bundle.min.js',
+    'vendor/fontawesome/css/all.min.css':
+        'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
+}
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+# Encodings in order of preference, with the suffix of their variant
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Types worth precompressing; fonts like woff2 and images are compressed already
+_COMPRESSIBLE = re.compile(r'^(text/|application/(javascript|json|xml)|image/svg|font/(ttf|otf)|'
+                           r'application/vnd\.ms-fontobject)')
+_MIN_COMPRESS_BYTES = 256
+
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+_FETCH_TIMEOUT = 30
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _local_path(target):
+    """``target`` of a stylesheet ``url()`` without query or fragment, if relative."""
+    if not re.match(r'^([a-z][a-z0-9+.-]*:|//|#|/)', target, re.IGNORECASE):
+        return re.split(r'[?#]', target, maxsplit=1)[0]
+    return None
+
+
+def _local_references(css):
+    for match in _CSS_URL.finditer(css):
+        path = _local_path(match.group(2).strip())
+        if path:
+            yield path
+
+
+def _fetch(url):
+    with urllib.request.urlopen(url, timeout=_FETCH_TIMEOUT) as response:
+        return response.read()
+
+
+def vendor(static_folder, fetch=None, echo=lambda message: None, offline=False):
+    """Download the ``VENDOR`` files that are not in ``static_folder`` yet.
+
+    Fonts and images referenced by a vendored stylesheet are fetched next
+    to it, at the same relative path as on the CDN. With ``offline`` nothing
+    is fetched and the files are only checked. Returns the names of the
+    files that are still missing.
+    """
+    fetch = fetch or _fetch
+    missing = []
+    for name, url in VENDOR.items():
+        queue = [(name, url)]
+        while queue:
+            file_name, file_url = queue.pop()
+            path = os.path.join(static_folder, *file_name.split('/'))
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    data = f.read()
+            elif offline:
+                missing.append(file_name)
+                continue
+            else:
+                try:
+                    data = fetch(file_url)
+                except OSError as error:
+                    echo(f'Could not fetch {file_url}: {error}')
+                    missing.append(file_name)
+                    continue
+                _write(path, data)
+                echo(f'Vendored {file_name}')
+            if file_name.endswith('.css'):
+                for target in _local_references(data.decode('utf-8')):
+                    queue.append((posixpath.normpath(posixpath.join(posixpath.dirname(file_name), target)),
+                                  urllib.parse.urljoin(file_url, target)))
+    return missing
+
+
+def fingerprinted_name(name, data):
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    stem, ext = posixpath.splitext(name)
+    return f'{stem}.{digest}{ext}'
+
+
+def _rewrite_css(name, css, manifest):
+    """Point the relative ``url()`` references of ``css`` at fingerprinted names."""
+    directory = posixpath.dirname(name)
+
+    def replace(match):
+        quote, target = match.group(1), match.group(2).strip()
+        path = _local_path(target)
+        hashed = manifest.get(posixpath.normpath(posixpath.join(directory, path))) if path else None
+        if hashed is None:
+            return match.group(0)
+        return f'url({quote}{posixpath.relpath(hashed, directory or ".")}{target[len(path):]}{quote})'
+
+    return _CSS_URL.sub(replace, css)
+
+
+def _compressed_variants(name, data):
+    mimetype = mimetypes.guess_type(name)[0] or ''
+    if len(data) < _MIN_COMPRESS_BYTES or not _COMPRESSIBLE.match(mimetype):
+        return
+    variants = [('.gz', gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            yield suffix, compressed
+
+
+def build(static_folder, echo=lambda message: None):
+    """Write fingerprinted, precompressed copies of the static files.
+
+    Returns the manifest, mapping each file to its copy under ``dist/``.
+    """
+    names = []
+    for root, dirs, files in os.walk(static_folder):
+        relative = os.path.relpath(root, static_folder).replace(os.sep, '/')
+        if relative == '.':
+            dirs[:] = [d for d in dirs if d != DIST]
+            relative = ''
+        dirs.sort()
+        names.extend(posixpath.join(relative, f) for f in sorted(files) if not f.endswith('.tmp'))
+
+    manifest = {}
+    # Stylesheets last, so the files they reference already have names
+    for name in sorted(names, key=lambda name: name.endswith('.css')):
+        with open(os.path.join(static_folder, *name.split('/')), 'rb') as f:
+            data = f.read()
+        if name.endswith('.css'):
+            data = _rewrite_css(name, data.decode('utf-8'), manifest).encode('utf-8')
+        hashed = fingerprinted_name(name, data)
+        path = os.path.join(static_folder, DIST, *hashed.split('/'))
+        if not os.path.exists(path):
+            _write(path, data)
+            for suffix, compressed in _compressed_variants(name, data):
+                _write(path + suffix, compressed)
+        manifest[name] = hashed
+    _write(os.path.join(static_folder, DIST, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    echo(f"Fingerprinted {len(manifest)} files{'' if brotli is not None else ' (gzip only, brotli is not installed)'}")
+    return manifest
+
+
+def load_manifest(app):
+    """Read the manifest of the last ``flask assets build``, if there is one."""
+    try:
+        with open(os.path.join(app.static_folder, DIST, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+    app.extensions['assets'] = manifest
+    return manifest
+
+
+def _fingerprint_url(endpoint, values):
+    if endpoint != 'static' or current_app.debug:
+        return
+    hashed = current_app.extensions['assets'].get(values.get('filename'))
+    if hashed is not None:
+        values['filename'] = f'{DIST}/{hashed}'
+
+
+def vendor_url(filename):
+    """URL of vendored ``filename``, or of its CDN original until it is vendored."""
+    if filename in current_app.extensions['assets'] or \
+            os.path.exists(os.path.join(current_app.static_folder, *filename.split('/'))):
+        return url_for('static', filename=filename)
+    return VENDOR[filename]
+
+
+def send_fingerprinted(filename):
+    """Serve a fingerprinted file, precompressed if the client accepts it."""
+    directory = os.path.join(current_app.static_folder, DIST)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if request.accept_encodings[name] and os.path.isfile(os.path.join(directory, filename + suffix)):
+            encoding = name
+            filename += suffix
+            break
+    response = send_from_directory(directory, filename, mimetype=mimetype)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['ASSETS_MAX_AGE']
+    response.cache_control.immutable = True
+    response.expires = None
+    return response
+
+
+assets_cli = AppGroup('assets', help='Build the static assets.')
+
+
+@assets_cli.command('vendor')
+@click.option('--offline', is_flag=True, help='Only check that every vendored file is present.')
+def vendor_command(offline):
+    """Download the third-party assets into static/vendor."""
+    _vendor_or_fail(offline)
+    click.echo('All vendored assets are present.')
+
+
+@assets_cli.command('build')
+@click.option('--offline', is_flag=True, help='Build from static/vendor as it is, without fetching.')
+def build_command(offline):
+    """Vendor, fingerprint and precompress the static files."""
+    _vendor_or_fail(offline)
+    build(current_app.static_folder, echo=click.echo)
+    load_manifest(current_app)
+
+
+def _vendor_or_fail(offline):
+    # A build that quietly fell back to the CDN would hang in an air-gapped
+    # deployment, so every vendored file must be there
+    missing = vendor(current_app.static_folder, echo=click.echo, offline=offline)
+    if missing:
+        for name in missing:
+            click.echo(f'Missing static/{name}', err=True)
+        hint = ('copy static/vendor from a machine where `flask assets vendor` has run' if offline
+                else 'run it where the CDNs are reachable, or copy static/vendor in and pass --offline')
+        raise click.ClickException(f'{len(missing)} vendored files are missing; {hint}.')
+
+
+def init_app(app):
+    load_manifest(app)
+    app.url_defaults(_fingerprint_url)
+    app.add_url_rule(f'{app.static_url_path}/{DIST}/<path:filename>', 'static_fingerprinted', send_fingerprinted)
+    app.jinja_env.globals['vendor_url'] = vendor_url
+    app.cli.add_command(assets_cli)
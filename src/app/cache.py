@@ -0,0 +1,172 @@
+"""Cache for the rendered body of a board page.
+
+Fragments are keyed on (board id, board version, can_edit). A mutation
+bumps the board version, so the next render simply misses and the stale
+entries for that board are dropped when the new one is stored.
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from flask import current_app
+
+
+class MemoryBackend:
+    """Per-process LRU bounded by the total size of the stored fragments."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+
+    @property
+    def size(self):
+        return self._size
+
+
+class FileSystemBackend:
+    """Stores fragments as files in a directory shared by all workers.
+
+    Files are written to a temporary name and renamed into place, so readers
+    in other processes never see a partial fragment. When the directory
+    grows past ``max_bytes`` the least recently written files are removed.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.html')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._prune()
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self, prefix):
+        return [name[:-len('.html')] for name in os.listdir(self.directory)
+                if name.startswith(prefix) and name.endswith('.html')]
+
+    def _prune(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.html'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class BoardFragmentCache:
+    """Two level fragment cache: the in-process LRU in front of an
+    optional filesystem backend shared between worker processes."""
+
+    def __init__(self, max_bytes, directory=None):
+        self.memory = MemoryBackend(max_bytes)
+        self.shared = FileSystemBackend(directory, max_bytes) if directory else None
+        self._keys_by_board = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(board_id, version, can_edit):
+        return f"board-{board_id}-v{version}-{'edit' if can_edit else 'view'}"
+
+    def get(self, board_id, version, can_edit):
+        key = self.key(board_id, version, can_edit)
+        value = self.memory.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, board_id, version, can_edit, value):
+        key = self.key(board_id, version, can_edit)
+        self.memory.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+        self._drop_older_versions(board_id, version)
+
+    def _drop_older_versions(self, board_id, version):
+        current = (self.key(board_id, version, True), self.key(board_id, version, False))
+        with self._lock:
+            stale = [key for key in self._keys_by_board.get(board_id, ()) if key not in current]
+            self._keys_by_board[board_id] = set(current)
+        for key in stale:
+            self.memory.delete(key)
+        if self.shared is not None:
+            for key in self.shared.keys(f'board-{board_id}-v'):
+                if key not in current:
+                    self.shared.delete(key)
+
+
+def get_board_cache():
+    """Return the fragment cache of the current app."""
+    return current_app.extensions['board_cache']
+
+
+def init_app(app):
+    app.extensions['board_cache'] = BoardFragmentCache(
+        app.config['BOARD_CACHE_MAX_BYTES'],
+        app.config['BOARD_CACHE_DIR']
+    )
@@ -0,0 +1,114 @@
+"""The boards dashboard: every board a user can open, with its contents summarised.
+
+One statement pages through the owned and shared boards in the requested
+order, then counts the columns and cards of just that page and joins in
+the owner, so a user with hundreds of boards costs the same per page as a
+user with three.
+
+Pages are keyset based: the cursor is the sort value and id of the last
+board shown, so later pages do not re-read earlier ones.
+"""
+import base64
+import json
+from datetime import datetime
+from app import db
+from app.models import User, Board, Column, Card, board_shares
+
+# Sort options: (column, descending)
+SORTS = {
+    'updated': (Board.updated_at, True),
+    'title': (Board.title, False),
+}
+
+FILTERS = ('all', 'owned', 'shared')
+
+
+class DashboardBoard:
+    """A row of the dashboard."""
+
+    def __init__(self, row):
+        self.id = row.id
+        self.title = row.title
+        self.updated_at = row.updated_at
+        self.is_template = row.is_template
+        self.owner = row.owner
+        self.is_owner = not row.shared
+        self.can_edit = bool(row.can_edit)
+        self.column_count = row.column_count
+        self.card_count = row.card_count
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'updatedAt': self.updated_at.isoformat(),
+            'isTemplate': self.is_template,
+            'owner': self.owner,
+            'isOwner': self.is_owner,
+            'canEdit': self.can_edit,
+            'columnCount': self.column_count,
+            'cardCount': self.card_count
+        }
+
+
+def encode_cursor(sort, board):
+    value = board.updated_at.isoformat() if sort == 'updated' else board.title
+    raw = json.dumps([value, board.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(sort, cursor):
+    """Return the ``(sort value, id)`` in ``cursor``, or None if it is not valid."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, board_id = json.loads(raw)
+        if sort == 'updated':
+            value = datetime.fromisoformat(value)
+        elif not isinstance(value, str):
+            return None
+        return value, int(board_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def dashboard(user_id, sort='updated', show='all', after=None, limit=30):
+    """Return one page of the boards ``user_id`` can open.
+
+    Returns ``(boards, has_more)`` where ``boards`` is a list of
+    :class:`DashboardBoard`. ``after`` is a decoded cursor.
+    """
+    column, descending = SORTS[sort]
+
+    owned = db.select(
+        Board.id.label('board_id'), db.true().label('can_edit'), db.false().label('shared')
+    ).where(Board.user_id == user_id)
+    shared = db.select(
+        board_shares.c.board_id, board_shares.c.can_edit, db.true().label('shared')
+    ).where(board_shares.c.user_id == user_id)
+    parts = {'all': (owned, shared), 'owned': (owned,), 'shared': (shared,)}[show]
+    accessible = (db.union_all(*parts) if len(parts) > 1 else parts[0]).cte('accessible')
+
+    key = db.tuple_(column, Board.id)
+    page = db.select(
+        Board.id, Board.title, Board.updated_at, Board.is_template, Board.user_id, accessible.c.can_edit, accessible.c.shared
+    ).join(accessible, accessible.c.board_id == Board.id)
+    if after is not None:
+        page = page.where(key < db.tuple_(*after) if descending else key > db.tuple_(*after))
+    order = (column.desc(), Board.id.desc()) if descending else (column, Board.id)
+    page = page.order_by(*order).limit(limit + 1).cte('page')
+
+    page_order = (page.c[column.key].desc(), page.c.id.desc()) if descending else (page.c[column.key], page.c.id)
+    rows = db.session.execute(
+        db.select(
+            page,
+            User.username.label('owner'),
+            db.func.count(db.distinct(Column.id)).label('column_count'),
+            db.func.count(Card.id).label('card_count')
+        )
+        .join(User, User.id == page.c.user_id)
+        .outerjoin(Column, Column.board_id == page.c.id)
+        .outerjoin(Card, Card.column_id == Column.id)
+        .group_by(page.c.id)
+        .order_by(*page_order)
+    ).all()
+    return [DashboardBoard(row) for row in rows[:limit]], len(rows) > limit
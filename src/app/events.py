@@ -0,0 +1,131 @@
+"""Per-board change feed.
+
+Routes that change a board record compact events in the ``board_event``
+table, in the same transaction as the change itself. Open board pages
+follow the feed through Server-Sent Events, or by long polling, and
+apply the events to the DOM. Going through the database means an event
+written by one gunicorn worker is seen by clients connected to any other.
+
+The board version doubles as the feed cursor. Every version bump records
+at least one event, so a client that has seen version ``v`` is up to
+date once it receives every event with a version above ``v``. If the
+oldest such event has since been pruned, the client is told to resync.
+
+A stream or long poll holds a worker thread for as long as it is open,
+so each worker lets at most ``EVENT_MAX_WAITERS`` of them wait at once.
+Past that a stream is refused with a 503 and a long poll answers straight
+away with ``retryAfter``, and the page polls every ``EVENT_RETRY_AFTER``
+seconds instead. The other threads stay free for ordinary requests.
+"""
+import json
+import threading
+import time
+from flask import current_app
+from app import db
+from app.models import Board, BoardEvent
+
+
+def publish(board_id, version, kind, **data):
+    """Record an event for ``board_id`` in the current transaction."""
+    db.session.add(BoardEvent(board_id=board_id, version=version, kind=kind, payload=json.dumps(data)))
+
+    # Keep only the most recent history of each board
+    history = current_app.config['EVENT_HISTORY']
+    if version % 50 == 0 and version > history:
+        db.session.execute(
+            db.delete(BoardEvent).where(
+                BoardEvent.board_id == board_id,
+                BoardEvent.version <= version - history
+            )
+        )
+
+
+def claim_waiter():
+    """Take one of this worker's waiter slots.
+
+    Returns the function that gives the slot back, or None if every slot
+    is taken.
+    """
+    slots = current_app.extensions['event_waiters']
+    if not slots.acquire(blocking=False):
+        return None
+    return slots.release
+
+
+def events_since(board_id, version):
+    """Return the events of a board newer than ``version``, oldest first."""
+    events = db.session.execute(
+        db.select(BoardEvent)
+        .where(BoardEvent.board_id == board_id, BoardEvent.version > version)
+        .order_by(BoardEvent.version, BoardEvent.id)
+    ).scalars().all()
+    return [{'kind': event.kind, 'version': event.version, 'data': json.loads(event.payload)}
+            for event in events]
+
+
+def poll(board_id, version):
+    """Check a board once for changes after ``version``.
+
+    Returns a tuple ``(current_version, events, resync)``. ``current_version``
+    is None if the board no longer exists.
+    """
+    stamp = Board.version_stamp(board_id)
+    if stamp is None:
+        return None, [], False
+    if stamp.version <= version:
+        return stamp.version, [], False
+
+    events = events_since(board_id, version)
+    resync = not events or events[0]['version'] != version + 1
+    return stamp.version, events, resync
+
+
+def wait(board_id, version, timeout):
+    """Poll a board until it changes after ``version`` or ``timeout`` passes."""
+    interval = current_app.config['EVENT_POLL_INTERVAL']
+    deadline = time.monotonic() + timeout
+    while True:
+        current, events, resync = poll(board_id, version)
+        # End the read transaction so the next poll sees new commits
+        db.session.rollback()
+        if current is None or current > version or time.monotonic() >= deadline:
+            return current, events, resync
+        time.sleep(interval)
+
+
+def stream(board_id, version):
+    """Yield Server-Sent Events for a board until the stream timeout.
+
+    The browser reconnects on its own afterwards, resuming from the last
+    ``id`` it received.
+    """
+    timeout = current_app.config['EVENT_STREAM_TIMEOUT']
+    deadline = time.monotonic() + timeout
+    yield 'retry: 1000\n\n'
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        current, events, resync = wait(board_id, version, remaining)
+        if current is None:
+            yield _sse({'kind': 'board_deleted', 'version': version, 'data': {}}, version)
+            return
+        if resync:
+            yield _sse({'kind': 'resync', 'version': current, 'data': {}}, current)
+            return
+        for event in events:
+            yield _sse(event, event['version'])
+        if current > version:
+            version = current
+        else:
+            # Comment line, keeps proxies from closing an idle stream
+            yield ': keep-alive\n\n'
+
+
+def _sse(event, event_id):
+    return f'id: {event_id}\ndata: {json.dumps(event)}\n\n'
+
+
+def init_app(app):
+    app.extensions['event_waiters'] = threading.BoundedSemaphore(app.config['EVENT_MAX_WAITERS'])
@@ -1,6 +1,8 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, TextAreaField, BooleanField, SelectField
-from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, PasswordField, SubmitField, TextAreaField, BooleanField, SelectField, IntegerField
+from wtforms.validators import DataRequired, Length, Email, EqualTo, NumberRange, ValidationError
+from app.archive import MIN_DAYS, MAX_DAYS
 from app.models import User
 
 class RegistrationForm(FlaskForm):
@@ -33,8 +35,24 @@ class LoginForm(FlaskForm):
 
 class BoardForm(FlaskForm):
     title = StringField('Board Title', validators=[DataRequired(), Length(max=100)])
+    # 0 is the default columns; the routes add the user's templates
+    template = SelectField('Start From', coerce=int, default=0,
+                           choices=[(0, 'Default columns: To Do, In Progress, Done')])
     submit = SubmitField('Create Board')
 
+class DuplicateBoardForm(FlaskForm):
+    title = StringField('Board Title', validators=[DataRequired(), Length(max=100)])
+    include_cards = BooleanField('Copy cards', default=True)
+    submit = SubmitField('Duplicate Board')
+
+class ImportBoardForm(FlaskForm):
+    file = FileField('Export File', validators=[
+        FileRequired(),
+        FileAllowed(['jsonl', 'ndjson', 'json', 'csv'], 'Choose a JSON Lines or CSV export.')
+    ])
+    title = StringField('Board Title', validators=[Length(max=100)])
+    submit = SubmitField('Import Board')
+
 class ColumnForm(FlaskForm):
     title = StringField('Column Title', validators=[DataRequired(), Length(max=100)])
     submit = SubmitField('Add Column')
@@ -44,6 +62,10 @@ class CardForm(FlaskForm):
     description = TextAreaField('Description')
     submit = SubmitField('Add Card')
 
+class ArchivePolicyForm(FlaskForm):
+    days = IntegerField('Days', validators=[DataRequired(), NumberRange(min=MIN_DAYS, max=MAX_DAYS)])
+    submit = SubmitField('Archive')
+
 class SettingsForm(FlaskForm):
     dark_mode = BooleanField('Dark Mode')
     submit = SubmitField('Save Settings')
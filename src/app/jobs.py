@@ -0,0 +1,159 @@
+"""Background jobs.
+
+Some operations outlast a request: importing a board of a few hundred
+thousand cards, or deleting one, which also removes every card from the
+search index. Run inline they hold a gunicorn thread for the whole time
+and can hit the worker timeout. Instead the route records a row in the
+``job`` table, hands the job to a small per-worker thread pool and answers
+202 straight away; the client follows progress at ``/jobs/<id>``.
+
+A handler is a function registered with :func:`handler` under a job kind.
+It is called inside an app context with a ``progress(done, total=None)``
+callback and the keyword arguments given to :func:`submit`, and returns a
+JSON-serialisable result. ``progress`` commits the session, so a handler
+that reports progress commits its work in steps and must clean up after
+itself if it fails later. A ValueError from a handler is shown to the user
+as the reason the job failed; anything else is logged and reported as an
+internal error.
+
+The pool is created on first use, after gunicorn has forked the worker.
+Jobs do not survive their process: a job whose worker has exited is marked
+failed the next time its status is read on the same host. With
+``JOBS_INLINE`` a job runs to completion inside :func:`submit`, which the
+tests use.
+"""
+import json
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models import Board, Job
+
+_handlers = {}
+
+
+def handler(kind):
+    """Register the decorated function as the handler of jobs of ``kind``."""
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def _worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _run(app, job_id):
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        def progress(done, total=None):
+            job.progress = done
+            if total is not None:
+                job.total = total
+            db.session.commit()
+
+        try:
+            result = _handlers[job.kind](progress, **json.loads(job.params))
+        except Exception as e:
+            db.session.rollback()
+            if isinstance(e, ValueError):
+                job.error = str(e)
+            else:
+                app.logger.exception('Job %s (%s) failed', job.id, job.kind)
+                job.error = 'Internal error'
+            job.status = 'failed'
+        else:
+            job.status = 'done'
+            job.result = json.dumps(result)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+class JobRunner:
+    def __init__(self, workers, inline=False):
+        self.workers = workers
+        self.inline = inline
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            return self._executor
+
+    def submit(self, kind, user_id, **params):
+        """Record a job of ``kind`` for ``user_id`` and start it.
+
+        Commits the session. Returns the job, already finished when the
+        runner is inline.
+        """
+        if kind not in _handlers:
+            raise ValueError(f'Unknown job kind {kind!r}')
+        job = Job(kind=kind, user_id=user_id, params=json.dumps(params), worker=_worker_name())
+        db.session.add(job)
+        db.session.commit()
+        app = current_app._get_current_object()
+        if self.inline:
+            _run(app, job.id)
+            db.session.refresh(job)
+        else:
+            self._get_executor().submit(_run, app, job.id)
+        return job
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+def get_runner():
+    return current_app.extensions['job_runner']
+
+
+def submit(kind, user_id, **params):
+    return get_runner().submit(kind, user_id, **params)
+
+
+def _process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def get_job(job_id):
+    """Load a job, first failing it if the process that ran it has exited."""
+    job = db.session.get(Job, job_id)
+    if job is None or job.finished or not job.worker:
+        return job
+    host, _, pid = job.worker.rpartition(':')
+    if host == socket.gethostname() and not _process_exists(int(pid)):
+        job.status = 'failed'
+        job.error = 'Interrupted by a server restart'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    return job
+
+
+@handler('delete_board')
+def delete_board(progress, board_id):
+    Board.delete(board_id)
+    db.session.commit()
+    return {'boardId': board_id}
+
+
+def init_app(app):
+    app.extensions['job_runner'] = JobRunner(app.config['JOB_WORKERS'], app.config['JOBS_INLINE'])
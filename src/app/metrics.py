@@ -0,0 +1,269 @@
+"""Request and SQL metrics in the Prometheus text format.
+
+Every request is timed from ``before_request`` to ``after_request`` and
+counted by endpoint, method and status. The SQLAlchemy cursor events count
+the statements a request sends and the time it waits for them, and the
+size of each response body is added up, so ``/metrics`` shows which
+endpoints are slow, which are chatty with the database and which are
+heavy. Streamed responses (exports, change feeds) are timed up to their
+first byte and their bodies are not counted.
+
+gunicorn runs several worker processes and a scrape only reaches one of
+them. With ``METRICS_DIR`` set, each process writes its totals to
+``metrics-<pid>.json`` in that directory, at most every
+``METRICS_FLUSH_INTERVAL`` seconds and whenever it answers a scrape, and
+the answer adds up every file. A worker that replaces a dead one with
+the same pid starts from the totals left in its file, so the counters
+never go backwards. Without a directory a scrape reports the answering
+process only.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from app import db
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Prometheus' default latency buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+# Name, help text and, for histograms, buckets of every metric
+COUNTERS = {
+    'kanely_http_requests_total': 'Requests handled, by endpoint, method and status.',
+    'kanely_http_response_bytes_total': 'Bytes of response bodies, streamed responses excluded.',
+    'kanely_db_queries_total': 'SQL statements sent while handling requests.',
+    'kanely_db_duration_seconds_total': 'Seconds spent waiting for SQL statements while handling requests.',
+}
+HISTOGRAMS = {
+    'kanely_http_request_duration_seconds': ('Time to handle a request.', DURATION_BUCKETS),
+    'kanely_http_request_queries': ('SQL statements sent per request.', QUERY_BUCKETS),
+}
+
+
+class Metrics:
+    """Counters and histograms of one process, keyed on (name, labels).
+
+    Labels are a tuple of (name, value) pairs. Histograms hold one count
+    per bucket, then the +Inf bucket, the sum and the count.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_flush = 0.0
+        self._reset()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _reset(self):
+        self._counters = defaultdict(float)
+        self._histograms = {}
+
+    def _check_pid(self):
+        # Values inherited through a fork belong to the parent; a new process
+        # carries on from whatever a previous process with its pid left.
+        # Called with the lock held.
+        pid = os.getpid()
+        if pid == self._pid:
+            return
+        self._pid = pid
+        self._reset()
+        if self.directory:
+            snapshot = _read(self._path())
+            if snapshot is not None:
+                _merge(self._counters, self._histograms, snapshot)
+
+    def _path(self):
+        return os.path.join(self.directory, f'metrics-{self._pid}.json')
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self._check_pid()
+            self._counters[(name, labels)] += value
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        with self._lock:
+            self._check_pid()
+            counts = self._histograms.get((name, labels))
+            if counts is None:
+                counts = self._histograms[(name, labels)] = [0] * (len(buckets) + 3)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(buckets)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            self._check_pid()
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, labels, counts] for (name, labels), counts in self._histograms.items()],
+            }
+
+    def flush(self, force=False):
+        """Write this process' totals to the shared directory, if there is one."""
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        snapshot = self.snapshot()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self._path())
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def collect(self):
+        """Return ``(counters, histograms)`` added up over every process."""
+        counters, histograms = defaultdict(float), {}
+        if not self.directory:
+            _merge(counters, histograms, self.snapshot())
+            return counters, histograms
+        self.flush(force=True)
+        for name in os.listdir(self.directory):
+            if name.startswith('metrics-') and name.endswith('.json'):
+                snapshot = _read(os.path.join(self.directory, name))
+                if snapshot is not None:
+                    _merge(counters, histograms, snapshot)
+        return counters, histograms
+
+    def render(self):
+        """The metrics of every process in the Prometheus text format."""
+        counters, histograms = self.collect()
+        lines = []
+        for name, help_text in COUNTERS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for (metric, labels), counts in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip((*buckets, '+Inf'), counts):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _number(bound)
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {_number(cumulative)}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(counts[-2])}')
+                lines.append(f'{name}_count{_labels(labels)} {_number(counts[-1])}')
+        return '\n'.join(lines) + '\n'
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        # Gone, or left half written by a process that was killed
+        return None
+
+
+def _merge(counters, histograms, snapshot):
+    for name, labels, value in snapshot['counters']:
+        counters[(name, _key(labels))] += value
+    for name, labels, counts in snapshot['histograms']:
+        key = (name, _key(labels))
+        total = histograms.get(key)
+        if total is None:
+            histograms[key] = list(counts)
+        else:
+            histograms[key] = [a + b for a, b in zip(total, counts)]
+
+
+def _key(labels):
+    # JSON turns the label pairs into lists
+    return tuple((name, value) for name, value in labels)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def get_metrics():
+    """Return the metrics of the current app."""
+    return current_app.extensions['metrics']
+
+
+def _start_request():
+    g.request_metrics = {'start': time.perf_counter(), 'queries': 0, 'db_time': 0.0}
+
+
+def _finish_request(response):
+    state = g.pop('request_metrics', None)
+    if state is None:
+        return response
+    metrics = get_metrics()
+    endpoint = request.endpoint or 'unmatched'
+    metrics.inc('kanely_http_requests_total',
+                (('endpoint', endpoint), ('method', request.method), ('status', str(response.status_code))))
+    labels = (('endpoint', endpoint),)
+    metrics.observe('kanely_http_request_duration_seconds', labels, time.perf_counter() - state['start'])
+    metrics.observe('kanely_http_request_queries', labels, state['queries'])
+    metrics.inc('kanely_db_queries_total', labels, state['queries'])
+    metrics.inc('kanely_db_duration_seconds_total', labels, state['db_time'])
+    if not response.is_streamed:
+        metrics.inc('kanely_http_response_bytes_total', labels, response.content_length or 0)
+    metrics.flush()
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Statements from jobs and CLI commands belong to no request
+    if not has_request_context():
+        return
+    state = g.get('request_metrics')
+    if state is None:
+        return
+    state['queries'] += 1
+    start = getattr(context, 'metrics_start', None)
+    if start is not None:
+        state['db_time'] += time.perf_counter() - start
+
+
+def init_app(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.extensions['metrics'] = Metrics(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
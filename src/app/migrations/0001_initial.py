@@ -0,0 +1,40 @@
+"""Create the user, board, column and card tables."""
+
+
+def upgrade(m):
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS user (
+            id INTEGER NOT NULL PRIMARY KEY,
+            username VARCHAR(20) NOT NULL UNIQUE,
+            email VARCHAR(120) NOT NULL UNIQUE,
+            password_hash VARCHAR(128)
+        )
+    """)
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS board (
+            id INTEGER NOT NULL PRIMARY KEY,
+            title VARCHAR(100) NOT NULL,
+            user_id INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES user (id)
+        )
+    """)
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS "column" (
+            id INTEGER NOT NULL PRIMARY KEY,
+            title VARCHAR(100) NOT NULL,
+            position INTEGER NOT NULL,
+            board_id INTEGER NOT NULL,
+            FOREIGN KEY (board_id) REFERENCES board (id)
+        )
+    """)
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS card (
+            id INTEGER NOT NULL PRIMARY KEY,
+            title VARCHAR(100) NOT NULL,
+            description TEXT,
+            position INTEGER NOT NULL,
+            created_at DATETIME NOT NULL,
+            column_id INTEGER NOT NULL,
+            FOREIGN KEY (column_id) REFERENCES "column" (id)
+        )
+    """)
@@ -0,0 +1,5 @@
+"""Add the dark mode preference to users."""
+
+
+def upgrade(m):
+    m.add_column('user', 'dark_mode', 'BOOLEAN DEFAULT 0')
@@ -0,0 +1,14 @@
+"""Create the board_shares table for sharing boards with other users."""
+
+
+def upgrade(m):
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS board_shares (
+            user_id INTEGER NOT NULL,
+            board_id INTEGER NOT NULL,
+            can_edit BOOLEAN DEFAULT 0,
+            PRIMARY KEY (user_id, board_id),
+            FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE,
+            FOREIGN KEY (board_id) REFERENCES board (id) ON DELETE CASCADE
+        )
+    """)
@@ -0,0 +1,26 @@
+"""Give every card a distinct position within its column.
+
+Card positions are fractional sort keys now. Existing integer positions
+are valid keys as they are; only columns with duplicate positions need
+renumbering.
+"""
+
+
+def upgrade(m):
+    column_ids = m.execute("""
+        SELECT DISTINCT column_id FROM card
+        GROUP BY column_id, position HAVING COUNT(*) > 1
+    """).scalars().all()
+    for count, column_id in enumerate(column_ids, 1):
+        m.execute("""
+            UPDATE card SET position = ranked.rank
+            FROM (
+                SELECT id, ROW_NUMBER() OVER (ORDER BY position, id) - 1 AS rank
+                FROM card WHERE column_id = :column_id
+            ) AS ranked
+            WHERE card.id = ranked.id
+        """, {'column_id': column_id})
+        if count % m.batch_size == 0:
+            m.commit()
+    if column_ids:
+        m.echo(f'  renumbered {len(column_ids)} columns')
@@ -0,0 +1,8 @@
+"""Add the version and updated_at columns to boards."""
+
+
+def upgrade(m):
+    m.add_column('board', 'version', 'INTEGER NOT NULL DEFAULT 1')
+    # SQLite only adds columns with a constant default without a rewrite
+    if m.add_column('board', 'updated_at', "DATETIME NOT NULL DEFAULT '1970-01-01 00:00:00'"):
+        m.backfill('board', 'updated_at = CURRENT_TIMESTAMP')
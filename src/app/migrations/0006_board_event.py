@@ -0,0 +1,16 @@
+"""Create the board_event table for the board change feed."""
+
+
+def upgrade(m):
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS board_event (
+            id INTEGER NOT NULL PRIMARY KEY,
+            board_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            kind VARCHAR(30) NOT NULL,
+            payload TEXT NOT NULL,
+            created_at DATETIME NOT NULL,
+            FOREIGN KEY (board_id) REFERENCES board (id)
+        )
+    """)
+    m.create_index('ix_board_event_board_version', 'board_event', ['board_id', 'version'])
@@ -0,0 +1,13 @@
+"""Index the lookups behind the dashboard, access checks and board render.
+
+SQLite builds each index in a single statement. Readers carry on while it
+runs; writers wait for it.
+"""
+
+
+def upgrade(m):
+    m.create_index('ix_board_user_id', 'board', ['user_id'])
+    m.create_index('ix_board_shares_board_id', 'board_shares', ['board_id'])
+    m.create_index('ix_column_board_position', 'column', ['board_id', 'position'])
+    m.create_index('ix_card_column_position', 'card', ['column_id', 'position'])
+    m.execute('ANALYZE')
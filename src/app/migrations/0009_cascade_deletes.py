@@ -0,0 +1,68 @@
+"""Cascade deletes from boards to their columns, cards, shares and events.
+
+SQLite cannot add ON DELETE CASCADE to an existing foreign key, so each
+table without it is rebuilt, which rewrites the table once. Rows whose
+parent is already gone could never be reached and would fail the foreign
+key check, so they are removed first. The card table comes back with a
+REAL position column, matching the fractional positions it has held since
+migration 0004.
+"""
+
+TABLES = [
+    ('column', """
+        CREATE TABLE {table} (
+            id INTEGER NOT NULL PRIMARY KEY,
+            title VARCHAR(100) NOT NULL,
+            position INTEGER NOT NULL,
+            board_id INTEGER NOT NULL,
+            FOREIGN KEY (board_id) REFERENCES board (id) ON DELETE CASCADE
+        )
+    """),
+    ('card', """
+        CREATE TABLE {table} (
+            id INTEGER NOT NULL PRIMARY KEY,
+            title VARCHAR(100) NOT NULL,
+            description TEXT,
+            position FLOAT NOT NULL,
+            created_at DATETIME NOT NULL,
+            column_id INTEGER NOT NULL,
+            FOREIGN KEY (column_id) REFERENCES "column" (id) ON DELETE CASCADE
+        )
+    """),
+    ('board_shares', """
+        CREATE TABLE {table} (
+            user_id INTEGER NOT NULL,
+            board_id INTEGER NOT NULL,
+            can_edit BOOLEAN DEFAULT 0,
+            PRIMARY KEY (user_id, board_id),
+            FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE,
+            FOREIGN KEY (board_id) REFERENCES board (id) ON DELETE CASCADE
+        )
+    """),
+    ('board_event', """
+        CREATE TABLE {table} (
+            id INTEGER NOT NULL PRIMARY KEY,
+            board_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            kind VARCHAR(30) NOT NULL,
+            payload TEXT NOT NULL,
+            created_at DATETIME NOT NULL,
+            FOREIGN KEY (board_id) REFERENCES board (id) ON DELETE CASCADE
+        )
+    """),
+]
+
+
+def upgrade(m):
+    for table, ddl in TABLES:
+        foreign_keys = m.foreign_keys(table)
+        for column, (parent, _) in foreign_keys.items():
+            orphans = m.execute(
+                f'DELETE FROM "{table}" WHERE {column} NOT IN (SELECT id FROM "{parent}")'
+            ).rowcount
+            if orphans:
+                m.echo(f'  removed {orphans} rows of {table} without a {parent}')
+        if all(on_delete == 'CASCADE' for _, on_delete in foreign_keys.values()):
+            continue
+        m.rebuild_table(table, ddl)
+        m.echo(f'  rebuilt {table}')
@@ -0,0 +1,23 @@
+"""Create the job table for background operations."""
+
+
+def upgrade(m):
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS job (
+            id INTEGER NOT NULL PRIMARY KEY,
+            kind VARCHAR(50) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            user_id INTEGER NOT NULL,
+            params TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            progress INTEGER NOT NULL,
+            total INTEGER,
+            worker VARCHAR(100),
+            created_at DATETIME NOT NULL,
+            started_at DATETIME,
+            finished_at DATETIME,
+            FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE
+        )
+    """)
+    m.create_index('ix_job_user_id', 'job', ['user_id'])
@@ -0,0 +1,5 @@
+"""Add the board.is_template flag."""
+
+
+def upgrade(m):
+    m.add_column('board', 'is_template', 'BOOLEAN NOT NULL DEFAULT 0')
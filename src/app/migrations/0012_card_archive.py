@@ -0,0 +1,27 @@
+"""Create the card archive and record when cards entered their column.
+
+Existing cards are taken to have entered their column when they were
+created.
+"""
+from app.search import schema_ddl
+
+
+def upgrade(m):
+    if m.add_column('card', 'moved_at', "DATETIME NOT NULL DEFAULT '1970-01-01 00:00:00'"):
+        m.backfill('card', 'moved_at = created_at')
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS card_archive (
+            id INTEGER NOT NULL PRIMARY KEY,
+            title VARCHAR(100) NOT NULL,
+            description TEXT,
+            position FLOAT NOT NULL,
+            created_at DATETIME NOT NULL,
+            moved_at DATETIME NOT NULL,
+            archived_at DATETIME NOT NULL,
+            column_id INTEGER NOT NULL,
+            FOREIGN KEY (column_id) REFERENCES "column" (id) ON DELETE CASCADE
+        )
+    """)
+    m.create_index('ix_card_archive_column_archived', 'card_archive', ['column_id', 'archived_at'])
+    for statement in schema_ddl(['card_archive_fts']):
+        m.execute(statement)
@@ -0,0 +1,295 @@
+"""Versioned schema migrations.
+
+Each change to the schema is a module in this package named
+``NNNN_description.py`` with an ``upgrade(m)`` function, where ``m`` is a
+:class:`Migrator`. The number of the last migration applied to a database
+is kept in the ``schema_version`` table, and ``flask db upgrade`` applies
+every newer one in order.
+
+Migrations must be safe to re-run. A database created before this table
+existed starts at version 0 and replays every migration, each of which
+checks for what is already there. The same holds for a migration that was
+interrupted halfway, since long ones commit in batches.
+
+SQLite holds the write lock for the whole of a transaction, so a migration
+that rewrites a large table does it through :meth:`Migrator.backfill` or
+:meth:`Migrator.rebuild_table`, which commit every ``MIGRATION_BATCH_SIZE``
+rows and let other writers in between batches.
+"""
+import importlib
+import os
+import re
+import time
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+_MODULE_NAME = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+
+class Migration:
+    def __init__(self, version, name, module):
+        self.version = version
+        self.name = name
+        self.module = module
+
+    @property
+    def description(self):
+        return (self.module.__doc__ or self.name).strip().splitlines()[0]
+
+    def __repr__(self):
+        return f"Migration({self.version}, '{self.name}')"
+
+
+def load_migrations():
+    """Return every migration in this package, ordered by version."""
+    migrations = []
+    for filename in sorted(os.listdir(os.path.dirname(__file__))):
+        match = _MODULE_NAME.match(filename)
+        if match:
+            module = importlib.import_module(f'{__name__}.{filename[:-3]}')
+            migrations.append(Migration(int(match.group(1)), match.group(2), module))
+    versions = [migration.version for migration in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError('Two migrations share a version number')
+    return migrations
+
+
+class Migrator:
+    """Connection wrapper handed to each migration's ``upgrade``."""
+
+    def __init__(self, conn, batch_size, echo):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.echo = echo
+
+    def execute(self, sql, params=None):
+        return self.conn.execute(text(sql), params or {})
+
+    def commit(self):
+        self.conn.commit()
+
+    def has_table(self, table):
+        return self.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name", {'name': table}
+        ).first() is not None
+
+    def has_column(self, table, column):
+        rows = self.execute(f'PRAGMA table_info("{table}")').fetchall()
+        return any(row[1] == column for row in rows)
+
+    def add_column(self, table, column, ddl):
+        """Add a column unless it exists.
+
+        ``ddl`` is the column type and constraints. SQLite adds a column
+        with a constant default without rewriting the table; fill in
+        computed values afterwards with :meth:`backfill`.
+        """
+        if self.has_column(table, column):
+            return False
+        self.execute(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}')
+        return True
+
+    def foreign_keys(self, table):
+        """Return ``{column: (referred_table, on_delete)}`` for the foreign keys of ``table``."""
+        rows = self.execute(f'PRAGMA foreign_key_list("{table}")').mappings().all()
+        return {row['from']: (row['table'], row['on_delete']) for row in rows}
+
+    def rebuild_table(self, table, ddl):
+        """Recreate ``table`` from ``ddl``, keeping its rows, indexes and triggers.
+
+        SQLite cannot alter a constraint in place. ``ddl`` is the new
+        ``CREATE TABLE`` statement with ``{table}`` standing for the table
+        name; rows are copied across by column name and rowid. Runs with
+        foreign key enforcement off (see :func:`upgrade`), so dropping the
+        old table does not cascade to its children.
+
+        Rows are copied ``batch_size`` rowids per transaction, like
+        :meth:`backfill`. Meanwhile triggers on the old table apply every
+        write to the new one, so changes made between batches are not lost.
+        Only the final swap, which drops the old table and rebuilds the
+        indexes on the new one, holds the write lock for longer; its
+        duration is reported, as writers wait for it.
+        """
+        columns = [f'"{row[1]}"' for row in self.execute(f'PRAGMA table_info("{table}")')]
+        # Leaving out the triggers of an interrupted rebuild
+        dependents = [sql for name, sql in self.execute(
+            "SELECT name, sql FROM sqlite_master WHERE tbl_name = :table AND type IN ('index', 'trigger') "
+            "AND sql IS NOT NULL", {'table': table}
+        ) if not name.startswith('_rebuild_')]
+        new = f'_new_{table}'
+        names = ', '.join(['rowid'] + columns)
+        values = ', '.join(['NEW.rowid'] + [f'NEW.{column}' for column in columns])
+        triggers = {
+            'insert': f'INSERT OR REPLACE INTO "{new}" ({names}) VALUES ({values})',
+            'update': f'DELETE FROM "{new}" WHERE rowid = OLD.rowid; '
+                      f'INSERT OR REPLACE INTO "{new}" ({names}) VALUES ({values})',
+            'delete': f'DELETE FROM "{new}" WHERE rowid = OLD.rowid',
+        }
+        # Left over from an interrupted run
+        for event in triggers:
+            self.execute(f'DROP TRIGGER IF EXISTS "_rebuild_{table}_{event}"')
+        self.execute(f'DROP TABLE IF EXISTS "{new}"')
+        self.execute(ddl.format(table=f'"{new}"'))
+        for event, body in triggers.items():
+            self.execute(f'CREATE TRIGGER "_rebuild_{table}_{event}" AFTER {event.upper()} ON "{table}" '
+                         f'BEGIN {body}; END')
+        self.commit()
+
+        copied = 0
+        low, high = self.execute(f'SELECT MIN(rowid), MAX(rowid) FROM "{table}"').first()
+        for start in range(low or 0, (high or -1) + 1, self.batch_size):
+            # Rows the triggers wrote already hold their latest values
+            copied += self.execute(
+                f'INSERT OR IGNORE INTO "{new}" ({names}) SELECT {names} '
+                f'FROM "{table}" WHERE rowid BETWEEN :start AND :end',
+                {'start': start, 'end': start + self.batch_size - 1}
+            ).rowcount
+            self.commit()
+        if copied:
+            self.echo(f'  copied {copied} rows of {table}')
+
+        started = time.monotonic()
+        for event in triggers:
+            self.execute(f'DROP TRIGGER "_rebuild_{table}_{event}"')
+        self.execute(f'DROP TABLE "{table}"')
+        self.execute(f'ALTER TABLE "{new}" RENAME TO "{table}"')
+        for sql in dependents:
+            self.execute(sql)
+        self.commit()
+        self.echo(f'  swapped in the new {table} in {time.monotonic() - started:.1f}s, '
+                  f'holding up writes meanwhile')
+
+    def create_index(self, name, table, columns):
+        self.execute(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({", ".join(columns)})')
+
+    def backfill(self, table, assignments, where=None, params=None):
+        """Run ``UPDATE table SET assignments`` in rowid ranges.
+
+        Each range of ``batch_size`` rowids is its own transaction, so the
+        write lock is released between batches. Returns the number of rows
+        updated.
+        """
+        self.commit()
+        low, high = self.execute(f'SELECT MIN(rowid), MAX(rowid) FROM "{table}"').first()
+        if low is None:
+            return 0
+        condition = f' AND ({where})' if where else ''
+        updated = 0
+        for start in range(low, high + 1, self.batch_size):
+            result = self.execute(
+                f'UPDATE "{table}" SET {assignments} WHERE rowid BETWEEN :start AND :end{condition}',
+                {**(params or {}), 'start': start, 'end': start + self.batch_size - 1}
+            )
+            self.commit()
+            updated += result.rowcount
+        if updated:
+            self.echo(f'  updated {updated} rows of {table}')
+        return updated
+
+
+def _ensure_version_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER NOT NULL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """))
+    conn.commit()
+
+
+def current_version(conn):
+    """Return the version of the last migration applied, 0 if none."""
+    _ensure_version_table(conn)
+    return conn.execute(text('SELECT COALESCE(MAX(version), 0) FROM schema_version')).scalar()
+
+
+def pending(conn, migrations=None):
+    version = current_version(conn)
+    return [migration for migration in migrations or load_migrations() if migration.version > version]
+
+
+def upgrade(engine, target=None, batch_size=10000, echo=lambda message: None):
+    """Apply every pending migration up to ``target`` (default: all).
+
+    Returns the migrations that were applied.
+    """
+    applied = []
+    with engine.connect() as conn:
+        migrations = pending(conn)
+        # Table rebuilds drop tables that others reference, which must not
+        # cascade. The pragma only takes effect outside a transaction.
+        foreign_keys = conn.execute(text('PRAGMA foreign_keys')).scalar()
+        conn.execute(text('PRAGMA foreign_keys = OFF'))
+        try:
+            for migration in migrations:
+                if target is not None and migration.version > target:
+                    break
+                echo(f'Applying {migration.version:04d} {migration.name}: {migration.description}')
+                migration.module.upgrade(Migrator(conn, batch_size, echo))
+                conn.execute(
+                    text('INSERT INTO schema_version (version, name, applied_at) VALUES (:version, :name, :now)'),
+                    {'version': migration.version, 'name': migration.name, 'now': datetime.utcnow()}
+                )
+                conn.commit()
+                applied.append(migration)
+        finally:
+            conn.rollback()
+            conn.execute(text(f'PRAGMA foreign_keys = {foreign_keys}'))
+    return applied
+
+
+def stamp(engine, version):
+    """Mark ``version`` and everything before it as applied without running them."""
+    with engine.connect() as conn:
+        done = current_version(conn)
+        for migration in load_migrations():
+            if done < migration.version <= version:
+                conn.execute(
+                    text('INSERT INTO schema_version (version, name, applied_at) VALUES (:version, :name, :now)'),
+                    {'version': migration.version, 'name': migration.name, 'now': datetime.utcnow()}
+                )
+        conn.commit()
+
+
+db_cli = AppGroup('db', help='Manage the database schema.')
+
+
+@db_cli.command('upgrade')
+@click.option('--to', 'target', type=int, help='Stop after this migration version.')
+def upgrade_command(target):
+    """Apply pending schema migrations."""
+    from app import db
+    applied = upgrade(db.engine, target, current_app.config['MIGRATION_BATCH_SIZE'], click.echo)
+    with db.engine.connect() as conn:
+        version = current_version(conn)
+    if applied:
+        click.echo(f'Database upgraded to version {version}.')
+    else:
+        click.echo(f'Database already at version {version}.')
+
+
+@db_cli.command('current')
+def current_command():
+    """Show the schema version and any pending migrations."""
+    from app import db
+    with db.engine.connect() as conn:
+        click.echo(f'Current version: {current_version(conn)}')
+        for migration in pending(conn):
+            click.echo(f'Pending {migration.version:04d} {migration.name}: {migration.description}')
+
+
+@db_cli.command('stamp')
+@click.argument('version', type=int)
+def stamp_command(version):
+    """Mark migrations up to VERSION as applied without running them."""
+    from app import db
+    stamp(db.engine, version)
+    click.echo(f'Database stamped at version {version}.')
+
+
+def init_app(app):
+    app.cli.add_command(db_cli)
@@ -1,12 +1,14 @@
+import json
 from datetime import datetime
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, login_manager
-from sqlalchemy.ext.associationproxy import association_proxy
+from app.passwords import hash_password, verify_password, needs_rehash
+from app.user_cache import get_user_cache
+from sqlalchemy.orm import joinedload
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    return get_user_cache().load(User, int(user_id))
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -17,80 +19,305 @@ class User(db.Model, UserMixin):
     boards = db.relationship('Board', backref='owner', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
     
     def __repr__(self):
         return f"User('{self.username}', '{self.email}')"
 
 # Board sharing association table
 board_shares = db.Table('board_shares',
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('board_id', db.Integer, db.ForeignKey('board.id'), primary_key=True),
-    db.Column('can_edit', db.Boolean, default=False)
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('board_id', db.Integer, db.ForeignKey('board.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('can_edit', db.Boolean, default=False),
+    # The primary key covers lookups by user; this one covers lookups by board
+    db.Index('ix_board_shares_board_id', 'board_id')
 )
 
 class Board(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    columns = db.relationship('Column', backref='board', lazy=True, cascade='all, delete-orphan')
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    # Bumped by every change to the board's columns or cards
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Offered as a starting point for new boards, see app.cloning
+    is_template = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    # Children go with ON DELETE CASCADE in the database rather than being
+    # loaded and deleted one by one, see Board.delete
+    columns = db.relationship('Column', backref='board', lazy=True, cascade='all, delete-orphan',
+                              passive_deletes=True, order_by='Column.position')
     
     # Users who have access to this board (many-to-many)
     shared_with = db.relationship('User', 
                                  secondary=board_shares,
-                                 lazy='subquery',
-                                 backref=db.backref('shared_boards', lazy=True))
+                                 lazy=True,
+                                 passive_deletes=True,
+                                 backref=db.backref('shared_boards', lazy=True, passive_deletes=True))
     
     def __repr__(self):
         return f"Board('{self.title}')"
     
-    def is_owner(self, user):
-        return self.user_id == user.id
+    @classmethod
+    def load_for_render(cls, board_id):
+        """Load a board with its owner, ordered columns and ordered cards.
+
+        The board, owner and columns come back in one joined statement and
+        every card of every column in a second one, so rendering the board
+        never triggers a lazy load.
+        """
+        stmt = db.select(cls).where(cls.id == board_id).options(
+            joinedload(cls.owner),
+            joinedload(cls.columns).selectinload(Column.cards)
+        )
+        return db.session.execute(stmt).unique().scalar_one_or_none()
     
-    def can_edit(self, user):
-        if self.is_owner(user):
-            return True
-        
-        # Check if the board is shared with the user with edit permissions
-        share = db.session.query(board_shares).filter_by(
-            user_id=user.id, 
-            board_id=self.id
-        ).first()
-        
-        return share is not None and share.can_edit
+    @classmethod
+    def load_with_owner(cls, board_id):
+        """Load a board and its owner in one statement, leaving columns unloaded."""
+        return db.session.get(cls, board_id, options=[joinedload(cls.owner)])
     
-    def can_view(self, user):
-        if self.is_owner(user):
-            return True
-        
-        # Check if the board is shared with the user
-        share = db.session.query(board_shares).filter_by(
-            user_id=user.id, 
-            board_id=self.id
-        ).first()
-        
-        return share is not None
+    @classmethod
+    def version_stamp(cls, board_id):
+        """Return the id, owner, version and update time of a board without loading it."""
+        stmt = db.select(cls.id, cls.user_id, cls.version, cls.updated_at).where(cls.id == board_id)
+        return db.session.execute(stmt).first()
+    
+    @classmethod
+    def bump_version(cls, board_id):
+        """Record a change to a board so cached copies of it go stale.
+
+        Returns the new version.
+        """
+        stmt = db.update(cls).where(cls.id == board_id).values(
+            version=cls.version + 1,
+            updated_at=datetime.utcnow()
+        ).returning(cls.version).execution_options(synchronize_session=False)
+        return db.session.execute(stmt).scalar()
+    
+    @classmethod
+    def delete(cls, board_id):
+        """Delete a board with its columns, cards, shares and events.
+
+        One DELETE statement; the foreign keys cascade to everything else
+        inside SQLite, so nothing of the board is loaded into the session.
+        """
+        db.session.execute(
+            db.delete(cls).where(cls.id == board_id).execution_options(synchronize_session=False)
+        )
+    
+    def is_owner(self, user):
+        return self.user_id == user.id
+
 
 class Column(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     position = db.Column(db.Integer, nullable=False)
-    board_id = db.Column(db.Integer, db.ForeignKey('board.id'), nullable=False)
-    cards = db.relationship('Card', backref='column', lazy=True, cascade='all, delete-orphan')
+    board_id = db.Column(db.Integer, db.ForeignKey('board.id', ondelete='CASCADE'), nullable=False)
+    cards = db.relationship('Card', backref='column', lazy=True, cascade='all, delete-orphan',
+                            passive_deletes=True, order_by='Card.position')
+    
+    __table_args__ = (
+        db.Index('ix_column_board_position', 'board_id', 'position'),
+    )
     
     def __repr__(self):
         return f"Column('{self.title}', position={self.position})"
+    
+    @classmethod
+    def load_with_first_cards(cls, board_id, limit):
+        """Load the ordered columns of a board and the first ``limit`` cards of each.
+
+        Returns a list of ``(column, cards, has_more)``. Each column's cards
+        come from its own index range scan that stops after ``limit + 1``
+        rows, all in one UNION ALL statement, so a column with thousands of
+        cards costs no more than a short one.
+        """
+        columns = db.session.execute(
+            db.select(cls).where(cls.board_id == board_id).order_by(cls.position)
+        ).scalars().all()
+        if not columns:
+            return []
+        
+        heads = [
+            db.select(Card.id).where(Card.column_id == column.id)
+            .order_by(Card.position, Card.id).limit(limit + 1).subquery()
+            for column in columns
+        ]
+        card_ids = db.union_all(*(db.select(head.c.id) for head in heads))
+        cards_by_column = {column.id: [] for column in columns}
+        for card in db.session.execute(
+            db.select(Card).where(Card.id.in_(card_ids)).order_by(Card.column_id, Card.position, Card.id)
+        ).scalars():
+            cards_by_column[card.column_id].append(card)
+        
+        return [(column, cards_by_column[column.id][:limit], len(cards_by_column[column.id]) > limit)
+                for column in columns]
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'position': self.position
+        }
 
 class Card(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
-    position = db.Column(db.Integer, nullable=False)
+    # Fractional sort key within the column, see app.ranking
+    position = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    column_id = db.Column(db.Integer, db.ForeignKey('column.id'), nullable=False)
+    # When the card entered its current column, for the archive policy
+    moved_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    column_id = db.Column(db.Integer, db.ForeignKey('column.id', ondelete='CASCADE'), nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_card_column_position', 'column_id', 'position'),
+    )
     
     def __repr__(self):
-        return f"Card('{self.title}', position={self.position})"
+        return f"Card('{self.title}', position={self.position:g})"
+    
+    @classmethod
+    def page(cls, column_id, after=None, limit=50):
+        """Return up to ``limit`` cards of a column following the ``(position, id)`` key ``after``.
+
+        Returns ``(cards, has_more)``. Keyset pagination reads only the rows
+        of the page from the (column_id, position) index, however deep into
+        the column it starts.
+        """
+        stmt = db.select(cls).where(cls.column_id == column_id)
+        if after is not None:
+            stmt = stmt.where(db.tuple_(cls.position, cls.id) > db.tuple_(*after))
+        cards = db.session.execute(
+            stmt.order_by(cls.position, cls.id).limit(limit + 1)
+        ).scalars().all()
+        return cards[:limit], len(cards) > limit
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'position': self.position,
+            'columnId': self.column_id
+        }
+
+class ArchivedCard(db.Model):
+    """A card moved out of its column into the archive, see app.archive."""
+    __tablename__ = 'card_archive'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    # Where the card sat in its column, restored as it was
+    position = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    moved_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    column_id = db.Column(db.Integer, db.ForeignKey('column.id', ondelete='CASCADE'), nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_card_archive_column_archived', 'column_id', 'archived_at'),
+    )
+    
+    def __repr__(self):
+        return f"ArchivedCard('{self.title}', column_id={self.column_id})"
+    
+    @classmethod
+    def page(cls, board_id, before=None, limit=50):
+        """Return archived cards of a board, most recently archived first, with their column titles.
+
+        Returns ``(rows, has_more)`` where each row is ``(card, column_title)``.
+        ``before`` is the ``(archived_at, id)`` key of the last card of the
+        previous page.
+        """
+        stmt = db.select(cls, Column.title).join(Column, Column.id == cls.column_id).where(
+            Column.board_id == board_id
+        )
+        if before is not None:
+            stmt = stmt.where(db.tuple_(cls.archived_at, cls.id) < db.tuple_(*before))
+        rows = db.session.execute(
+            stmt.order_by(cls.archived_at.desc(), cls.id.desc()).limit(limit + 1)
+        ).all()
+        return rows[:limit], len(rows) > limit
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'position': self.position,
+            'columnId': self.column_id,
+            'archivedAt': self.archived_at.isoformat()
+        }
+
+class BoardEvent(db.Model):
+    """A change to a board, kept briefly so open pages can replay it."""
+    __tablename__ = 'board_event'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    board_id = db.Column(db.Integer, db.ForeignKey('board.id', ondelete='CASCADE'), nullable=False)
+    # Board version the change produced; one version may cover several events
+    version = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(30), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_board_event_board_version', 'board_id', 'version'),
+    )
+    
+    def __repr__(self):
+        return f"BoardEvent('{self.kind}', board_id={self.board_id}, version={self.version})"
+
+class Job(db.Model):
+    """An operation run in the background, see app.jobs."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    # queued, running, done or failed
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    # JSON keyword arguments of the handler, and the JSON value it returned
+    params = db.Column(db.Text, nullable=False, default='{}')
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    # host:pid of the process running the job
+    worker = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f"Job('{self.kind}', status='{self.status}')"
+    
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+    
+    @property
+    def output(self):
+        """The decoded value the handler returned, None until the job is done."""
+        return json.loads(self.result) if self.result else None
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'result': self.output,
+            'error': self.error,
+            'createdAt': self.created_at.isoformat(),
+            'finishedAt': self.finished_at.isoformat() if self.finished_at else None
+        }
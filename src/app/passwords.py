@@ -0,0 +1,90 @@
+"""Password hashing off the request threads.
+
+Hashing is deliberately slow, and a burst of logins after a deploy can
+keep every request thread busy hashing while board traffic waits. Hashes
+are computed on a small per-worker thread pool instead (hashlib releases
+the GIL while it hashes, so the pool really runs beside the request
+threads). At most ``PASSWORD_HASH_WORKERS`` hashes run at once and
+``PASSWORD_HASH_QUEUE`` more may wait; past that, requests are turned away
+with a 503 and a Retry-After header rather than queued without bound.
+
+``PASSWORD_HASH_METHOD`` is passed to werkzeug's generate_password_hash.
+Changing it takes effect for existing users the next time they log in,
+when their password is rehashed with the new parameters.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context, make_response
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+
+class PasswordHasher:
+    def __init__(self, method, workers, queue):
+        self.method = method
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._prefix = None
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if ``pwhash`` was made with parameters other than ``method``."""
+        if self._prefix is None:
+            # werkzeug fills in default parameters, e.g. "scrypt" becomes
+            # "scrypt:32768:8:1", so compare against a hash it actually made
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._prefix
+
+
+def get_hasher():
+    return current_app.extensions['password_hasher']
+
+
+def hash_password(password):
+    if not has_app_context():
+        return generate_password_hash(password)
+    return get_hasher().hash(password)
+
+
+def verify_password(pwhash, password):
+    if not has_app_context():
+        return check_password_hash(pwhash, password)
+    return get_hasher().verify(pwhash, password)
+
+
+def needs_rehash(pwhash):
+    return get_hasher().needs_rehash(pwhash)
+
+
+def hashing_busy(error):
+    response = make_response('Too many sign-ins right now. Please try again in a few seconds.', 503)
+    response.headers['Retry-After'] = str(current_app.config['PASSWORD_HASH_RETRY_AFTER'])
+    return response
+
+
+def init_app(app):
+    app.extensions['password_hasher'] = PasswordHasher(
+        app.config['PASSWORD_HASH_METHOD'],
+        app.config['PASSWORD_HASH_WORKERS'],
+        app.config['PASSWORD_HASH_QUEUE']
+    )
+    app.register_error_handler(HashingBusy, hashing_busy)
@@ -0,0 +1,179 @@
+"""Fractional ordering for cards.
+
+``Card.position`` is a float sort key rather than a dense index. A card
+moved between two neighbours gets the midpoint of their keys, so a move
+writes exactly one row no matter how long the column is. Repeated inserts
+at the same spot halve the gap each time; once it drops below
+``REBALANCE_GAP`` the column is renumbered back to 0, 1, 2, ... after the
+response has been sent. Renumbering bumps the board version, so cached
+renders and paging cursors that hold the old keys go stale, and tells open
+pages to reload through a ``column_rebalanced`` event.
+"""
+from datetime import datetime
+import click
+from flask import current_app
+from app import db, events
+from app.models import Board, Card, Column
+
+# Gap below which a column is renumbered in the background. Doubles give
+# about 50 halvings of a unit gap, this triggers after about 20.
+REBALANCE_GAP = 1e-6
+
+
+def position_between(before, after):
+    """Return a key that sorts between ``before`` and ``after``.
+
+    Either bound may be None for the start or end of the column.
+    """
+    if before is None and after is None:
+        return 0.0
+    if before is None:
+        return after - 1.0
+    if after is None:
+        return before + 1.0
+    return (before + after) / 2
+
+
+def neighbours(column_id, index, exclude_id=None):
+    """Return the keys around slot ``index`` of a column as ``(before, after)``.
+
+    ``exclude_id`` leaves the moving card out so indexes refer to the column
+    as it will look once the card has been lifted out of it.
+    """
+    query = db.select(Card.position).where(Card.column_id == column_id)
+    if exclude_id is not None:
+        query = query.where(Card.id != exclude_id)
+
+    if index <= 0:
+        after = db.session.execute(
+            query.order_by(Card.position, Card.id).limit(1)
+        ).scalar()
+        return None, after
+
+    keys = db.session.execute(
+        query.order_by(Card.position, Card.id).offset(index - 1).limit(2)
+    ).scalars().all()
+    if keys:
+        return keys[0], keys[1] if len(keys) > 1 else None
+
+    # Index past the end of the column: append after the last card
+    last = db.session.execute(
+        query.order_by(Card.position.desc(), Card.id.desc()).limit(1)
+    ).scalar()
+    return last, None
+
+
+def neighbours_after(column_id, after_id, exclude_id=None):
+    """Return the keys around the slot just after card ``after_id``.
+
+    Unlike an index, a card id names the same slot however many of the
+    column's cards the client has loaded. ``after_id`` None is the top of
+    the column. Raises ValueError if the anchor is not in the column.
+    """
+    if after_id is None:
+        return neighbours(column_id, 0, exclude_id)
+    if after_id == exclude_id:
+        raise ValueError('A card cannot be placed after itself')
+
+    anchor = db.session.execute(
+        db.select(Card.position, Card.id).where(Card.id == after_id, Card.column_id == column_id)
+    ).first()
+    if anchor is None:
+        raise ValueError(f'Card {after_id} is not in column {column_id}')
+
+    query = db.select(Card.position).where(
+        Card.column_id == column_id,
+        db.tuple_(Card.position, Card.id) > db.tuple_(anchor.position, anchor.id)
+    )
+    if exclude_id is not None:
+        query = query.where(Card.id != exclude_id)
+    after = db.session.execute(query.order_by(Card.position, Card.id).limit(1)).scalar()
+    return anchor.position, after
+
+
+def place_card(card, column_id, index=None, after_id=None):
+    """Move ``card`` to slot ``index`` of a column, writing only the card.
+
+    With ``index`` None the card goes just after card ``after_id`` instead,
+    or to the top of the column if that is None too. Returns True when the
+    gap used was small enough that the column should be rebalanced soon.
+    """
+    def find_slot():
+        if index is not None:
+            return neighbours(column_id, index, exclude_id=card.id)
+        return neighbours_after(column_id, after_id, exclude_id=card.id)
+
+    before, after = find_slot()
+    position = position_between(before, after)
+
+    if (before is not None and position <= before) or (after is not None and position >= after):
+        # The keys have run out of precision here; renumber now and retry
+        rebalance_column(column_id)
+        before, after = find_slot()
+        position = position_between(before, after)
+
+    if card.column_id != column_id:
+        card.moved_at = datetime.utcnow()
+    card.column_id = column_id
+    card.position = position
+    return before is not None and after is not None and after - before < REBALANCE_GAP
+
+
+def next_position(column_id):
+    """Return the key for a card appended to the end of a column."""
+    last = db.session.query(db.func.max(Card.position)).filter_by(column_id=column_id).scalar()
+    return position_between(last, None)
+
+
+def rebalance_column(column_id):
+    """Renumber the cards of a column to 0, 1, 2, ... in a single statement.
+
+    Records the change on the column's board in the current transaction,
+    and expires the positions of the column's cards loaded in the session.
+    """
+    ranked = db.select(
+        Card.id,
+        (db.func.row_number().over(order_by=(Card.position, Card.id)) - 1).label('rank')
+    ).where(Card.column_id == column_id).subquery()
+
+    db.session.execute(
+        db.update(Card)
+        .where(Card.id == ranked.c.id)
+        .values(position=ranked.c.rank)
+        .execution_options(synchronize_session=False)
+    )
+    for obj in list(db.session.identity_map.values()):
+        if isinstance(obj, Card) and obj.column_id == column_id:
+            db.session.expire(obj, ['position'])
+
+    board_id = db.session.execute(db.select(Column.board_id).where(Column.id == column_id)).scalar()
+    if board_id is not None:
+        version = Board.bump_version(board_id)
+        events.publish(board_id, version, 'column_rebalanced', columnId=column_id)
+
+
+def schedule_rebalance(response, column_id):
+    """Rebalance a column once ``response`` has been sent to the client."""
+    app = current_app._get_current_object()
+
+    def rebalance():
+        with app.app_context():
+            rebalance_column(column_id)
+            db.session.commit()
+
+    response.call_on_close(rebalance)
+    return response
+
+
+@click.command('rebalance-cards')
+def rebalance_cards_command():
+    """Renumber card positions in every column."""
+    column_ids = db.session.execute(db.select(Column.id)).scalars().all()
+    for column_id in column_ids:
+        rebalance_column(column_id)
+        db.session.commit()
+    click.echo(f'Rebalanced {len(column_ids)} columns.')
+
+
+def init_app(app):
+    app.cli.add_command(rebalance_cards_command)
@@ -1,15 +1,46 @@
-from flask import Blueprint, render_template, url_for, flash, redirect, request, jsonify, abort
+from flask import Blueprint, render_template, url_for, flash, redirect, request, jsonify, abort, current_app, make_response, session, stream_with_context
 from flask_login import login_user, current_user, logout_user, login_required
-from app import db
-from app.models import User, Board, Column, Card, board_shares
-from app.forms import RegistrationForm, LoginForm, BoardForm, ColumnForm, CardForm, SettingsForm, ShareBoardForm
+from app import db, archive, cloning, dashboard, events, jobs, metrics as app_metrics, search as search_index, transfer
+from app.access import get_access
+from app.cache import get_board_cache
+from app.ranking import next_position, place_card, schedule_rebalance
+from app.models import User, Board, Column, Card, ArchivedCard, Job, board_shares
+from app.forms import RegistrationForm, LoginForm, ArchivePolicyForm, BoardForm, DuplicateBoardForm, ImportBoardForm, ColumnForm, CardForm, SettingsForm, ShareBoardForm
 from sqlalchemy import and_
+import hmac
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
 
 # Define blueprints
 main = Blueprint('main', __name__)
 auth = Blueprint('auth', __name__)
 kanban = Blueprint('kanban', __name__)
 
+def _wants_json():
+    """True when the client asked for JSON instead of a redirect, e.g. from fetch()."""
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+def _json_int(value):
+    """``int(value)`` for an id or index from a JSON body.
+
+    Raises ValueError, like ``int`` does for text, when the value is outside
+    the 64-bit range SQLite can bind.
+    """
+    number = int(value)
+    if not -2 ** 63 <= number < 2 ** 63:
+        raise ValueError(f'{value} is out of range')
+    return number
+
+def _job_accepted(job):
+    """202 response pointing a JSON client at the status of a background job."""
+    url = url_for('kanban.job_status', job_id=job.id)
+    response = jsonify({'job': job.to_dict(), 'statusUrl': url})
+    response.status_code = 202
+    response.headers['Location'] = url
+    return response
+
 # Main blueprint for general routes
 
 @main.route('/')
@@ -18,6 +49,16 @@ def home():
     if current_user.is_authenticated:
         return redirect(url_for('kanban.boards'))
     return render_template('index.html', title='Home')
+
+@main.route('/metrics')
+def metrics():
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404)
+    # Scrapers authenticate with a bearer token when one is configured
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    return current_app.response_class(app_metrics.get_metrics().render(), content_type=app_metrics.CONTENT_TYPE)
 # Auth blueprint for authentication routes
 
 @auth.route('/register', methods=['GET', 'POST'])
@@ -42,6 +83,9 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         if user and user.check_password(form.password.data):
+            if user.password_needs_rehash():
+                user.set_password(form.password.data)
+                db.session.commit()
             login_user(user)
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('main.home'))
@@ -71,66 +115,367 @@ def settings():
 @kanban.route('/boards')
 @login_required
 def boards():
-    # Get boards owned by the user
-    owned_boards = Board.query.filter_by(user_id=current_user.id).all()
-    
-    # Get boards shared with the user
-    shared_boards = current_user.shared_boards
-    
-    form = BoardForm()
-    return render_template('boards.html', title='My Boards', 
-                          owned_boards=owned_boards, 
-                          shared_boards=shared_boards, 
-                          form=form)
+    sort = request.args.get('sort', 'updated')
+    if sort not in dashboard.SORTS:
+        sort = 'updated'
+    show = request.args.get('show', 'all')
+    if show not in dashboard.FILTERS:
+        show = 'all'
+    cursor = request.args.get('after')
+    after = dashboard.decode_cursor(sort, cursor) if cursor else None
+    
+    # Owned and shared boards with their permission and counts, one statement
+    boards, has_more = dashboard.dashboard(current_user.id, sort, show, after,
+                                           current_app.config['DASHBOARD_PAGE_SIZE'])
+    next_cursor = dashboard.encode_cursor(sort, boards[-1]) if has_more else None
+    
+    if _wants_json():
+        return jsonify({'boards': [board.to_dict() for board in boards], 'next': next_cursor})
+    form = _board_form()
+    import_form = ImportBoardForm()
+    return render_template('boards.html', title='My Boards', boards=boards, sort=sort, show=show,
+                           first_page=after is None, next_cursor=next_cursor, form=form,
+                           import_form=import_form)
+
+@kanban.route('/boards/import', methods=['POST'])
+@login_required
+def import_board():
+    form = ImportBoardForm()
+    if form.validate_on_submit():
+        upload = form.file.data
+        fmt = transfer.format_for(upload.filename)
+        title = form.title.data or None
+        if fmt == 'csv' and not title:
+            flash('Give the board a title when importing a CSV file.', 'danger')
+            return redirect(url_for('kanban.boards'))
+        # The job reads the file after this request has finished
+        fd, path = tempfile.mkstemp(prefix='kanely-import-', suffix=f'.{fmt}')
+        os.close(fd)
+        upload.save(path)
+        job = jobs.submit('import_board', current_user.id, path=path, owner_id=current_user.id,
+                          fmt=fmt, title=title)
+        if _wants_json():
+            return _job_accepted(job)
+        if job.status == 'failed':
+            flash(f'Import failed: {job.error}', 'danger')
+        elif job.status == 'done':
+            flash('Your board has been imported!', 'success')
+            return redirect(url_for('kanban.board', board_id=job.output['boardId']))
+        else:
+            flash('Your board is being imported and will appear here when it is ready.', 'info')
+        return redirect(url_for('kanban.boards'))
+    for errors in form.errors.values():
+        for error in errors:
+            flash(error, 'danger')
+    return redirect(url_for('kanban.boards'))
+
+@kanban.route('/jobs')
+@login_required
+def job_list():
+    recent = db.session.execute(
+        db.select(Job).where(Job.user_id == current_user.id).order_by(Job.id.desc()).limit(20)
+    ).scalars()
+    return jsonify({'jobs': [job.to_dict() for job in recent]})
+
+@kanban.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        abort(404)
+    if job.user_id != current_user.id:
+        abort(403)
+    return jsonify(job.to_dict())
+
+@kanban.route('/search')
+@login_required
+def search():
+    query = request.args.get('q', '').strip()
+    page = min(max(request.args.get('page', 1, type=int), 1), search_index.MAX_PAGE)
+    per_page = current_app.config['SEARCH_PAGE_SIZE']
+    results, has_more = search_index.search(current_user.id, query, page, per_page)
+    
+    if _wants_json():
+        return jsonify({
+            'query': query,
+            'page': page,
+            'hasMore': has_more,
+            'results': [dict(result, snippet=str(result['snippet'])) for result in results]
+        })
+    return render_template('search.html', title='Search', query=query, page=page,
+                           results=results, has_more=has_more)
 
 @kanban.route('/board/new', methods=['POST'])
 @login_required
 def new_board():
-    form = BoardForm()
+    form = _board_form()
     if form.validate_on_submit():
-        board = Board(title=form.title.data, user_id=current_user.id)
-        db.session.add(board)
-        db.session.commit()
-        
-        # Create default columns
-        columns = [
-            Column(title='To Do', position=0, board_id=board.id),
-            Column(title='In Progress', position=1, board_id=board.id),
-            Column(title='Done', position=2, board_id=board.id)
-        ]
-        db.session.add_all(columns)
+        # The board and its columns, or a copy of the template, in one transaction
+        cloning.create_board(current_user.id, form.title.data, form.template.data or None)
         db.session.commit()
-        
         flash('Your board has been created!', 'success')
     return redirect(url_for('kanban.boards'))
 
+def _board_form():
+    """The new board form, offering the templates the current user can open."""
+    form = BoardForm()
+    form.template.choices += [(board_id, title) for board_id, title in cloning.templates_for(current_user.id)]
+    return form
+
+@kanban.route('/board/<int:board_id>/duplicate', methods=['POST'])
+@login_required
+def duplicate_board(board_id):
+    board = db.get_or_404(Board, board_id)
+    if not get_access().can_view(board):
+        abort(403)
+    
+    form = DuplicateBoardForm()
+    if not form.validate_on_submit():
+        if _wants_json():
+            return jsonify({'success': False, 'errors': form.errors}), 400
+        flash('Give the copy a title.', 'danger')
+        return redirect(url_for('kanban.board', board_id=board_id))
+    
+    copy = cloning.copy_board(board.id, current_user.id, form.title.data, form.include_cards.data)
+    db.session.commit()
+    if _wants_json():
+        return jsonify({'success': True, 'board': {'id': copy.id, 'title': copy.title}}), 201
+    flash('Your board has been duplicated!', 'success')
+    return redirect(url_for('kanban.board', board_id=copy.id))
+
+@kanban.route('/board/<int:board_id>/template', methods=['POST'])
+@login_required
+def toggle_template(board_id):
+    board = db.get_or_404(Board, board_id)
+    if not get_access().is_owner(board):
+        abort(403)
+    
+    board.is_template = not board.is_template
+    # The board page shows the flag
+    version = Board.bump_version(board.id)
+    events.publish(board.id, version, 'board_updated', isTemplate=board.is_template)
+    db.session.commit()
+    if board.is_template:
+        flash('This board is now offered as a template for new boards.', 'success')
+    else:
+        flash('This board is no longer offered as a template.', 'success')
+    return redirect(url_for('kanban.board', board_id=board_id))
+
+def _board_page_etag(board, can_edit):
+    """ETag for a rendered board page.
+
+    Besides the board version the page depends on who is looking at it
+    (navbar, dark mode, edit controls) and embeds CSRF tokens that expire,
+    so all of those go into the tag.
+    """
+    parts = [board.id, board.version, current_user.id, int(bool(current_user.dark_mode)), int(can_edit)]
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    if current_app.config.get('WTF_CSRF_ENABLED', True) and time_limit:
+        # A page revalidated within half the token lifetime still has a usable token
+        parts.append(int(time.time() // (time_limit / 2)))
+    return 'board-page-' + '-'.join(str(part) for part in parts)
+
+def _board_data_etag(board, can_edit):
+    """ETag for the JSON snapshot of a board."""
+    return f"board-{board.id}-v{board.version}-{'edit' if can_edit else 'view'}"
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    # Clients must revalidate every time, but may reuse their copy on a 304
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def _revalidate_board(board_id, make_etag):
+    """Answer a conditional GET for a board from its version alone.
+
+    Returns a 304 response when the client's copy is current, otherwise
+    None so the caller renders the board as usual.
+    """
+    # A pending flash message has to be rendered, so never 304 over it
+    if not request.if_none_match or session.get('_flashes'):
+        return None
+    
+    stamp = Board.version_stamp(board_id)
+    if stamp is None:
+        abort(404)
+    access = get_access()
+    if not access.can_view(stamp):
+        abort(403)
+    
+    etag = make_etag(stamp, access.can_edit(stamp))
+    if request.if_none_match.contains_weak(etag):
+        return _set_validators(current_app.response_class(status=304), etag, stamp.updated_at)
+    return None
+
 @kanban.route('/board/<int:board_id>')
 @login_required
 def board(board_id):
-    board = db.session.get(Board, board_id)
+    not_modified = _revalidate_board(board_id, _board_page_etag)
+    if not_modified:
+        return not_modified
+    
+    board = Board.load_with_owner(board_id)
+    if board is None:
+        abort(404)
 
     # Check if user is owner or has access
-    if not (board.is_owner(current_user) or board.can_view(current_user)):
+    access = get_access()
+    if not access.can_view(board):
         abort(403)
     
-    columns = Column.query.filter_by(board_id=board_id).order_by(Column.position).all()
     column_form = ColumnForm()
     card_form = CardForm()
+    duplicate_form = DuplicateBoardForm(title=f'Copy of {board.title}'[:100])
     
     # Only show edit forms if user has edit permission
-    can_edit = board.is_owner(current_user) or board.can_edit(current_user)
+    can_edit = access.can_edit(board)
+    
+    # The columns and cards are only loaded and rendered when the cache
+    # has nothing for this version of the board
+    cache = get_board_cache()
+    columns_html = cache.get(board.id, board.version, can_edit)
+    if columns_html is None:
+        columns = Column.load_with_first_cards(board.id, current_app.config['BOARD_FIRST_CARDS'])
+        columns_html = render_template('_board_columns.html', columns=columns, can_edit=can_edit)
+        cache.set(board.id, board.version, can_edit, columns_html)
+    
+    response = make_response(render_template('kanban.html', title=board.title, board=board, 
+                           columns_html=columns_html, column_form=column_form, card_form=card_form,
+                           duplicate_form=duplicate_form,
+                           can_edit=can_edit, is_owner=access.is_owner(board)))
+    return _set_validators(response, _board_page_etag(board, can_edit), board.updated_at)
+
+@kanban.route('/board/<int:board_id>/export')
+@login_required
+def export_board(board_id):
+    board = db.get_or_404(Board, board_id)
+    if not get_access().can_view(board):
+        abort(403)
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in transfer.FORMATS:
+        abort(400)
+    
+    # Streamed as it is read, the board is never held in memory
+    filename = f'board-{board.id}.{fmt}'
+    return current_app.response_class(
+        stream_with_context(transfer.export_board(board, fmt)),
+        mimetype=transfer.MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@kanban.route('/board/<int:board_id>/snapshot')
+@login_required
+def board_snapshot(board_id):
+    not_modified = _revalidate_board(board_id, _board_data_etag)
+    if not_modified:
+        return not_modified
+    
+    board = Board.load_for_render(board_id)
+    if board is None:
+        abort(404)
     
-    return render_template('kanban.html', title=board.title, board=board, 
-                           columns=columns, column_form=column_form, card_form=card_form,
-                           can_edit=can_edit)
+    access = get_access()
+    if not access.can_view(board):
+        abort(403)
+    can_edit = access.can_edit(board)
+    
+    response = jsonify({
+        'id': board.id,
+        'title': board.title,
+        'version': board.version,
+        'updatedAt': board.updated_at.isoformat(),
+        'canEdit': can_edit,
+        'columns': [
+            dict(column.to_dict(), cards=[card.to_dict() for card in column.cards])
+            for column in board.columns
+        ]
+    })
+    return _set_validators(response, _board_data_etag(board, can_edit), board.updated_at)
+
+@kanban.route('/column/<int:column_id>/cards')
+@login_required
+def column_cards(column_id):
+    column = db.get_or_404(Column, column_id)
+    access = get_access()
+    if not access.can_view(column.board):
+        abort(403)
+    
+    # Keyset cursor: the (position, id) of the last card the client has
+    after_position = request.args.get('after_position', type=float)
+    after_id = request.args.get('after_id', type=int)
+    after = (after_position, after_id) if after_position is not None and after_id is not None else None
+    limit = min(max(request.args.get('limit', current_app.config['COLUMN_PAGE_SIZE'], type=int), 1),
+                current_app.config['MAX_COLUMN_PAGE_SIZE'])
+    cards, has_more = Card.page(column.id, after, limit)
+    
+    if request.accept_mimetypes.best_match(['application/json', 'text/html']) == 'text/html':
+        return render_template('_board_cards.html', column=column, cards=cards, has_more=has_more,
+                               can_edit=access.can_edit(column.board))
+    last = cards[-1] if cards else None
+    return jsonify({
+        'cards': [card.to_dict() for card in cards],
+        'next': {'afterPosition': last.position, 'afterId': last.id} if has_more else None
+    })
+
+@kanban.route('/board/<int:board_id>/events')
+@login_required
+def board_events(board_id):
+    stamp = Board.version_stamp(board_id)
+    if stamp is None:
+        abort(404)
+    if not get_access().can_view(stamp):
+        abort(403)
+    
+    # EventSource resumes from the id of the last event it received
+    version = request.headers.get('Last-Event-ID', type=int)
+    if version is None:
+        version = request.args.get('version', stamp.version, type=int)
+    
+    # Held-open requests are capped per worker, see app.events
+    release = events.claim_waiter()
+    retry_after = current_app.config['EVENT_RETRY_AFTER']
+    if request.accept_mimetypes.best_match(['application/json', 'text/event-stream']) == 'text/event-stream':
+        if release is None:
+            return current_app.response_class(
+                'Too many open board feeds, poll instead', status=503, mimetype='text/plain',
+                headers={'Retry-After': str(retry_after)}
+            )
+        response = current_app.response_class(
+            stream_with_context(events.stream(board_id, version)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        response.call_on_close(release)
+        return response
+    
+    # Long-poll fallback, or a single check when every slot is taken
+    if release is None:
+        current, changes, resync = events.poll(board_id, version)
+    else:
+        try:
+            current, changes, resync = events.wait(board_id, version,
+                                                   current_app.config['EVENT_LONG_POLL_TIMEOUT'])
+        finally:
+            release()
+    body = {
+        'version': current,
+        'events': changes,
+        'resync': resync,
+        'deleted': current is None
+    }
+    if release is None:
+        body['retryAfter'] = retry_after
+    return jsonify(body)
 
 @kanban.route('/board/<int:board_id>/share', methods=['GET', 'POST'])
 @login_required
 def share_board(board_id):
-    board = db.session.get(Board, board_id)
+    board = db.get_or_404(Board, board_id)
     
     # Only the owner can share the board
-    if not board.is_owner(current_user):
+    if not get_access().is_owner(board):
         abort(403)
     
     form = ShareBoardForm()
@@ -180,10 +525,10 @@ def share_board(board_id):
 @kanban.route('/board/<int:board_id>/user/<int:user_id>/remove', methods=['POST'])
 @login_required
 def remove_share(board_id, user_id):
-    board = db.session.get(Board, board_id)
+    board = db.get_or_404(Board, board_id)
     
     # Only the owner can remove shares
-    if not board.is_owner(current_user):
+    if not get_access().is_owner(board):
         abort(403)
     
     # Delete the share
@@ -202,10 +547,10 @@ def remove_share(board_id, user_id):
 @kanban.route('/board/<int:board_id>/user/<int:user_id>/permission', methods=['POST'])
 @login_required
 def update_share_permission(board_id, user_id):
-    board = db.session.get(Board, board_id)
+    board = db.get_or_404(Board, board_id)
     
     # Only the owner can update permissions
-    if not board.is_owner(current_user):
+    if not get_access().is_owner(board):
         abort(403)
     
     permission = request.form.get('permission')
@@ -228,149 +573,345 @@ def update_share_permission(board_id, user_id):
 @kanban.route('/board/<int:board_id>/column/new', methods=['POST'])
 @login_required
 def new_column(board_id):
-    board = db.session.get(Board, board_id)
+    board = db.get_or_404(Board, board_id)
     
     # Check if user has edit permission
-    if not (board.is_owner(current_user) or board.can_edit(current_user)):
+    if not get_access().can_edit(board):
         abort(403)
     
     form = ColumnForm()
     if form.validate_on_submit():
         # Get the highest position and add 1
-        max_position = db.session.query(db.func.max(Column.position)).filter_by(board_id=board_id).scalar() or -1
+        max_position = db.session.query(
+            db.func.coalesce(db.func.max(Column.position), -1)
+        ).filter_by(board_id=board_id).scalar()
         column = Column(title=form.title.data, position=max_position + 1, board_id=board_id)
         db.session.add(column)
+        db.session.flush()
+        version = Board.bump_version(board_id)
+        events.publish(board_id, version, 'column_added', column=column.to_dict())
         db.session.commit()
+        if _wants_json():
+            return jsonify({'success': True, 'version': version, 'column': column.to_dict()}), 201
         flash('Column added!', 'success')
+    elif _wants_json():
+        return jsonify({'success': False, 'errors': form.errors}), 400
     return redirect(url_for('kanban.board', board_id=board_id))
 
 @kanban.route('/column/<int:column_id>/card/new', methods=['POST'])
 @login_required
 def new_card(column_id):
-    column = db.session.get(Column, column_id)
+    column = db.get_or_404(Column, column_id)
     board = column.board
     
     # Check if user has edit permission
-    if not (board.is_owner(current_user) or board.can_edit(current_user)):
+    if not get_access().can_edit(board):
         abort(403)
     
     form = CardForm()
     if form.validate_on_submit():
-        # Get the highest position and add 1
-        max_position = db.session.query(db.func.max(Card.position)).filter_by(column_id=column_id).scalar() or -1
         card = Card(
             title=form.title.data,
             description=form.description.data,
-            position=max_position + 1,
+            position=next_position(column_id),
             column_id=column_id
         )
         db.session.add(card)
+        db.session.flush()
+        version = Board.bump_version(column.board_id)
+        events.publish(column.board_id, version, 'card_created', card=card.to_dict())
         db.session.commit()
+        if _wants_json():
+            return jsonify({'success': True, 'version': version, 'card': card.to_dict()}), 201
         flash('Card added!', 'success')
+    elif _wants_json():
+        return jsonify({'success': False, 'errors': form.errors}), 400
     return redirect(url_for('kanban.board', board_id=column.board_id))
 
 @kanban.route('/card/<int:card_id>/move', methods=['POST'])
 @login_required
 def move_card(card_id):
-    card = db.session.get(Card, card_id)
+    card = db.get_or_404(Card, card_id)
     board = card.column.board
     
     # Check if user has edit permission
-    if not (board.is_owner(current_user) or board.can_edit(current_user)):
+    if not get_access().can_edit(board):
         abort(403)
     
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
     target_column_id = data.get('columnId')
     target_position = data.get('position')
-    
-    if target_column_id and target_position is not None:
-        # Update positions in the source column
-        source_column_id = card.column_id
-        source_position = card.position
-        
-        if int(target_column_id) == source_column_id:
-            # Moving within the same column
-            if target_position < source_position:
-                # Moving up
-                Card.query.filter(
-                    Card.column_id == source_column_id,
-                    Card.position >= target_position,
-                    Card.position < source_position
-                ).update({Card.position: Card.position + 1}, synchronize_session=False)
-            else:
-                # Moving down
-                Card.query.filter(
-                    Card.column_id == source_column_id,
-                    Card.position > source_position,
-                    Card.position <= target_position
-                ).update({Card.position: Card.position - 1}, synchronize_session=False)
-        else:
-            # Moving to a different column
-            # Update positions in source column
-            Card.query.filter(
-                Card.column_id == source_column_id,
-                Card.position > source_position
-            ).update({Card.position: Card.position - 1}, synchronize_session=False)
-            
-            # Update positions in target column
-            Card.query.filter(
-                Card.column_id == target_column_id,
-                Card.position >= target_position
-            ).update({Card.position: Card.position + 1}, synchronize_session=False)
+    # The card to drop after, which stays correct when the client has only
+    # loaded part of the column; None means the top of the column
+    anchored = 'afterId' in data
+    
+    if target_column_id and (target_position is not None or anchored):
+        try:
+            target_column = db.session.get(Column, _json_int(target_column_id))
+            if target_column is None or target_column.board_id != board.id:
+                return jsonify({'success': False}), 400
             
-            # Update the card's column
-            card.column_id = target_column_id
-        
-        # Update the card's position
-        card.position = target_position
+            # Only the moved card is written, see app.ranking
+            if anchored:
+                after_id = data['afterId']
+                needs_rebalance = place_card(card, target_column.id,
+                                             after_id=_json_int(after_id) if after_id is not None else None)
+            else:
+                needs_rebalance = place_card(card, target_column.id, _json_int(target_position))
+        except (TypeError, ValueError):
+            db.session.rollback()
+            return jsonify({'success': False}), 400
+        position = card.position
+        version = Board.bump_version(board.id)
+        events.publish(board.id, version, 'card_moved',
+                       cardId=card.id, columnId=target_column.id, position=position)
         db.session.commit()
         
-        return jsonify({'success': True})
+        response = jsonify({'success': True, 'version': version, 'position': position})
+        if needs_rebalance:
+            schedule_rebalance(response, target_column.id)
+        return response
     
     return jsonify({'success': False}), 400
 
+def _parse_move(move):
+    """Return ``(card_id, column_id, index, after_id)`` for one move of a batch.
+
+    A move gives either the slot ``position`` or the ``afterId`` of the card
+    to drop after (None for the top of the column).
+    """
+    if 'afterId' in move:
+        after_id = move['afterId']
+        return (_json_int(move['cardId']), _json_int(move['columnId']), None,
+                _json_int(after_id) if after_id is not None else None)
+    return _json_int(move['cardId']), _json_int(move['columnId']), _json_int(move['position']), None
+
+@kanban.route('/board/<int:board_id>/moves', methods=['POST'])
+@login_required
+def move_cards(board_id):
+    board = db.get_or_404(Board, board_id)
+    
+    # Check edit permission once for the whole batch
+    if not get_access().can_edit(board):
+        abort(403)
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    moves = data.get('moves')
+    if not isinstance(moves, list) or not moves:
+        return jsonify({'success': False, 'error': 'No moves given'}), 400
+    if len(moves) > current_app.config['MAX_BATCH_MOVES']:
+        return jsonify({'success': False, 'error': 'Too many moves'}), 400
+    try:
+        moves = [_parse_move(move) for move in moves]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Malformed move'}), 400
+    
+    # Every card and every target column must belong to this board
+    column_ids = set(db.session.execute(
+        db.select(Column.id).filter_by(board_id=board_id)
+    ).scalars())
+    card_ids = {card_id for card_id, _, _, _ in moves}
+    cards = {card.id: card for card in db.session.execute(
+        db.select(Card).join(Column).where(Card.id.in_(card_ids), Column.board_id == board_id)
+    ).scalars()}
+    if len(cards) != len(card_ids) or not all(column_id in column_ids for _, column_id, _, _ in moves):
+        return jsonify({'success': False, 'error': 'Unknown card or column'}), 400
+    
+    # Apply the moves in order, in a single transaction
+    rebalance_column_ids = set()
+    try:
+        for card_id, column_id, index, after_id in moves:
+            if place_card(cards[card_id], column_id, index, after_id):
+                rebalance_column_ids.add(column_id)
+    except ValueError:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': 'Unknown anchor card'}), 400
+    
+    # A move that rebalanced its column inline expired the keys it rewrote,
+    # so cards placed earlier in the batch are read back from the database
+    results = [{'id': card.id, 'columnId': card.column_id, 'position': card.position}
+               for card in cards.values()]
+    version = Board.bump_version(board_id)
+    for result in results:
+        events.publish(board_id, version, 'card_moved',
+                       cardId=result['id'], columnId=result['columnId'], position=result['position'])
+    db.session.commit()
+    
+    response = jsonify({'success': True, 'version': version, 'cards': results})
+    for column_id in rebalance_column_ids:
+        schedule_rebalance(response, column_id)
+    return response
+
 @kanban.route('/board/<int:board_id>/delete', methods=['POST'])
 @login_required
 def delete_board(board_id):
-    board = db.session.get(Board, board_id)
+    board = db.get_or_404(Board, board_id)
     
     # Only the owner can delete the board
-    if not board.is_owner(current_user):
+    if not get_access().is_owner(board):
         abort(403)
     
-    db.session.delete(board)
-    db.session.commit()
-    flash('Your board has been deleted!', 'success')
+    job = jobs.submit('delete_board', current_user.id, board_id=board.id)
+    if _wants_json():
+        return _job_accepted(job)
+    if job.status == 'done':
+        flash('Your board has been deleted!', 'success')
+    elif job.status == 'failed':
+        flash(f'Deleting the board failed: {job.error}', 'danger')
+    else:
+        flash('Your board is being deleted.', 'info')
     return redirect(url_for('kanban.boards'))
 
 @kanban.route('/column/<int:column_id>/delete', methods=['POST'])
 @login_required
 def delete_column(column_id):
-    column = db.session.get(Column, column_id)
+    column = db.get_or_404(Column, column_id)
     board = column.board
     
     # Check if user has edit permission
-    if not (board.is_owner(current_user) or board.can_edit(current_user)):
+    if not get_access().can_edit(board):
         abort(403)
     
     board_id = column.board_id
     db.session.delete(column)
+    version = Board.bump_version(board_id)
+    events.publish(board_id, version, 'column_deleted', columnId=column_id)
     db.session.commit()
+    if _wants_json():
+        return jsonify({'success': True, 'version': version})
     flash('Column has been deleted!', 'success')
     return redirect(url_for('kanban.board', board_id=board_id))
 
+@kanban.route('/card/<int:card_id>/archive', methods=['POST'])
+@login_required
+def archive_card(card_id):
+    card = db.get_or_404(Card, card_id)
+    board = card.column.board
+    if not get_access().can_edit(board):
+        abort(403)
+    
+    archive.archive_where(Card.id == card.id)
+    db.session.commit()
+    if _wants_json():
+        return jsonify({'success': True, 'cardIds': [card_id]})
+    flash('Card has been archived.', 'success')
+    return redirect(url_for('kanban.board', board_id=board.id))
+
+@kanban.route('/column/<int:column_id>/archive', methods=['POST'])
+@login_required
+def archive_column(column_id):
+    column = db.get_or_404(Column, column_id)
+    if not get_access().can_edit(column.board):
+        abort(403)
+    
+    # Optionally only the cards that have been in the column for a while
+    days = None
+    if request.form.get('days'):
+        days = request.form.get('days', type=int)
+        if days is None or not archive.MIN_DAYS <= days <= archive.MAX_DAYS:
+            if _wants_json():
+                return jsonify({'success': False,
+                                'error': f'days must be between {archive.MIN_DAYS} and {archive.MAX_DAYS}'}), 400
+            abort(400)
+    archived = archive.archive_column(column.id, timedelta(days=days) if days else None)
+    db.session.commit()
+    card_ids = archived.get(column.board_id, [])
+    if _wants_json():
+        return jsonify({'success': True, 'cardIds': card_ids})
+    flash(f'Archived {len(card_ids)} cards.', 'success')
+    return redirect(url_for('kanban.board', board_id=column.board_id))
+
+@kanban.route('/board/<int:board_id>/archive')
+@login_required
+def board_archive(board_id):
+    board = db.get_or_404(Board, board_id)
+    access = get_access()
+    if not access.can_view(board):
+        abort(403)
+    
+    # Keyset cursor: the archive time and id of the last card shown
+    before_at = request.args.get('before_at')
+    before_id = request.args.get('before_id', type=int)
+    before = None
+    if before_at and before_id is not None:
+        try:
+            before = (datetime.fromisoformat(before_at), before_id)
+        except ValueError:
+            abort(400)
+    rows, has_more = ArchivedCard.page(board.id, before, current_app.config['ARCHIVE_PAGE_SIZE'])
+    last = rows[-1][0] if has_more else None
+    next_page = {'beforeAt': last.archived_at.isoformat(), 'beforeId': last.id} if last else None
+    
+    if _wants_json():
+        return jsonify({
+            'cards': [dict(card.to_dict(), columnTitle=column_title) for card, column_title in rows],
+            'next': next_page
+        })
+    policy_form = ArchivePolicyForm(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+    return render_template('archive.html', title=f'Archive of {board.title}', board=board, rows=rows,
+                           next_page=next_page, first_page=before is None, can_edit=access.can_edit(board),
+                           policy_form=policy_form, archive_columns=current_app.config['ARCHIVE_COLUMNS'])
+
+@kanban.route('/board/<int:board_id>/archive/policy', methods=['POST'])
+@login_required
+def archive_policy(board_id):
+    board = db.get_or_404(Board, board_id)
+    if not get_access().can_edit(board):
+        abort(403)
+    
+    form = ArchivePolicyForm()
+    if not form.validate_on_submit():
+        if _wants_json():
+            return jsonify({'success': False, 'errors': form.errors}), 400
+        flash('Enter a number of days.', 'danger')
+        return redirect(url_for('kanban.board_archive', board_id=board_id))
+    
+    job = jobs.submit('archive_stale', current_user.id, board_id=board.id, days=form.days.data)
+    if _wants_json():
+        return _job_accepted(job)
+    if job.status == 'done':
+        flash(f'Archived {job.output["cards"]} cards.', 'success')
+    elif job.status == 'failed':
+        flash(f'Archiving failed: {job.error}', 'danger')
+    else:
+        flash('Finished cards are being archived.', 'info')
+    return redirect(url_for('kanban.board_archive', board_id=board_id))
+
+@kanban.route('/archive/<int:archived_id>/restore', methods=['POST'])
+@login_required
+def restore_card(archived_id):
+    archived = db.get_or_404(ArchivedCard, archived_id)
+    column = db.session.get(Column, archived.column_id)
+    if not get_access().can_edit(column.board):
+        abort(403)
+    
+    card = archive.restore(archived)
+    db.session.commit()
+    if _wants_json():
+        return jsonify({'success': True, 'card': card.to_dict()})
+    flash('Card has been restored.', 'success')
+    return redirect(url_for('kanban.board', board_id=column.board_id, _anchor=f'card-{card.id}'))
+
 @kanban.route('/card/<int:card_id>/delete', methods=['POST'])
 @login_required
 def delete_card(card_id):
-    card = db.session.get(Card, card_id)
+    card = db.get_or_404(Card, card_id)
     board = card.column.board
     
     # Check if user has edit permission
-    if not (board.is_owner(current_user) or board.can_edit(current_user)):
+    if not get_access().can_edit(board):
         abort(403)
     
     board_id = card.column.board_id
     db.session.delete(card)
+    version = Board.bump_version(board_id)
+    events.publish(board_id, version, 'card_deleted', cardId=card_id)
     db.session.commit()
+    if _wants_json():
+        return jsonify({'success': True, 'version': version})
     flash('Card has been deleted!', 'success')
     return redirect(url_for('kanban.board', board_id=board_id))
@@ -0,0 +1,159 @@
+"""Full-text search over the cards, columns and boards a user can open.
+
+Each searchable table has an FTS5 index stored as an external content
+table: the index holds only the tokens and reads titles back from the
+table itself. Triggers keep the indexes in step with every insert,
+update and delete, including bulk SQL that bypasses the ORM. The card
+update trigger only fires for title and description changes, so moving a
+card never touches its index.
+
+Archived cards have an index of their own, so they stay searchable
+without weighing on the index of the cards on the boards.
+
+The schema is created next to the regular tables by ``db.create_all()``
+and by migrations 0008 and 0012 on existing databases.
+"""
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import event, text
+from app import db
+
+# FTS5 index, source table and indexed columns of every searchable table
+INDEXES = (
+    ('card_fts', 'card', ('title', 'description')),
+    ('card_archive_fts', 'card_archive', ('title', 'description')),
+    ('column_fts', 'column', ('title',)),
+    ('board_fts', 'board', ('title',)),
+)
+
+# Snippet delimiters, replaced with <mark> tags once the text is escaped
+_OPEN, _CLOSE = '\x02', '\x03'
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+# Deepest page of results served; keeps the OFFSET within SQLite's integer range
+MAX_PAGE = 1000
+
+
+def _indexes(names):
+    return [entry for entry in INDEXES if names is None or entry[0] in names]
+
+
+def schema_ddl(names=None):
+    """Statements creating the search indexes named in ``names`` (default: all) and their triggers."""
+    statements = []
+    for index, table, columns in _indexes(names):
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+        delete_old = (f"INSERT INTO {index} ({index}, rowid, {column_list}) "
+                      f"VALUES ('delete', old.id, {old_values});")
+        insert_new = f'INSERT INTO {index} (rowid, {column_list}) VALUES (new.id, {new_values});'
+        statements += [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+            f"{column_list}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            f'CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON "{table}" BEGIN {insert_new} END',
+            f'CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON "{table}" BEGIN {delete_old} END',
+            f'CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF {column_list} ON "{table}" '
+            f'BEGIN {delete_old} {insert_new} END',
+        ]
+    return statements
+
+
+def rebuild_statements(names=None):
+    """Statements reindexing every row already in the searchable tables."""
+    return [f"INSERT INTO {index} ({index}) VALUES ('rebuild')" for index, _, _ in _indexes(names)]
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_indexes(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        for statement in schema_ddl():
+            connection.exec_driver_sql(statement)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_search_indexes(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        for index, _, _ in INDEXES:
+            connection.exec_driver_sql(f'DROP TABLE IF EXISTS {index}')
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query matching every word as a prefix.
+
+    Returns None if the text has no searchable words.
+    """
+    terms = _TERM.findall(query)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms[:10])
+
+
+# One query per kind of result, each limited to the boards the user owns or
+# has been shared. bm25() is negative, lower ranks first.
+_SEARCH_SQL = f"""
+WITH accessible(id) AS (
+    SELECT id FROM board WHERE user_id = :user_id
+    UNION
+    SELECT board_id FROM board_shares WHERE user_id = :user_id
+)
+SELECT 'card' AS kind, card.id AS id, board.id AS board_id, board.title AS board_title,
+       "column".title AS column_title, card.title AS title,
+       snippet(card_fts, -1, '{_OPEN}', '{_CLOSE}', '…', 16) AS snippet,
+       bm25(card_fts, 10.0, 1.0) AS rank
+FROM card_fts
+JOIN card ON card.id = card_fts.rowid
+JOIN "column" ON "column".id = card.column_id
+JOIN board ON board.id = "column".board_id
+WHERE card_fts MATCH :match AND board.id IN accessible
+UNION ALL
+SELECT 'archived_card', card_archive.id, board.id, board.title, "column".title, card_archive.title,
+       snippet(card_archive_fts, -1, '{_OPEN}', '{_CLOSE}', '…', 16), bm25(card_archive_fts, 10.0, 1.0)
+FROM card_archive_fts
+JOIN card_archive ON card_archive.id = card_archive_fts.rowid
+JOIN "column" ON "column".id = card_archive.column_id
+JOIN board ON board.id = "column".board_id
+WHERE card_archive_fts MATCH :match AND board.id IN accessible
+UNION ALL
+SELECT 'column', "column".id, board.id, board.title, "column".title, "column".title,
+       highlight(column_fts, 0, '{_OPEN}', '{_CLOSE}'), bm25(column_fts)
+FROM column_fts
+JOIN "column" ON "column".id = column_fts.rowid
+JOIN board ON board.id = "column".board_id
+WHERE column_fts MATCH :match AND board.id IN accessible
+UNION ALL
+SELECT 'board', board.id, board.id, board.title, NULL, board.title,
+       highlight(board_fts, 0, '{_OPEN}', '{_CLOSE}'), bm25(board_fts)
+FROM board_fts
+JOIN board ON board.id = board_fts.rowid
+WHERE board_fts MATCH :match AND board.id IN accessible
+ORDER BY rank, kind, id
+LIMIT :limit OFFSET :offset
+"""
+
+
+def highlight(snippet):
+    """Escape a snippet and turn the match delimiters into <mark> tags."""
+    return Markup(str(escape(snippet or '')).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>'))
+
+
+def search(user_id, query, page=1, per_page=20):
+    """Search the boards ``user_id`` can open.
+
+    Returns ``(results, has_more)``, where each result is a dict with the
+    kind of match, its id, the board it belongs to and a highlighted
+    snippet.
+    """
+    match = match_expression(query)
+    if match is None:
+        return [], False
+    rows = db.session.execute(text(_SEARCH_SQL), {
+        'user_id': user_id,
+        'match': match,
+        'limit': per_page + 1,
+        'offset': (page - 1) * per_page,
+    }).mappings().all()
+    results = [dict(row, snippet=highlight(row['snippet'])) for row in rows[:per_page]]
+    return results, len(rows) > per_page
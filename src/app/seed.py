@@ -0,0 +1,220 @@
+"""Synthetic data for load tests and benchmarks.
+
+``flask seed`` adds users, boards, shares, columns and cards to the
+database. Building millions of cards through the ORM takes hours, so rows
+are generated as plain tuples and written with Core ``executemany``
+inserts of ``--chunk-size`` rows, one transaction per chunk, on a single
+connection. While it runs that connection has ``synchronous = OFF``, no
+foreign key checks and a large page cache, and the search index insert
+triggers are dropped. Afterwards the pragmas are restored, the triggers
+recreated and the search indexes rebuilt in one pass, which is far
+cheaper than updating them row by row.
+
+Ids continue from the largest already in each table and rows are written
+in id order: the cards of a column have consecutive ids, and the boards of
+the first new user come first. All the content comes from ``--seed``, so
+the same options always give the same data. With ``--processes`` the card
+rows are generated by a pool of processes while the parent process does
+the writing; it only helps when there are cores to spare, as SQLite
+takes the rows from one writer.
+"""
+import multiprocessing
+import random
+import time
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import text
+from app import db, search
+from app.models import User, Board, Column, Card, board_shares
+
+# Words for card descriptions
+_WORDS = ('fix', 'update', 'review', 'customer', 'release', 'bug', 'report', 'design', 'meeting', 'deploy',
+          'invoice', 'migration', 'search', 'login', 'mobile', 'draft', 'test', 'blocked', 'backlog', 'docs')
+
+# Cards were created and last moved within this many days
+_AGE_DAYS = 365
+
+# Applied to the seeding connection, and put back afterwards
+_PRAGMAS = {
+    'synchronous': 'OFF',
+    'foreign_keys': 'OFF',
+    'cache_size': '-262144',
+    'temp_store': 'MEMORY',
+}
+
+
+def column_title(index, columns):
+    if index == 0:
+        return 'To Do'
+    if index == columns - 1:
+        return 'Done'
+    return 'In Progress' if columns == 3 else f'Step {index}'
+
+
+def card_rows(spec):
+    """Rows of the cards of a run of columns, as tuples ready for the driver.
+
+    Each column draws from a generator seeded with its index among the new
+    columns, so its cards do not depend on how the work is split up.
+    Top-level so that a process pool can run it.
+    """
+    seed, first_column, column_count, per_column, first_card_id, first_column_id, now = spec
+    rows = []
+    for column in range(first_column, first_column + column_count):
+        rng = random.Random(f'{seed}-column-{column}')
+        column_id = first_column_id + column
+        for position in range(per_column):
+            created_at = now - timedelta(seconds=rng.randrange(_AGE_DAYS * 86400))
+            moved_at = created_at + (now - created_at) * rng.random()
+            description = ' '.join(rng.choices(_WORDS, k=rng.randrange(13)))
+            rows.append((first_card_id + column * per_column + position, f'Card {column_id}-{position}',
+                         description, float(position), _timestamp(created_at), _timestamp(moved_at), column_id))
+    return rows
+
+
+def _next_id(conn, model):
+    return conn.execute(db.select(db.func.coalesce(db.func.max(model.id), 0))).scalar() + 1
+
+
+def _insert(conn, table, columns, rows, chunk_size):
+    """Insert ``rows`` (tuples of ``columns``) a chunk per transaction.
+
+    The statement is compiled from the table once and the tuples go
+    straight to the driver's ``executemany``, skipping per-row parameter
+    processing: values must already be what the column stores.
+    """
+    quote = conn.dialect.identifier_preparer
+    statement = (f'INSERT INTO {quote.format_table(table)} ({", ".join(quote.quote(c) for c in columns)}) '
+                 f'VALUES ({", ".join("?" * len(columns))})')
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            conn.exec_driver_sql(statement, chunk)
+            conn.commit()
+            chunk = []
+    if chunk:
+        conn.exec_driver_sql(statement, chunk)
+        conn.commit()
+
+
+def _timestamp(value):
+    # The format SQLAlchemy's SQLite DateTime reads and writes
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _set_pragmas(conn, pragmas):
+    previous = {name: conn.execute(text(f'PRAGMA {name}')).scalar() for name in pragmas}
+    for name, value in pragmas.items():
+        conn.execute(text(f'PRAGMA {name} = {value}'))
+    return previous
+
+
+def seed_database(users, boards, shares=0, columns=3, cards_per_column=10, seed=0, password='password',
+                  chunk_size=50000, processes=1, echo=lambda message: None):
+    """Add synthetic users, boards, shares, columns and cards.
+
+    Boards go round-robin to the new users, and each is shared with the
+    ``shares`` new users after its owner, every other one with edit
+    permission. Every user's password is ``password``. Returns the number
+    of rows added to each table.
+    """
+    rng = random.Random(f'{seed}-boards')
+    now = datetime.utcnow()
+    shares = min(shares, users - 1)
+    user = User(username='seed', email='seed')
+    user.set_password(password)
+    password_hash = user.password_hash
+
+    with db.engine.connect() as conn:
+        sqlite = conn.dialect.name == 'sqlite'
+        # Pragmas only take effect outside a transaction
+        previous = _set_pragmas(conn, _PRAGMAS) if sqlite else {}
+        conn.commit()
+        if sqlite:
+            for index, _, _ in search.INDEXES:
+                conn.execute(text(f'DROP TRIGGER IF EXISTS {index}_insert'))
+            conn.commit()
+        try:
+            first_user, first_board = _next_id(conn, User), _next_id(conn, Board)
+            first_column, first_card = _next_id(conn, Column), _next_id(conn, Card)
+            counts = {'users': users, 'boards': boards, 'shares': boards * shares,
+                      'columns': boards * columns, 'cards': boards * columns * cards_per_column}
+
+            start = time.perf_counter()
+            _insert(conn, User.__table__, ('id', 'username', 'email', 'password_hash', 'dark_mode'), (
+                (i, f'user{i}', f'user{i}@example.com', password_hash, 0)
+                for i in range(first_user, first_user + users)
+            ), chunk_size)
+
+            def owner(board):
+                return first_user + (board - first_board) % users
+
+            _insert(conn, Board.__table__, ('id', 'title', 'user_id', 'version', 'updated_at', 'is_template'), (
+                (i, f'Board {i}', owner(i), 1,
+                 _timestamp(now - timedelta(seconds=rng.randrange(_AGE_DAYS * 86400))), 0)
+                for i in range(first_board, first_board + boards)
+            ), chunk_size)
+            _insert(conn, board_shares, ('user_id', 'board_id', 'can_edit'), (
+                (first_user + (owner(board) - first_user + offset) % users, board, 1 - offset % 2)
+                for board in range(first_board, first_board + boards)
+                for offset in range(1, shares + 1)
+            ), chunk_size)
+            _insert(conn, Column.__table__, ('id', 'title', 'position', 'board_id'), (
+                (first_column + i, column_title(i % columns, columns), i % columns, first_board + i // columns)
+                for i in range(boards * columns)
+            ), chunk_size)
+            echo(f"{counts['users']} users, {counts['boards']} boards, {counts['shares']} shares and "
+                 f"{counts['columns']} columns in {time.perf_counter() - start:.1f}s")
+
+            start = time.perf_counter()
+            # Whole columns at a time, about a chunk's worth of cards each
+            step = max(chunk_size // max(cards_per_column, 1), 1)
+            specs = [(seed, first, min(step, counts['columns'] - first), cards_per_column, first_card,
+                      first_column, now)
+                     for first in range(0, counts['columns'], step)]
+            columns_of_card = ('id', 'title', 'description', 'position', 'created_at', 'moved_at', 'column_id')
+            if processes > 1:
+                with multiprocessing.Pool(processes) as pool:
+                    for rows in pool.imap(card_rows, specs):
+                        _insert(conn, Card.__table__, columns_of_card, rows, chunk_size)
+            else:
+                for spec in specs:
+                    _insert(conn, Card.__table__, columns_of_card, card_rows(spec), chunk_size)
+            elapsed = time.perf_counter() - start
+            echo(f"{counts['cards']} cards in {elapsed:.1f}s ({counts['cards'] / max(elapsed, 1e-9):.0f}/s)")
+        finally:
+            conn.rollback()
+            if sqlite:
+                start = time.perf_counter()
+                for statement in search.schema_ddl() + search.rebuild_statements():
+                    conn.execute(text(statement))
+                conn.commit()
+                echo(f'Rebuilt the search indexes in {time.perf_counter() - start:.1f}s')
+                _set_pragmas(conn, previous)
+                conn.commit()
+    return counts
+
+
+@click.command('seed')
+@click.option('--users', type=int, default=100, show_default=True)
+@click.option('--boards', type=int, default=1000, show_default=True, help='Boards in all.')
+@click.option('--shares', type=int, default=2, show_default=True, help='Users each board is shared with.')
+@click.option('--columns', type=int, default=5, show_default=True, help='Columns per board.')
+@click.option('--cards-per-column', type=int, default=20, show_default=True)
+@click.option('--seed', 'seed_value', type=int, default=0, show_default=True, help='Seed of the generated content.')
+@click.option('--password', default='password', show_default=True, help='Password of every user.')
+@click.option('--chunk-size', type=int, default=50000, show_default=True, help='Rows per insert transaction.')
+@click.option('--processes', type=int, default=1, show_default=True, help='Processes generating card rows.')
+def seed_command(users, boards, shares, columns, cards_per_column, seed_value, password, chunk_size, processes):
+    """Fill the database with synthetic users, boards and cards."""
+    if users < 1 or boards < 0 or shares < 0 or columns < 1 or cards_per_column < 0 or chunk_size < 1:
+        raise click.BadParameter('counts must not be negative, and users, columns and chunk size at least 1')
+    start = time.perf_counter()
+    counts = seed_database(users, boards, shares, columns, cards_per_column, seed_value, password,
+                           chunk_size, processes, click.echo)
+    click.echo(f"Seeded {counts['cards']} cards in {time.perf_counter() - start:.1f}s.")
+
+
+def init_app(app):
+    app.cli.add_command(seed_command)
@@ -0,0 +1,80 @@
+"""Connection settings for SQLite databases.
+
+SQLite's defaults suit a single process. Under several gunicorn workers
+the rollback journal blocks readers while anyone writes, and a writer that
+finds the database locked fails instead of waiting its turn. The
+``production`` profile switches to WAL, where readers never block the
+writer, and gives every connection a busy timeout so writers queue for the
+lock. The pragmas are set on every new connection through a connect
+event; ``SQLITE_PRAGMAS`` overrides individual values.
+
+Every profile turns on foreign key enforcement, which SQLite leaves off
+by default. Deleting a board relies on it: the ON DELETE CASCADE clauses
+remove its columns, cards, shares and events.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PROFILES = {
+    'default': {
+        'foreign_keys': 'ON',
+    },
+    'production': {
+        'foreign_keys': 'ON',
+        'journal_mode': 'WAL',
+        # Durable at each checkpoint rather than each commit; safe with WAL
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        # Negative values are KiB, per connection
+        'cache_size': -16 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def is_file_database(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def pragmas_for(config):
+    """Return the pragmas of the configured profile with overrides applied."""
+    profile = config['SQLITE_PROFILE']
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown SQLITE_PROFILE {profile!r}, expected one of {", ".join(PROFILES)}')
+    return {**PROFILES[profile], **config['SQLITE_PRAGMAS']}
+
+
+def configure_engine(app):
+    """Add pool options for a file database to SQLALCHEMY_ENGINE_OPTIONS.
+
+    Must run before ``db.init_app``, which creates the engine. In-memory
+    databases keep the single shared connection Flask-SQLAlchemy gives them.
+    """
+    if not is_file_database(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    # One connection per request thread of a worker, plus a little headroom
+    options.setdefault('pool_size', app.config['SQLITE_POOL_SIZE'])
+    options.setdefault('max_overflow', app.config['SQLITE_POOL_OVERFLOW'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def init_app(app):
+    from app import db
+
+    if make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name() != 'sqlite':
+        return
+    pragmas = pragmas_for(app.config)
+    if not pragmas:
+        return
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', set_pragmas)
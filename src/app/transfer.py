@@ -0,0 +1,341 @@
+"""Board export and import as JSON Lines or CSV.
+
+Exports stream: columns are read first, then the cards of the whole board
+in one ordered query whose rows are fetched a chunk at a time, and each
+record is written out as soon as it is read. Memory use stays the same
+however large the board.
+
+JSON Lines puts one record per line: the board, its columns, then its
+cards grouped by column::
+
+    {"type": "board", "format": 1, "title": "Roadmap"}
+    {"type": "column", "id": 4, "title": "To Do", "position": 0}
+    {"type": "card", "column": 4, "title": "Ship it", "description": null,
+     "position": 0.0, "createdAt": "2024-05-01T09:30:00"}
+
+CSV has one row per card, with its column repeated on every row; on
+import, columns are told apart by title. A column without cards gets a
+single row with an empty card title. The board title
+is not part of a CSV export and has to be given on import.
+
+Imports read records one at a time and insert cards with executemany in
+chunks of ``IMPORT_CHUNK_SIZE``. ``flask import-board`` runs the whole
+import in one transaction, so a failed import leaves nothing behind.
+Uploads through the web UI are imported by a background job, see
+app.jobs, which commits each chunk as it reports progress and deletes
+the partly imported board if the import fails.
+"""
+import csv
+import io
+import json
+import math
+import os
+from datetime import datetime
+import click
+from flask import current_app
+from app import db, jobs
+from app.models import User, Board, Column, Card
+
+FORMAT_VERSION = 1
+FORMATS = ('jsonl', 'csv')
+CSV_FIELDS = ('column', 'column_position', 'title', 'description', 'position', 'created_at')
+
+MIMETYPES = {'jsonl': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# Largest position accepted, below which every integer is exact as a float
+_MAX_NUMBER = 2 ** 53
+
+
+class TransferError(ValueError):
+    """Raised for an import that is not a valid board export."""
+
+
+def _columns(board_id):
+    return db.session.execute(
+        db.select(Column.id, Column.title, Column.position)
+        .where(Column.board_id == board_id).order_by(Column.position, Column.id)
+    ).all()
+
+
+def _cards(board_id):
+    """Yield every card of a board, grouped by column, a chunk of rows at a time."""
+    result = db.session.execute(
+        db.select(Card.column_id, Card.title, Card.description, Card.position, Card.created_at)
+        .join(Column, Column.id == Card.column_id)
+        .where(Column.board_id == board_id)
+        .order_by(Card.column_id, Card.position, Card.id)
+        .execution_options(yield_per=current_app.config['IMPORT_CHUNK_SIZE'])
+    )
+    yield from result
+
+
+def export_jsonl(board):
+    yield json.dumps({'type': 'board', 'format': FORMAT_VERSION, 'title': board.title}) + '\n'
+    for column in _columns(board.id):
+        yield json.dumps({'type': 'column', 'id': column.id, 'title': column.title,
+                          'position': column.position}) + '\n'
+    for card in _cards(board.id):
+        yield json.dumps({
+            'type': 'card',
+            'column': card.column_id,
+            'title': card.title,
+            'description': card.description,
+            'position': card.position,
+            'createdAt': card.created_at.isoformat()
+        }) + '\n'
+
+
+def export_csv(board):
+    columns = {column.id: column for column in _columns(board.id)}
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writerow(CSV_FIELDS)
+    yield flush()
+    seen = set()
+    for card in _cards(board.id):
+        column = columns[card.column_id]
+        seen.add(column.id)
+        writer.writerow((column.title, column.position, card.title, card.description or '',
+                         repr(card.position), card.created_at.isoformat()))
+        yield flush()
+    for column in columns.values():
+        if column.id not in seen:
+            writer.writerow((column.title, column.position, '', '', '', ''))
+            yield flush()
+
+
+def export_board(board, fmt):
+    """Return a generator of the text chunks of a board export."""
+    if fmt not in FORMATS:
+        raise TransferError(f'Unknown export format {fmt!r}')
+    return export_jsonl(board) if fmt == 'jsonl' else export_csv(board)
+
+
+def _jsonl_records(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise TransferError(f'Line {number}: {e}') from None
+        if not isinstance(record, dict):
+            raise TransferError(f'Line {number}: expected an object')
+        yield number, record
+
+
+def _csv_records(lines):
+    reader = csv.DictReader(lines)
+    if reader.fieldnames is None or not {'column', 'title'} <= set(reader.fieldnames):
+        raise TransferError('CSV header must name at least the column and title fields')
+    columns = {}
+    for row in reader:
+        number = reader.line_num
+        key = row['column']
+        if key not in columns:
+            columns[key] = len(columns)
+            yield number, {'type': 'column', 'id': key, 'title': key,
+                           'position': row.get('column_position') or columns[key]}
+        if row['title']:
+            yield number, {'type': 'card', 'column': key, 'title': row['title'],
+                           'description': row.get('description') or None,
+                           'position': row.get('position') or None,
+                           'createdAt': row.get('created_at') or None}
+
+
+def _text(value, field, number, max_length, required=True):
+    if value is None or value == '':
+        if required:
+            raise TransferError(f'Line {number}: {field} is required')
+        return None
+    if not isinstance(value, str):
+        raise TransferError(f'Line {number}: {field} must be text')
+    return value[:max_length] if max_length else value
+
+
+def _number(value, field, number, default):
+    if value is None or value == '':
+        return default
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise TransferError(f'Line {number}: {field} must be a number') from None
+    # Rejects inf and NaN, and keeps integer columns within SQLite's range
+    if not math.isfinite(value) or abs(value) > _MAX_NUMBER:
+        raise TransferError(f'Line {number}: {field} must be a finite number below {_MAX_NUMBER}')
+    return value
+
+
+def _ref(value, field, number):
+    # Column references are dict keys, so anything but text or a number is refused
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        raise TransferError(f'Line {number}: {field} must be a number or text')
+    return value
+
+
+def import_board(lines, owner_id, fmt, title=None, on_chunk=None):
+    """Create a board for ``owner_id`` from an export read from ``lines``.
+
+    ``title`` overrides the title in the export and is required for CSV.
+    ``on_chunk(board, cards)`` is called after each chunk of cards is
+    inserted, with the number of cards inserted so far. Returns the new
+    board. The caller commits.
+    """
+    if fmt not in FORMATS:
+        raise TransferError(f'Unknown import format {fmt!r}')
+    records = _jsonl_records(lines) if fmt == 'jsonl' else _csv_records(lines)
+    chunk_size = current_app.config['IMPORT_CHUNK_SIZE']
+    now = datetime.utcnow()
+
+    board = None
+    if fmt == 'csv' or title:
+        board = Board(title=_text(title, 'title', 0, 100), user_id=owner_id)
+        db.session.add(board)
+        db.session.flush()
+
+    column_ids = {}
+    column_cards = {}
+    chunk = []
+    inserted = 0
+
+    def insert(chunk):
+        nonlocal inserted
+        db.session.execute(db.insert(Card), chunk)
+        inserted += len(chunk)
+        if on_chunk is not None:
+            on_chunk(board, inserted)
+    for number, record in records:
+        kind = record.get('type')
+        if kind == 'board':
+            if board is None:
+                board = Board(title=_text(record.get('title'), 'title', number, 100), user_id=owner_id)
+                db.session.add(board)
+                db.session.flush()
+            continue
+        if board is None:
+            raise TransferError(f'Line {number}: the export must start with the board')
+        if kind == 'column':
+            ref = _ref(record.get('id'), 'id', number)
+            if ref in column_ids:
+                raise TransferError(f'Line {number}: duplicate column {ref}')
+            column_ids[ref] = db.session.execute(
+                db.insert(Column).values(
+                    title=_text(record.get('title'), 'title', number, 100),
+                    position=int(_number(record.get('position'), 'position', number, len(column_ids))),
+                    board_id=board.id
+                ).returning(Column.id)
+            ).scalar()
+            column_cards[ref] = 0
+        elif kind == 'card':
+            ref = _ref(record.get('column'), 'column', number)
+            if ref not in column_ids:
+                raise TransferError(f'Line {number}: card of unknown column {ref}')
+            created_at = record.get('createdAt')
+            try:
+                created_at = datetime.fromisoformat(created_at) if created_at else now
+            except (TypeError, ValueError):
+                raise TransferError(f'Line {number}: createdAt must be an ISO date') from None
+            chunk.append({
+                'title': _text(record.get('title'), 'title', number, 100),
+                'description': _text(record.get('description'), 'description', number, None, required=False),
+                'position': _number(record.get('position'), 'position', number, float(column_cards[ref])),
+                'created_at': created_at,
+                'column_id': column_ids[ref],
+            })
+            column_cards[ref] += 1
+            if len(chunk) >= chunk_size:
+                insert(chunk)
+                chunk = []
+        else:
+            raise TransferError(f'Line {number}: unknown record type {kind!r}')
+
+    if board is None:
+        raise TransferError('The export is empty')
+    if chunk:
+        insert(chunk)
+    return board
+
+
+@jobs.handler('import_board')
+def import_board_job(progress, path, owner_id, fmt, title):
+    """Import an uploaded export saved at ``path``, then remove the file.
+
+    Each chunk is committed as it is inserted so the job can report
+    progress without holding the write lock for the whole import; if the
+    import fails, the partly imported board is deleted.
+    """
+    board_id = cards = None
+
+    def on_chunk(board, inserted):
+        nonlocal board_id, cards
+        board_id, cards = board.id, inserted
+        progress(inserted)
+
+    try:
+        with open(path, encoding='utf-8', newline='') as lines:
+            board = import_board(lines, owner_id, fmt, title, on_chunk)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        if board_id is not None:
+            Board.delete(board_id)
+            db.session.commit()
+        raise
+    finally:
+        os.remove(path)
+    return {'boardId': board.id, 'cards': cards or 0}
+
+
+def format_for(filename, default='jsonl'):
+    """Guess the export format from a file name."""
+    return 'csv' if filename and filename.lower().endswith('.csv') else default
+
+
+@click.command('export-board')
+@click.argument('board_id', type=int)
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='jsonl')
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='File to write, default stdout.')
+def export_board_command(board_id, fmt, output):
+    """Write a board as JSON Lines or CSV."""
+    board = db.session.get(Board, board_id)
+    if board is None:
+        raise click.ClickException(f'No board {board_id}')
+    for chunk in export_board(board, fmt):
+        output.write(chunk)
+
+
+@click.command('import-board')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--owner', required=True, help='Email of the user who will own the board.')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Default: guessed from the file name.')
+@click.option('--title', help='Board title; required for CSV.')
+def import_board_command(source, owner, fmt, title):
+    """Create a board from a JSON Lines or CSV export."""
+    user = db.session.execute(db.select(User).filter_by(email=owner)).scalar()
+    if user is None:
+        raise click.ClickException(f'No user with email {owner}')
+    fmt = fmt or format_for(source.name)
+    if fmt == 'csv' and not title:
+        raise click.ClickException('--title is required for CSV imports')
+    try:
+        board = import_board(source, user.id, fmt, title)
+    except TransferError as e:
+        db.session.rollback()
+        raise click.ClickException(str(e))
+    db.session.commit()
+    cards = db.session.execute(
+        db.select(db.func.count(Card.id)).join(Column).where(Column.board_id == board.id)
+    ).scalar()
+    click.echo(f'Imported board {board.id} with {cards} cards.')
+
+
+def init_app(app):
+    app.cli.add_command(export_board_command)
+    app.cli.add_command(import_board_command)
@@ -0,0 +1,141 @@
+"""Per-worker cache of the user behind each authenticated request.
+
+Flask-Login calls the user loader on every authenticated request, so
+without a cache every card move starts with a SELECT on the user table.
+The cache keeps a snapshot of each user's profile columns for
+``USER_CACHE_TTL`` seconds and rebuilds the User from it without touching
+the database. The password hash is left out of the snapshot; it is loaded
+on first access, which only happens when the password is checked or
+changed.
+
+A flush that updates or deletes a user drops that user from the cache of
+the worker doing it. With ``USER_CACHE_DIR`` set to a directory shared by
+the workers, the commit of that change also replaces a stamp file for the
+user there. Every cache hit compares the file with the stamp seen when the
+entry was stored, which costs a ``stat`` rather than a query, so the other
+workers reload the user on their next request instead of when the TTL
+runs out. The stamp is read before the user is, so a change committed
+while a worker reloads leaves it with a stamp that is already stale.
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+from app import db
+
+# Columns kept in the cache
+CACHED_COLUMNS = ('id', 'username', 'email', 'dark_mode')
+
+
+# Session.info key of the users changed in the current transaction
+_CHANGED = 'user_cache_changed'
+
+
+class UserCache:
+    def __init__(self, ttl, max_entries, directory=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def load(self, model, user_id):
+        """Return the user ``user_id`` attached to the current session."""
+        if self.ttl <= 0:
+            return db.session.get(model, user_id)
+
+        stamp = self._stamp(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic() and entry[1] == stamp:
+            user = model(**entry[2])
+            make_transient_to_detached(user)
+            # Attaches without a SELECT, or returns the copy already in the session
+            return db.session.merge(user, load=False)
+
+        user = db.session.get(model, user_id)
+        if user is not None:
+            snapshot = {column: getattr(user, column) for column in CACHED_COLUMNS}
+            with self._lock:
+                self._entries[user_id] = (time.monotonic() + self.ttl, stamp, snapshot)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def publish(self, user_id):
+        """Invalidate ``user_id`` in every worker sharing the directory."""
+        self.invalidate(user_id)
+        if self.directory is None:
+            return
+        # A new file each time, so the inode changes even within one mtime tick
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            os.close(fd)
+            os.replace(tmp_path, self._path(user_id))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _path(self, user_id):
+        return os.path.join(self.directory, f'user-{user_id}')
+
+    def _stamp(self, user_id):
+        if self.directory is None:
+            return None
+        try:
+            stat = os.stat(self._path(user_id))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def __contains__(self, user_id):
+        return user_id in self._entries
+
+
+def get_user_cache():
+    return current_app.extensions['user_cache']
+
+
+def _invalidate_user(mapper, connection, target):
+    if has_app_context() and 'user_cache' in current_app.extensions:
+        get_user_cache().invalidate(target.id)
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(_CHANGED, set()).add(target.id)
+
+
+def _publish_changes(session):
+    changed = session.info.pop(_CHANGED, None)
+    if changed and has_app_context() and 'user_cache' in current_app.extensions:
+        for user_id in changed:
+            get_user_cache().publish(user_id)
+
+
+def _forget_changes(session):
+    session.info.pop(_CHANGED, None)
+
+
+def init_app(app):
+    from app.models import User
+
+    app.extensions['user_cache'] = UserCache(app.config['USER_CACHE_TTL'], app.config['USER_CACHE_SIZE'],
+                                             app.config['USER_CACHE_DIR'])
+    for name in ('after_update', 'after_delete'):
+        if not event.contains(User, name, _invalidate_user):
+            event.listen(User, name, _invalidate_user)
+    # Other workers are only told once the change is visible to them
+    for name, listener in (('after_commit', _publish_changes), ('after_rollback', _forget_changes)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
@@ -3,3 +3,90 @@ import os
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-key-for-testing-only')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///kanban.db')
+
+    # Password hashing, see app.passwords: werkzeug hash method, hashes run
+    # at once per worker, hashes allowed to wait before logins get a 503
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+    PASSWORD_HASH_RETRY_AFTER = 5
+
+    # Seconds a worker may serve a logged-in user from its cache, see
+    # app.user_cache; 0 loads the user from the database on every request.
+    # The optional directory, shared by the workers, lets a change to a user
+    # in one worker drop the cached copies in all of them
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+    USER_CACHE_SIZE = 10000
+    USER_CACHE_DIR = os.environ.get('USER_CACHE_DIR')
+
+    # SQLite connection profile, see app.sqlite. "production" enables WAL
+    # and a busy timeout; "default" leaves SQLite's own settings. The pool
+    # is sized for one connection per gunicorn thread.
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'production')
+    SQLITE_PRAGMAS = {}
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 8))
+    SQLITE_POOL_OVERFLOW = 4
+
+    # Rows per transaction when a migration rewrites a table, see app.migrations
+    MIGRATION_BATCH_SIZE = 10000
+
+    # Background jobs, see app.jobs: threads per worker process. With
+    # JOBS_INLINE a job runs inside the request that submits it.
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOBS_INLINE = False
+
+    # Prometheus metrics at /metrics, see app.metrics. With METRICS_DIR each
+    # worker process writes its totals there every METRICS_FLUSH_INTERVAL
+    # seconds so that a scrape reports all of them; METRICS_TOKEN makes
+    # scrapers send it as a bearer token.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = 1.0
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Static assets, see app.assets: browsers keep the fingerprinted copies
+    # written by `flask assets build` for this many seconds
+    ASSETS_MAX_AGE = 365 * 24 * 3600
+
+    # Upper bound on the number of moves accepted by one batched move request
+    MAX_BATCH_MOVES = 500
+
+    # Boards per page of the dashboard
+    DASHBOARD_PAGE_SIZE = 30
+
+    # Cards rendered per column on the board page; the rest are fetched
+    # COLUMN_PAGE_SIZE at a time as the column is scrolled
+    BOARD_FIRST_CARDS = 50
+    COLUMN_PAGE_SIZE = 50
+    MAX_COLUMN_PAGE_SIZE = 200
+
+    # Card archive, see app.archive: `flask archive-cards` moves cards that
+    # have been in one of these columns for longer than this many days
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 30))
+    ARCHIVE_COLUMNS = ('Done',)
+    ARCHIVE_PAGE_SIZE = 50
+
+    # Cards read or inserted per round trip by board export and import
+    IMPORT_CHUNK_SIZE = 5000
+
+    # Results per page of search, see app.search
+    SEARCH_PAGE_SIZE = 20
+
+    # Rendered board fragments: size of the in-process LRU, and an optional
+    # directory that lets every worker process reuse the others' renders
+    BOARD_CACHE_MAX_BYTES = int(os.environ.get('BOARD_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    BOARD_CACHE_DIR = os.environ.get('BOARD_CACHE_DIR')
+
+    # Board change feed: versions of history kept per board, how often
+    # waiting clients poll the event table, and how long a single SSE
+    # stream or long poll is held open before the client reconnects
+    EVENT_HISTORY = 200
+    EVENT_POLL_INTERVAL = 1.0
+    EVENT_STREAM_TIMEOUT = 25
+    EVENT_LONG_POLL_TIMEOUT = 25
+
+    # Streams and long polls each worker holds open at once; clients past
+    # the limit poll every EVENT_RETRY_AFTER seconds instead. Keep it below
+    # the threads per worker so ordinary requests always find one free
+    EVENT_MAX_WAITERS = int(os.environ.get('EVENT_MAX_WAITERS', 4))
+    EVENT_RETRY_AFTER = 5
@@ -1,6 +1,9 @@
-from app import create_app
+from app import create_app, db, migrations
 
 app = create_app()
 
 if __name__ == '__main__':
+    # The development server brings its own database up to date
+    with app.app_context():
+        migrations.upgrade(db.engine, batch_size=app.config['MIGRATION_BATCH_SIZE'], echo=print)
     app.run(debug=True, host="0.0.0.0")
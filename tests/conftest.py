@@ -2,6 +2,7 @@ import os
 import pytest
 import tempfile
 import sys
+from sqlalchemy import event
 
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
@@ -16,6 +17,8 @@ class TestConfig(Config):
     TESTING = True
     WTF_CSRF_ENABLED = False
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # Worker threads cannot share the in-memory database safely
+    JOBS_INLINE = True
 
 
 @pytest.fixture
@@ -31,6 +34,34 @@ def app():
         db.drop_all()
 
 
+class QueryCounter:
+    """Context manager that records every SQL statement sent to the engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries(app):
+    """Factory for QueryCounter instances bound to the app's engine."""
+    return lambda: QueryCounter(db.engine)
+
+
 @pytest.fixture
 def client(app):
     """A test client for the app."""
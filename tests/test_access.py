@@ -0,0 +1,69 @@
+import pytest
+
+from app import db
+from app.access import AccessResolver, get_access
+from app.models import User, Board, board_shares
+
+
+def test_owner_permissions_need_no_queries(app, init_database, count_queries):
+    with app.app_context():
+        owner = User.query.filter_by(username='testuser').first()
+        board = Board.query.filter_by(title='Test Board').first()
+        resolver = AccessResolver(owner)
+
+        with count_queries() as queries:
+            assert resolver.is_owner(board) is True
+            assert resolver.can_view(board) is True
+            assert resolver.can_edit(board) is True
+
+        assert queries.count == 0
+
+
+def test_shares_loaded_once(app, init_database, count_queries):
+    with app.app_context():
+        viewer = User.query.filter_by(username='otheruser').first()
+        board = Board.query.filter_by(title='Test Board').first()
+        resolver = AccessResolver(viewer)
+
+        with count_queries() as queries:
+            for _ in range(5):
+                assert resolver.is_owner(board) is False
+                assert resolver.can_view(board) is True
+                assert resolver.can_edit(board) is False
+
+        assert queries.count == 1
+
+
+def test_get_access_is_per_request(app, init_database):
+    with app.app_context():
+        viewer = User.query.filter_by(username='otheruser').first()
+
+        with app.test_request_context():
+            from flask_login import login_user
+            login_user(viewer)
+            assert get_access() is get_access()
+            assert get_access().user_id == viewer.id
+
+
+def test_boards_page_checks_shares_once(other_auth_client, app, init_database, count_queries):
+    with app.app_context():
+        owner = User.query.filter_by(username='testuser').first()
+        viewer = User.query.filter_by(username='otheruser').first()
+        for i in range(10):
+            board = Board(title=f'Shared {i}', user_id=owner.id)
+            db.session.add(board)
+            db.session.flush()
+            db.session.execute(board_shares.insert().values(
+                user_id=viewer.id, board_id=board.id, can_edit=i % 2 == 0))
+        db.session.commit()
+        db.session.expunge_all()
+
+        with count_queries() as queries:
+            response = other_auth_client.get('/boards')
+
+        assert response.status_code == 200
+        # Shares are read inside the single dashboard statement, not per
+        # board, and once more to list the templates for the new board form
+        share_queries = [s for s in queries.statements if 'board_shares' in s]
+        assert len(share_queries) == 2
+        assert sum(s.startswith('WITH accessible') for s in share_queries) == 1
@@ -0,0 +1,204 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.archive import archive_stale, restore
+from app.models import Column, Card, ArchivedCard, BoardEvent
+from app.search import search
+
+
+def column(title):
+    return Column.query.filter_by(title=title).first()
+
+
+def add_done_cards(ages):
+    """Add a card to Done for each age in days, named after its age."""
+    done = column('Done')
+    now = datetime.utcnow()
+    db.session.add_all([Card(title=f'Done {age}', position=i, column_id=done.id, moved_at=now - timedelta(days=age))
+                        for i, age in enumerate(ages)])
+    db.session.commit()
+    return done
+
+
+def last_event(board_id):
+    event = BoardEvent.query.filter_by(board_id=board_id).order_by(BoardEvent.id.desc()).first()
+    return event.kind, json.loads(event.payload)
+
+
+def test_archive_card(auth_client, app, init_database):
+    card = Card.query.filter_by(title='Test Card 1').first()
+    card_id, board = card.id, card.column.board
+    version = board.version
+
+    response = auth_client.post(f'/card/{card_id}/archive', headers={'Accept': 'application/json'})
+
+    assert response.json == {'success': True, 'cardIds': [card_id]}
+    assert db.session.get(Card, card_id) is None
+    archived = ArchivedCard.query.one()
+    assert (archived.title, archived.description, archived.position) == ('Test Card 1', 'Description 1', 0)
+    db.session.refresh(board)
+    assert board.version == version + 1
+    assert last_event(board.id) == ('cards_archived', {'cardIds': [card_id]})
+
+
+def test_archive_requires_edit_access(other_auth_client, app, init_database):
+    card = Card.query.filter_by(title='Test Card 1').first()
+
+    assert other_auth_client.post(f'/card/{card.id}/archive').status_code == 403
+    assert other_auth_client.post(f'/column/{card.column_id}/archive').status_code == 403
+
+
+def test_archive_column_is_set_based(auth_client, app, init_database, count_queries):
+    todo = column('To Do')
+    db.session.add_all([Card(title=f'Extra {i}', position=2 + i, column_id=todo.id) for i in range(50)])
+    db.session.commit()
+
+    with count_queries() as queries:
+        response = auth_client.post(f'/column/{todo.id}/archive', headers={'Accept': 'application/json'})
+
+    assert len(response.json['cardIds']) == 52
+    writes = [s for s in queries.statements if s.startswith(('INSERT INTO card_archive', 'DELETE FROM card'))]
+    assert len(writes) == 2
+    assert Card.query.filter_by(column_id=todo.id).count() == 0
+    assert ArchivedCard.query.filter_by(column_id=todo.id).count() == 52
+
+
+def test_archive_column_older_than(auth_client, app, init_database):
+    done = add_done_cards([1, 10, 40])
+
+    auth_client.post(f'/column/{done.id}/archive', data={'days': 7})
+
+    assert [card.title for card in Card.query.filter_by(column_id=done.id)] == ['Done 1']
+
+
+@pytest.mark.parametrize('days', ['0', '-5', '-99999999999', '99999999999', 'abc'])
+def test_archive_column_rejects_bad_days(auth_client, app, init_database, days):
+    done = add_done_cards([1, 10, 40])
+
+    response = auth_client.post(f'/column/{done.id}/archive', data={'days': days},
+                                headers={'Accept': 'application/json'})
+
+    assert response.status_code == 400
+    assert response.json['success'] is False
+    assert Card.query.filter_by(column_id=done.id).count() == 3
+    assert auth_client.post(f'/column/{done.id}/archive', data={'days': days}).status_code == 400
+
+
+def test_policy_archives_old_done_cards(app, init_database):
+    add_done_cards([5, 31, 90])
+    # Old, but not done
+    Card.query.filter_by(title='Test Card 1').first().moved_at = datetime.utcnow() - timedelta(days=100)
+    db.session.commit()
+
+    archived = archive_stale(days=30)
+    db.session.commit()
+
+    assert sorted(card.title for card in ArchivedCard.query) == ['Done 31', 'Done 90']
+    assert Card.query.filter_by(title='Test Card 1').count() == 1
+    assert sum(len(card_ids) for card_ids in archived.values()) == 2
+
+
+def test_moving_card_resets_moved_at(auth_client, app, init_database):
+    card = Card.query.filter_by(title='Test Card 1').first()
+    card.moved_at = datetime(2020, 1, 1)
+    db.session.commit()
+
+    auth_client.post(f'/card/{card.id}/move', json={'columnId': column('Done').id, 'position': 0})
+
+    db.session.refresh(card)
+    assert card.moved_at > datetime(2020, 1, 1)
+
+
+def test_restore(auth_client, app, init_database):
+    card = Card.query.filter_by(title='Test Card 2').first()
+    column_id, board_id = card.column_id, card.column.board_id
+    auth_client.post(f'/card/{card.id}/archive')
+    archived = ArchivedCard.query.one()
+
+    response = auth_client.post(f'/archive/{archived.id}/restore', headers={'Accept': 'application/json'})
+
+    restored = response.json['card']
+    assert (restored['title'], restored['columnId'], restored['position']) == ('Test Card 2', column_id, 1)
+    assert ArchivedCard.query.count() == 0
+    assert last_event(board_id)[0] == 'card_created'
+    assert [card.title for card in Card.query.filter_by(column_id=column_id).order_by(Card.position)] == [
+        'Test Card 1', 'Test Card 2']
+
+
+def test_restored_card_is_not_archived_again_by_policy(app, init_database):
+    done = add_done_cards([60])
+    archive_stale(days=30)
+    db.session.commit()
+
+    restore(ArchivedCard.query.one())
+    db.session.commit()
+    archive_stale(days=30)
+
+    assert Card.query.filter_by(column_id=done.id).count() == 1
+
+
+def test_archive_page(auth_client, app, init_database):
+    app.config['ARCHIVE_PAGE_SIZE'] = 2
+    done = add_done_cards([1, 2, 3])
+    auth_client.post(f'/column/{done.id}/archive')
+    board_id = done.board_id
+
+    first = auth_client.get(f'/board/{board_id}/archive', headers={'Accept': 'application/json'}).json
+    after = first['next']
+    second = auth_client.get(f'/board/{board_id}/archive', headers={'Accept': 'application/json'},
+                             query_string={'before_at': after['beforeAt'], 'before_id': after['beforeId']}).json
+
+    titles = [card['title'] for card in first['cards'] + second['cards']]
+    assert sorted(titles) == ['Done 1', 'Done 2', 'Done 3']
+    assert second['next'] is None
+    assert first['cards'][0]['columnTitle'] == 'Done'
+
+    page = auth_client.get(f'/board/{board_id}/archive')
+    assert b'Restore' in page.data
+    # Archived cards are not rendered on the board
+    assert b'Done 1' not in auth_client.get(f'/board/{board_id}').data
+
+
+def test_archived_cards_stay_searchable(auth_client, app, init_database):
+    card = Card.query.filter_by(title='Test Card 1').first()
+    owner_id = card.column.board.user_id
+    auth_client.post(f'/card/{card.id}/archive')
+
+    results, _ = search(owner_id, 'Description 1')
+
+    assert [(result['kind'], result['title']) for result in results] == [('archived_card', 'Test Card 1')]
+    response = auth_client.get('/search', query_string={'q': 'Description 1'})
+    assert b'#archived-' in response.data
+
+
+def test_policy_route_runs_job(auth_client, app, init_database):
+    done = add_done_cards([10, 20])
+
+    response = auth_client.post(f'/board/{done.board_id}/archive/policy', data={'days': 15},
+                                follow_redirects=True)
+
+    assert b'Archived 1 cards.' in response.data
+    assert [card.title for card in ArchivedCard.query] == ['Done 20']
+
+
+def test_deleting_column_deletes_its_archive(auth_client, app, init_database):
+    done = add_done_cards([1])
+    auth_client.post(f'/column/{done.id}/archive')
+
+    auth_client.post(f'/column/{done.id}/delete')
+
+    assert ArchivedCard.query.count() == 0
+
+
+def test_archive_cards_command(runner, app, init_database):
+    add_done_cards([3, 45])
+
+    result = runner.invoke(args=['archive-cards'])
+    assert 'Archived 1 cards.' in result.output
+
+    result = runner.invoke(args=['archive-cards', '--days', '1', '--column', 'done'])
+    assert 'Archived 1 cards.' in result.output
+    assert ArchivedCard.query.count() == 2
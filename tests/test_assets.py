@@ -0,0 +1,200 @@
+import gzip
+import json
+import os
+import shutil
+
+import pytest
+from flask import url_for
+
+from app import assets
+
+
+FONT_CSS = ('@font-face{font-family:"Icons";src:url(../webfonts/icons.woff2) format("woff2"),'
+            'url("../webfonts/icons.ttf?v=1") format("truetype")}'
+            '.logo{background:url("data:image/svg+xml,%3csvg%3e%3c/svg%3e")}' + '.icon{display:inline-block}' * 50)
+
+
+@pytest.fixture
+def static(app, tmp_path):
+    """A copy of the app's static files, with a vendored stylesheet and its fonts."""
+    folder = tmp_path / 'static'
+    shutil.copytree(app.static_folder, folder, ignore=shutil.ignore_patterns(assets.DIST, 'vendor'))
+    fonts = folder / 'vendor' / 'icons' / 'webfonts'
+    fonts.mkdir(parents=True)
+    (fonts / 'icons.woff2').write_bytes(b'wOF2' + bytes(range(256)))
+    (fonts / 'icons.ttf').write_bytes(b'\0\1\0\0' + b'glyph' * 200)
+    (folder / 'vendor' / 'icons' / 'css').mkdir()
+    (folder / 'vendor' / 'icons' / 'css' / 'icons.css').write_text(FONT_CSS)
+    app.static_folder = str(folder)
+    return folder
+
+
+@pytest.fixture
+def built(app, static):
+    manifest = assets.build(str(static))
+    assets.load_manifest(app)
+    return manifest
+
+
+def read_dist(static, name):
+    return (static / assets.DIST / name).read_bytes()
+
+
+def test_build_writes_fingerprinted_copies(static, built):
+    assert built['css/style.css'].startswith('css/style.') and built['css/style.css'].endswith('.css')
+    style = (static / 'css' / 'style.css').read_bytes()
+    assert read_dist(static, built['css/style.css']) == style
+    assert built['css/style.css'] == assets.fingerprinted_name('css/style.css', style)
+    assert json.loads(read_dist(static, assets.MANIFEST)) == built
+
+
+def test_build_writes_compressed_variants(static, built):
+    script = built['js/script.js']
+    assert gzip.decompress(read_dist(static, script + '.gz')) == read_dist(static, script)
+    # Already compressed formats are left alone
+    assert not (static / assets.DIST / (built['vendor/icons/webfonts/icons.woff2'] + '.gz')).exists()
+    assert (static / assets.DIST / (built['vendor/icons/webfonts/icons.ttf'] + '.gz')).exists()
+
+
+def test_build_writes_brotli_variants(static, built):
+    brotli = pytest.importorskip('brotli')
+    script = built['js/script.js']
+    assert brotli.decompress(read_dist(static, script + '.br')) == read_dist(static, script)
+
+
+def test_build_rewrites_stylesheet_references(static, built):
+    css = read_dist(static, built['vendor/icons/css/icons.css']).decode()
+    woff2 = os.path.basename(built['vendor/icons/webfonts/icons.woff2'])
+    ttf = os.path.basename(built['vendor/icons/webfonts/icons.ttf'])
+    assert f'url(../webfonts/{woff2})' in css
+    assert f'url("../webfonts/{ttf}?v=1")' in css
+    assert 'url("data:image/svg+xml,%3csvg%3e%3c/svg%3e")' in css
+
+
+def test_changed_file_gets_new_name(static, built):
+    (static / 'vendor' / 'icons' / 'webfonts' / 'icons.ttf').write_bytes(b'\0\1\0\0' + b'other' * 200)
+
+    manifest = assets.build(str(static))
+
+    assert manifest['vendor/icons/webfonts/icons.ttf'] != built['vendor/icons/webfonts/icons.ttf']
+    # The stylesheet references the font by its new name, so it changes too
+    assert manifest['vendor/icons/css/icons.css'] != built['vendor/icons/css/icons.css']
+    assert manifest['css/style.css'] == built['css/style.css']
+    # The previous build stays available to pages rendered before it
+    assert (static / assets.DIST / built['vendor/icons/webfonts/icons.ttf']).exists()
+
+
+def test_url_for_uses_fingerprinted_names(app, built):
+    with app.test_request_context():
+        assert url_for('static', filename='css/style.css') == f"/static/dist/{built['css/style.css']}"
+        assert url_for('static', filename='not-built.css') == '/static/not-built.css'
+
+
+def test_pages_link_fingerprinted_assets(auth_client, built):
+    page = auth_client.get('/boards').get_data(as_text=True)
+
+    assert f"/static/dist/{built['css/style.css']}" in page
+    assert f"/static/dist/{built['js/script.js']}" in page
+
+
+def test_vendor_url_falls_back_to_cdn(app, static):
+    with app.test_request_context():
+        assert assets.vendor_url('vendor/bootstrap/css/bootstrap.min.css') == \
+            assets.VENDOR['vendor/bootstrap/css/bootstrap.min.css']
+
+    (static / 'vendor' / 'bootstrap' / 'css').mkdir(parents=True)
+    (static / 'vendor' / 'bootstrap' / 'css' / 'bootstrap.min.css').write_text('.btn{}')
+    with app.test_request_context():
+        assert assets.vendor_url('vendor/bootstrap/css/bootstrap.min.css') == \
+            '/static/vendor/bootstrap/css/bootstrap.min.css'
+
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('br, gzip', 'br'),
+    ('gzip, deflate', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('', None),
+])
+def test_fingerprinted_assets_are_negotiated(client, static, built, accept, encoding):
+    if encoding == 'br':
+        pytest.importorskip('brotli')
+    script = built['js/script.js']
+    suffix = {'br': '.br', 'gzip': '.gz', None: ''}[encoding]
+
+    response = client.get(f'/static/dist/{script}', headers={'Accept-Encoding': accept})
+
+    assert response.status_code == 200
+    assert response.headers.get('Content-Encoding') == encoding
+    assert response.get_data() == read_dist(static, script + suffix)
+    assert response.mimetype == 'text/javascript'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.cache_control.immutable and response.cache_control.public
+    assert response.cache_control.max_age == 365 * 24 * 3600
+
+
+def test_unknown_fingerprinted_asset_is_404(client, built):
+    assert client.get('/static/dist/css/style.000000000000.css').status_code == 404
+    assert client.get('/static/dist/../../config.py').status_code == 404
+
+
+def test_vendor_fetches_missing_files_and_their_fonts(static):
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        if url.endswith('.css'):
+            return b'@font-face{src:url(../webfonts/fa-solid-900.woff2)}'
+        if url.endswith('.woff2'):
+            return b'wOF2'
+        raise OSError('unreachable')
+
+    missing = assets.vendor(str(static), fetch=fetch)
+
+    assert missing == ['vendor/bootstrap/js/bootstrap.bundle.min.js']
+    assert 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/fa-solid-900.woff2' in fetched
+    assert (static / 'vendor' / 'fontawesome' / 'webfonts' / 'fa-solid-900.woff2').read_bytes() == b'wOF2'
+    assert (static / 'vendor' / 'bootstrap' / 'css' / 'bootstrap.min.css').exists()
+
+    # Vendored files are not fetched again
+    fetched.clear()
+    assets.vendor(str(static), fetch=fetch)
+    assert fetched == ['https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/js/bootstrap.bundle.min.js']
+
+
+def test_assets_build_fails_without_vendored_files(runner, app, static, monkeypatch):
+    def unreachable(url):
+        raise OSError('no network')
+
+    monkeypatch.setattr(assets, '_fetch', unreachable)
+
+    result = runner.invoke(args=['assets', 'build'])
+
+    assert result.exit_code == 1
+    assert 'Missing static/vendor/bootstrap/css/bootstrap.min.css' in result.output
+    assert 'vendored files are missing' in result.output
+    assert not (static / assets.DIST).exists()
+    assert runner.invoke(args=['assets', 'vendor']).exit_code == 1
+
+
+def test_assets_build_offline(runner, app, static, monkeypatch):
+    def fetch(url):
+        raise AssertionError(f'fetched {url} offline')
+
+    monkeypatch.setattr(assets, '_fetch', fetch)
+    for name in assets.VENDOR:
+        path = static.joinpath(*name.split('/'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('@font-face{src:url(../webfonts/fa-solid-900.woff2)}' if 'fontawesome' in name else '')
+
+    result = runner.invoke(args=['assets', 'build', '--offline'])
+    # The stylesheets' fonts are checked too
+    assert result.exit_code == 1
+    assert 'Missing static/vendor/fontawesome/webfonts/fa-solid-900.woff2' in result.output
+
+    (static / 'vendor' / 'fontawesome' / 'webfonts').mkdir()
+    (static / 'vendor' / 'fontawesome' / 'webfonts' / 'fa-solid-900.woff2').write_bytes(b'wOF2')
+    result = runner.invoke(args=['assets', 'build', '--offline'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Fingerprinted' in result.output
+    assert 'vendor/bootstrap/css/bootstrap.min.css' in app.extensions['assets']
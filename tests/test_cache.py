@@ -0,0 +1,105 @@
+
+from app import db
+from app.cache import MemoryBackend, FileSystemBackend, BoardFragmentCache, get_board_cache
+from app.models import Board, Column
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_bytes=10)
+    backend.set('a', 'aaaa')
+    backend.set('b', 'bbbb')
+    assert backend.get('a') == 'aaaa'
+
+    # "b" is now the least recently used entry
+    backend.set('c', 'cccc')
+    assert backend.get('b') is None
+    assert backend.get('a') == 'aaaa'
+    assert backend.get('c') == 'cccc'
+    assert backend.size == 8
+
+
+def test_memory_backend_skips_oversized_values():
+    backend = MemoryBackend(max_bytes=4)
+    backend.set('a', 'too large')
+    assert backend.get('a') is None
+    assert backend.size == 0
+
+
+def test_filesystem_backend_round_trip(tmp_path):
+    backend = FileSystemBackend(str(tmp_path), max_bytes=1024)
+    assert backend.get('board-1-v1-edit') is None
+    backend.set('board-1-v1-edit', '<div>ü</div>')
+    assert backend.get('board-1-v1-edit') == '<div>ü</div>'
+    backend.delete('board-1-v1-edit')
+    assert backend.get('board-1-v1-edit') is None
+
+
+def test_filesystem_backend_prunes_to_size(tmp_path):
+    backend = FileSystemBackend(str(tmp_path), max_bytes=10)
+    backend.set('first', 'x' * 6)
+    backend.set('second', 'y' * 6)
+    assert backend.get('second') == 'y' * 6
+    assert backend.get('first') is None
+
+
+def test_fragment_cache_drops_older_versions():
+    cache = BoardFragmentCache(max_bytes=1024)
+    cache.set(1, 1, True, 'v1')
+    cache.set(1, 2, True, 'v2')
+    assert cache.get(1, 1, True) is None
+    assert cache.get(1, 2, True) == 'v2'
+    assert cache.get(1, 2, False) is None
+
+
+def test_fragment_cache_shared_between_workers(tmp_path):
+    first_worker = BoardFragmentCache(max_bytes=1024, directory=str(tmp_path))
+    second_worker = BoardFragmentCache(max_bytes=1024, directory=str(tmp_path))
+
+    first_worker.set(7, 3, False, '<div>board</div>')
+    assert second_worker.get(7, 3, False) == '<div>board</div>'
+
+    first_worker.set(7, 4, False, '<div>newer</div>')
+    assert second_worker.get(7, 4, False) == '<div>newer</div>'
+    assert not (tmp_path / 'board-7-v3-view.html').exists()
+
+
+def test_board_page_served_from_cache(auth_client, app, init_database, count_queries):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        board_id = board.id
+
+        first = auth_client.get(f'/board/{board_id}')
+        assert first.status_code == 200
+        assert get_board_cache().get(board_id, board.version, True) is not None
+        db.session.expunge_all()
+
+        with count_queries() as queries:
+            second = auth_client.get(f'/board/{board_id}')
+
+        assert second.status_code == 200
+        assert b'Test Card 1' in second.data
+        assert not any('FROM card' in statement for statement in queries.statements)
+
+
+def test_board_cache_invalidated_by_mutation(auth_client, app, init_database):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        column = Column.query.filter_by(title='In Progress').first()
+
+        assert b'Cached Card' not in auth_client.get(f'/board/{board.id}').data
+        auth_client.post(f'/column/{column.id}/card/new', data={'title': 'Cached Card'})
+        assert b'Cached Card' in auth_client.get(f'/board/{board.id}').data
+
+
+def test_board_cache_keyed_on_permission(auth_client, other_auth_client, app, init_database):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+
+        owner_page = auth_client.get(f'/board/{board.id}').data
+        assert b'/card/' in owner_page
+
+        auth_client.get('/logout')
+        other_auth_client.post('/login', data={'email': 'other@example.com', 'password': 'password'})
+        viewer_page = other_auth_client.get(f'/board/{board.id}').data
+        assert b'Test Card 1' in viewer_page
+        assert b'/card/' not in viewer_page
@@ -0,0 +1,156 @@
+import json
+
+import pytest
+
+from app import db
+from app.cloning import DEFAULT_COLUMNS, copy_board, create_board, templates_for
+from app.models import User, Board, BoardEvent, Column, Card, board_shares
+
+
+def contents(board_id):
+    columns = Column.query.filter_by(board_id=board_id).order_by(Column.position, Column.id).all()
+    return [(column.title, column.position,
+             [(card.title, card.description, card.position)
+              for card in Card.query.filter_by(column_id=column.id).order_by(Card.position)])
+            for column in columns]
+
+
+@pytest.fixture
+def source(app, init_database):
+    """A board whose column ids are not in position order, with a tie."""
+    owner = User.query.filter_by(email='test@example.com').first()
+    board = Board(title='Sprint', user_id=owner.id)
+    db.session.add(board)
+    db.session.flush()
+    for title, position in [('Done', 2), ('Backlog', 0), ('Review', 1), ('Blocked', 1)]:
+        column = Column(title=title, position=position, board_id=board.id)
+        db.session.add(column)
+        db.session.flush()
+        db.session.add_all([Card(title=f'{title} {i}', description=f'About {title}', position=i / 2,
+                                 column_id=column.id) for i in range(3)])
+    db.session.commit()
+    return board
+
+
+def test_copy_board_copies_columns_and_cards(app, source, count_queries):
+    other = User.query.filter_by(email='other@example.com').first()
+
+    with count_queries() as queries:
+        copy = copy_board(source.id, other.id, 'Sprint 2')
+        db.session.commit()
+
+    assert copy.user_id == other.id
+    assert contents(copy.id) == contents(source.id)
+    inserts = [s for s in queries.statements if s.startswith('INSERT INTO "column"') or s.startswith('INSERT INTO card')]
+    assert len(inserts) == 2
+    assert all('SELECT' in s for s in inserts)
+
+
+def test_copy_board_without_cards(app, source):
+    copy = copy_board(source.id, source.user_id, 'Empty sprint', include_cards=False)
+    db.session.commit()
+
+    assert [(title, position, cards) for title, position, cards in contents(copy.id)] == [
+        (title, position, []) for title, position, _ in contents(source.id)
+    ]
+
+
+def test_create_board_with_default_columns(app, init_database):
+    owner = User.query.filter_by(email='test@example.com').first()
+
+    board = create_board(owner.id, 'Fresh')
+    db.session.commit()
+
+    assert [(title, position) for title, position, _ in contents(board.id)] == list(
+        zip(DEFAULT_COLUMNS, range(len(DEFAULT_COLUMNS))))
+
+
+def test_templates_for_includes_shared_templates(app, source):
+    other = User.query.filter_by(email='other@example.com').first()
+    assert templates_for(other.id) == []
+
+    source.is_template = True
+    db.session.execute(board_shares.insert().values(user_id=other.id, board_id=source.id))
+    db.session.commit()
+
+    assert [title for _, title in templates_for(other.id)] == ['Sprint']
+
+
+def test_new_board_from_template(auth_client, app, source):
+    source.is_template = True
+    db.session.commit()
+
+    response = auth_client.post('/board/new', data={'title': 'Sprint 3', 'template': source.id})
+
+    assert response.status_code == 302
+    board = Board.query.filter_by(title='Sprint 3').one()
+    assert contents(board.id) == contents(source.id)
+
+
+def test_new_board_rejects_inaccessible_template(app, source):
+    source.is_template = True
+    db.session.commit()
+    stranger = User(username='stranger', email='stranger@example.com')
+    stranger.set_password('password')
+    db.session.add(stranger)
+    db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'stranger@example.com', 'password': 'password'})
+    client.post('/board/new', data={'title': 'Stolen', 'template': source.id})
+    client.post('/board/new', data={'title': 'Allowed', 'template': 0})
+
+    assert Board.query.filter_by(title='Stolen').first() is None
+    assert Board.query.filter_by(title='Allowed').one().user_id == stranger.id
+
+
+def test_duplicate_board_route(auth_client, app, source):
+    response = auth_client.post(f'/board/{source.id}/duplicate', data={'title': 'Copy', 'include_cards': 'y'},
+                                headers={'Accept': 'application/json'})
+
+    assert response.status_code == 201
+    assert contents(response.json['board']['id']) == contents(source.id)
+
+
+def test_duplicate_shared_board(other_auth_client, app, init_database):
+    board = Board.query.filter_by(title='Test Board').first()
+    other = User.query.filter_by(email='other@example.com').first()
+
+    response = other_auth_client.post(f'/board/{board.id}/duplicate', data={'title': 'Mine now'})
+
+    copy = Board.query.filter_by(title='Mine now').one()
+    assert response.headers['Location'] == f'/board/{copy.id}'
+    assert copy.user_id == other.id
+    assert copy.shared_with == []
+    # Unchecked box: columns only
+    assert all(cards == [] for _, _, cards in contents(copy.id))
+
+
+def test_toggle_template(auth_client, app, init_database):
+    board = Board.query.filter_by(title='Test Board').first()
+
+    auth_client.post(f'/board/{board.id}/template')
+    db.session.refresh(board)
+    assert board.is_template
+    event = BoardEvent.query.filter_by(board_id=board.id).one()
+    assert (event.version, event.kind, json.loads(event.payload)) == (board.version, 'board_updated', {'isTemplate': True})
+    assert b'Stop Using as Template' in auth_client.get(f'/board/{board.id}').data
+
+
+def test_toggle_template_is_owner_only(other_auth_client, app, init_database):
+    board = Board.query.filter_by(title='Test Board').first()
+
+    assert other_auth_client.post(f'/board/{board.id}/template').status_code == 403
+
+
+def test_new_column_after_first_column(auth_client, app, init_database):
+    owner = User.query.filter_by(email='test@example.com').first()
+    board = Board(title='One column', user_id=owner.id)
+    db.session.add(board)
+    db.session.flush()
+    db.session.add(Column(title='Only', position=0, board_id=board.id))
+    db.session.commit()
+
+    auth_client.post(f'/board/{board.id}/column/new', data={'title': 'Second'})
+
+    assert [(title, position) for title, position, _ in contents(board.id)] == [('Only', 0), ('Second', 1)]
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.dashboard import dashboard, encode_cursor, decode_cursor
+from app.models import User, Board
+
+
+def user(email):
+    return User.query.filter_by(email=email).first()
+
+
+def add_boards(owner, count):
+    start = datetime(2024, 1, 1)
+    boards = [Board(title=f'Board {i:02d}', user_id=owner.id, updated_at=start + timedelta(hours=i))
+              for i in range(count)]
+    db.session.add_all(boards)
+    db.session.commit()
+    return boards
+
+
+def test_dashboard_summarises_boards(app, init_database):
+    boards, has_more = dashboard(user('test@example.com').id)
+    assert not has_more
+    [board] = boards
+    assert (board.title, board.is_owner, board.can_edit) == ('Test Board', True, True)
+    assert (board.column_count, board.card_count) == (3, 2)
+    assert board.owner == 'testuser'
+
+    [shared], _ = dashboard(user('other@example.com').id)
+    assert (shared.title, shared.is_owner, shared.can_edit) == ('Test Board', False, False)
+    assert (shared.column_count, shared.card_count) == (3, 2)
+
+
+def test_dashboard_is_one_statement(app, init_database, count_queries):
+    owner = user('test@example.com')
+    add_boards(owner, 20)
+    owner_id = owner.id
+
+    with count_queries() as queries:
+        dashboard(owner_id, limit=10)
+
+    assert queries.count == 1
+
+
+def test_dashboard_pages_by_title(app, init_database):
+    owner = user('test@example.com')
+    add_boards(owner, 7)
+
+    titles, after = [], None
+    while True:
+        boards, has_more = dashboard(owner.id, sort='title', after=after, limit=3)
+        titles += [board.title for board in boards]
+        if not has_more:
+            break
+        after = decode_cursor('title', encode_cursor('title', boards[-1]))
+
+    assert titles == [f'Board {i:02d}' for i in range(7)] + ['Test Board']
+
+
+def test_dashboard_pages_by_last_update(app, init_database):
+    owner = user('test@example.com')
+    Board.query.filter_by(title='Test Board').first().updated_at = datetime(2020, 1, 1)
+    add_boards(owner, 5)
+
+    first, has_more = dashboard(owner.id, sort='updated', limit=4)
+    assert has_more
+    after = decode_cursor('updated', encode_cursor('updated', first[-1]))
+    second, has_more = dashboard(owner.id, sort='updated', after=after, limit=4)
+    assert not has_more
+
+    assert [board.title for board in first + second] == [f'Board {i:02d}' for i in range(4, -1, -1)] + ['Test Board']
+
+
+def test_dashboard_filters(app, init_database):
+    other = user('other@example.com')
+    db.session.add(Board(title='Own Board', user_id=other.id))
+    db.session.commit()
+
+    def titles(show):
+        return [board.title for board in dashboard(other.id, sort='title', show=show)[0]]
+
+    assert titles('all') == ['Own Board', 'Test Board']
+    assert titles('owned') == ['Own Board']
+    assert titles('shared') == ['Test Board']
+
+
+def test_decode_cursor_rejects_garbage():
+    assert decode_cursor('title', 'not a cursor') is None
+    assert decode_cursor('updated', encode_cursor('title', Board(id=1, title='x'))) is None
+
+
+def test_boards_route_json(auth_client, app, init_database):
+    add_boards(user('test@example.com'), 3)
+    app.config['DASHBOARD_PAGE_SIZE'] = 2
+
+    data = auth_client.get('/boards?sort=title', headers={'Accept': 'application/json'}).get_json()
+    assert [board['title'] for board in data['boards']] == ['Board 00', 'Board 01']
+    assert data['boards'][0]['cardCount'] == 0
+
+    data = auth_client.get(f'/boards?sort=title&after={data["next"]}',
+                           headers={'Accept': 'application/json'}).get_json()
+    assert [board['title'] for board in data['boards']] == ['Board 02', 'Test Board']
+    assert data['next'] is None
+
+
+def test_boards_page_shows_counts(auth_client, init_database):
+    response = auth_client.get('/boards')
+    assert b'3 columns, 2 cards' in response.data
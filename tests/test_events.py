@@ -0,0 +1,180 @@
+import pytest
+import json
+
+from app import db, events
+from app.models import User, Board, Column, Card, BoardEvent
+
+
+@pytest.fixture
+def fast_feed(app):
+    app.config.update(EVENT_POLL_INTERVAL=0.01, EVENT_STREAM_TIMEOUT=0.1, EVENT_LONG_POLL_TIMEOUT=0.1)
+
+
+def test_mutations_publish_events(auth_client, app, init_database):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        column = Column.query.filter_by(title='To Do').first()
+        card = Card.query.filter_by(title='Test Card 1').first()
+        version = board.version
+
+        auth_client.post(f'/column/{column.id}/card/new', data={'title': 'Evented'})
+        auth_client.post(f'/card/{card.id}/move', json={'columnId': column.id, 'position': 5})
+        auth_client.post(f'/card/{card.id}/delete')
+        auth_client.post(f'/board/{board.id}/column/new', data={'title': 'Later'})
+
+        changes = events.events_since(board.id, version)
+        assert [change['kind'] for change in changes] == [
+            'card_created', 'card_moved', 'card_deleted', 'column_added'
+        ]
+        assert [change['version'] for change in changes] == [version + 1, version + 2, version + 3, version + 4]
+        assert changes[0]['data']['card']['title'] == 'Evented'
+        assert changes[2]['data'] == {'cardId': card.id}
+
+
+def test_poll_detects_pruned_history(app, init_database):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        for _ in range(3):
+            version = Board.bump_version(board.id)
+            events.publish(board.id, version, 'column_deleted', columnId=1)
+        db.session.commit()
+
+        current, changes, resync = events.poll(board.id, version - 3)
+        assert current == version
+        assert len(changes) == 3
+        assert resync is False
+
+        BoardEvent.query.filter_by(board_id=board.id, version=version - 2).delete()
+        db.session.commit()
+        current, changes, resync = events.poll(board.id, version - 3)
+        assert resync is True
+
+
+def test_long_poll_returns_changes(auth_client, app, init_database, fast_feed):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        column = Column.query.filter_by(title='To Do').first()
+        version = board.version
+        auth_client.post(f'/column/{column.id}/card/new', data={'title': 'Polled'})
+
+        response = auth_client.get(f'/board/{board.id}/events?version={version}',
+                                   headers={'Accept': 'application/json'})
+        data = json.loads(response.data)
+        assert data['version'] == version + 1
+        assert data['resync'] is False
+        assert data['events'][0]['data']['card']['title'] == 'Polled'
+
+
+def test_long_poll_times_out_without_changes(auth_client, app, init_database, fast_feed):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+
+        response = auth_client.get(f'/board/{board.id}/events', headers={'Accept': 'application/json'})
+        data = json.loads(response.data)
+        assert data['events'] == []
+        assert data['version'] == board.version
+
+
+def test_event_stream(auth_client, app, init_database, fast_feed):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        card = Card.query.filter_by(title='Test Card 1').first()
+        version = board.version
+        auth_client.post(f'/card/{card.id}/delete')
+
+        response = auth_client.get(f'/board/{board.id}/events?version={version}',
+                                   headers={'Accept': 'text/event-stream'})
+        assert response.mimetype == 'text/event-stream'
+        body = response.get_data(as_text=True)
+        assert f'id: {version + 1}\n' in body
+        assert '"kind": "card_deleted"' in body
+
+
+def test_event_stream_resumes_from_last_event_id(auth_client, app, init_database, fast_feed):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        column = Column.query.filter_by(title='To Do').first()
+        version = board.version
+        auth_client.post(f'/column/{column.id}/card/new', data={'title': 'First'})
+        auth_client.post(f'/column/{column.id}/card/new', data={'title': 'Second'})
+
+        response = auth_client.get(f'/board/{board.id}/events?version={version}',
+                                   headers={'Accept': 'text/event-stream',
+                                            'Last-Event-ID': str(version + 1)})
+        body = response.get_data(as_text=True)
+        assert 'Second' in body
+        assert 'First' not in body
+
+
+def test_waiters_are_capped_per_worker(auth_client, app, init_database, fast_feed):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        column = Column.query.filter_by(title='To Do').first()
+        version = board.version
+        auth_client.post(f'/column/{column.id}/card/new', data={'title': 'Busy'})
+        # Every slot is held by other open boards
+        releases = [events.claim_waiter() for _ in range(app.config['EVENT_MAX_WAITERS'])]
+        assert events.claim_waiter() is None
+
+        response = auth_client.get(f'/board/{board.id}/events?version={version}',
+                                   headers={'Accept': 'text/event-stream'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == str(app.config['EVENT_RETRY_AFTER'])
+
+        # A long poll answers at once instead of waiting
+        data = auth_client.get(f'/board/{board.id}/events?version={version}',
+                               headers={'Accept': 'application/json'}).json
+        assert data['retryAfter'] == app.config['EVENT_RETRY_AFTER']
+        assert data['events'][0]['data']['card']['title'] == 'Busy'
+
+        releases.pop()()
+        data = auth_client.get(f'/board/{board.id}/events?version={version + 1}',
+                               headers={'Accept': 'application/json'}).json
+        assert 'retryAfter' not in data
+        # The long poll gave its slot back, and a closed stream does too
+        response = auth_client.get(f'/board/{board.id}/events?version={version}',
+                                   headers={'Accept': 'text/event-stream'})
+        assert response.status_code == 200
+        assert events.claim_waiter() is None
+        response.close()
+        assert events.claim_waiter() is not None
+
+
+def test_events_require_access(app, init_database, fast_feed):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        stranger = User(username='stranger', email='stranger@example.com')
+        stranger.set_password('password')
+        db.session.add(stranger)
+        db.session.commit()
+
+        with app.test_client() as client:
+            client.post('/login', data={'email': 'stranger@example.com', 'password': 'password'})
+            response = client.get(f'/board/{board.id}/events', headers={'Accept': 'application/json'})
+            assert response.status_code == 403
+
+
+def test_card_create_as_json(auth_client, app, init_database):
+    with app.app_context():
+        column = Column.query.filter_by(title='Done').first()
+
+        response = auth_client.post(f'/column/{column.id}/card/new', data={'title': 'Async'},
+                                    headers={'Accept': 'application/json'})
+        assert response.status_code == 201
+        data = json.loads(response.data)
+        assert data['card']['title'] == 'Async'
+        assert data['card']['columnId'] == column.id
+
+        response = auth_client.post(f'/column/{column.id}/card/new', data={'title': ''},
+                                    headers={'Accept': 'application/json'})
+        assert response.status_code == 400
+        assert 'title' in json.loads(response.data)['errors']
+
+
+def test_board_page_has_feed_hooks(auth_client, app, init_database):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        response = auth_client.get(f'/board/{board.id}')
+        assert f'data-version="{board.version}"'.encode() in response.data
+        assert b'id="cardTemplate"' in response.data
+        assert b'/card/0/delete' in response.data
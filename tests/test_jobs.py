@@ -0,0 +1,163 @@
+import io
+import json
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from app import create_app, db, jobs, migrations
+from app.models import User, Board, Card, Job
+from config import Config
+
+release = threading.Event()
+
+
+@jobs.handler('test_echo')
+def echo_job(progress, value):
+    progress(1, total=2)
+    progress(2)
+    return {'value': value}
+
+
+@jobs.handler('test_fail')
+def fail_job(progress, error):
+    raise (ValueError if error == 'value' else RuntimeError)('Something broke')
+
+
+@jobs.handler('test_wait')
+def wait_job(progress):
+    release.wait(5)
+    return {}
+
+
+def owner_id():
+    return User.query.filter_by(email='test@example.com').first().id
+
+
+def test_inline_job_runs_to_completion(app, init_database):
+    job = jobs.submit('test_echo', owner_id(), value=42)
+
+    assert job.status == 'done'
+    assert job.output == {'value': 42}
+    assert (job.progress, job.total) == (2, 2)
+    assert job.started_at and job.finished_at
+
+
+@pytest.mark.parametrize('error, message', [('value', 'Something broke'), ('runtime', 'Internal error')])
+def test_failed_job_records_error(app, init_database, error, message):
+    job = jobs.submit('test_fail', owner_id(), error=error)
+
+    assert job.status == 'failed'
+    assert job.error == message
+
+
+def test_unknown_kind_is_rejected(app, init_database):
+    with pytest.raises(ValueError):
+        jobs.submit('no_such_job', owner_id())
+    assert Job.query.count() == 0
+
+
+def test_threaded_runner_returns_before_job_finishes(tmp_path):
+    config = type('FileConfig', (Config,), {
+        'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "kanban.db"}'
+    })
+    app = create_app(config)
+    with app.app_context():
+        migrations.upgrade(db.engine)
+        user = User(username='u', email='u@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        release.clear()
+
+        job = jobs.submit('test_wait', user.id)
+        assert job.status in ('queued', 'running')
+
+        release.set()
+        jobs.get_runner().shutdown()
+        db.session.refresh(job)
+        assert job.status == 'done'
+        db.engine.dispose()
+
+
+def test_job_of_exited_process_is_failed(app, init_database):
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    job = Job(kind='test_echo', user_id=owner_id(), status='running',
+              worker=f'{socket.gethostname()}:{process.pid}')
+    db.session.add(job)
+    db.session.commit()
+
+    job = jobs.get_job(job.id)
+
+    assert job.status == 'failed'
+    assert 'restart' in job.error
+
+
+def test_job_status_endpoint(auth_client, app, init_database):
+    job = jobs.submit('test_echo', owner_id(), value='x')
+
+    response = auth_client.get(f'/jobs/{job.id}')
+    assert response.status_code == 200
+    assert response.json['status'] == 'done'
+    assert response.json['result'] == {'value': 'x'}
+
+    assert [entry['id'] for entry in auth_client.get('/jobs').json['jobs']] == [job.id]
+    assert auth_client.get('/jobs/999').status_code == 404
+
+
+def test_job_status_is_private(app, init_database):
+    other = User.query.filter_by(email='other@example.com').first()
+    job = jobs.submit('test_echo', owner_id(), value='x')
+
+    client = app.test_client()
+    client.post('/login', data={'email': other.email, 'password': 'password'})
+    assert client.get(f'/jobs/{job.id}').status_code == 403
+
+
+def test_delete_board_returns_job(auth_client, app, init_database):
+    board_id = Board.query.filter_by(title='Test Board').first().id
+
+    response = auth_client.post(f'/board/{board_id}/delete', headers={'Accept': 'application/json'})
+
+    assert response.status_code == 202
+    assert response.headers['Location'] == f'/jobs/{response.json["job"]["id"]}'
+    assert response.json['job']['result'] == {'boardId': board_id}
+    assert db.session.get(Board, board_id) is None
+
+
+def test_import_returns_job(auth_client, app, init_database):
+    content = '\n'.join(json.dumps(record) for record in [
+        {'type': 'board', 'format': 1, 'title': 'Imported'},
+        {'type': 'column', 'id': 1, 'title': 'Only', 'position': 0},
+        {'type': 'card', 'column': 1, 'title': 'A', 'position': 0},
+    ]).encode()
+
+    response = auth_client.post('/boards/import', data={'file': (io.BytesIO(content), 'board.jsonl')},
+                                content_type='multipart/form-data', headers={'Accept': 'application/json'})
+
+    assert response.status_code == 202
+    result = response.json['job']['result']
+    assert result['cards'] == 1
+    assert db.session.get(Board, result['boardId']).title == 'Imported'
+
+
+def test_failed_import_job_removes_partial_board(auth_client, app, init_database):
+    app.config['IMPORT_CHUNK_SIZE'] = 1
+    boards, cards = Board.query.count(), Card.query.count()
+    content = '\n'.join(json.dumps(record) for record in [
+        {'type': 'board', 'format': 1, 'title': 'Broken'},
+        {'type': 'column', 'id': 1, 'title': 'Only', 'position': 0},
+        {'type': 'card', 'column': 1, 'title': 'A', 'position': 0},
+        {'type': 'card', 'column': 1, 'title': 'B', 'position': 1},
+        {'type': 'card', 'column': 2, 'title': 'C', 'position': 2},
+    ]).encode()
+
+    response = auth_client.post('/boards/import', data={'file': (io.BytesIO(content), 'board.jsonl')},
+                                content_type='multipart/form-data', follow_redirects=True)
+
+    assert b'Import failed: Line 5' in response.data
+    assert Board.query.count() == boards
+    assert Card.query.count() == cards
+    assert Job.query.one().status == 'failed'
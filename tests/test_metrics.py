@@ -0,0 +1,130 @@
+import json
+import os
+import re
+
+from app.metrics import Metrics, get_metrics
+from app.models import Board
+
+
+def sample(text, name, **labels):
+    """The value of the sample of ``name`` with exactly ``labels``."""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = re.escape(f'{name}{{{label_text}}}' if labels else name) + r' (\S+)$'
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_metrics_per_endpoint(auth_client, app, init_database, count_queries):
+    board = Board.query.filter_by(title='Test Board').first()
+    with count_queries() as queries:
+        page = auth_client.get(f'/board/{board.id}')
+
+    text = auth_client.get('/metrics').get_data(as_text=True)
+
+    assert sample(text, 'kanely_http_requests_total', endpoint='kanban.board', method='GET', status='200') == 1
+    assert sample(text, 'kanely_db_queries_total', endpoint='kanban.board') == queries.count
+    assert sample(text, 'kanely_http_request_queries_count', endpoint='kanban.board') == 1
+    assert sample(text, 'kanely_http_request_queries_sum', endpoint='kanban.board') == queries.count
+    assert sample(text, 'kanely_http_response_bytes_total', endpoint='kanban.board') == len(page.data)
+    assert sample(text, 'kanely_db_duration_seconds_total', endpoint='kanban.board') > 0
+    assert sample(text, 'kanely_http_request_duration_seconds_bucket', endpoint='kanban.board', le='+Inf') == 1
+    # The login that preceded
+    assert sample(text, 'kanely_http_requests_total', endpoint='auth.login', method='POST', status='302') == 1
+
+
+def test_metrics_format(client, app):
+    client.get('/no-such-page')
+
+    response = client.get('/metrics')
+
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    text = response.get_data(as_text=True)
+    assert '# TYPE kanely_http_request_duration_seconds histogram' in text
+    assert sample(text, 'kanely_http_requests_total', endpoint='unmatched', method='GET', status='404') == 1
+    buckets = re.findall(r'kanely_http_request_duration_seconds_bucket\{endpoint="unmatched",le="[^"]+"\} (\S+)', text)
+    assert len(buckets) == 12
+    assert [float(count) for count in buckets] == sorted(float(count) for count in buckets)
+
+
+def test_metrics_token(client, app):
+    app.config['METRICS_TOKEN'] = 's3cret'
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+
+
+def test_histogram_buckets():
+    metrics = Metrics()
+    for queries in (0, 3, 4, 1000):
+        metrics.observe('kanely_http_request_queries', (('endpoint', 'x'),), queries)
+
+    text = metrics.render()
+
+    assert sample(text, 'kanely_http_request_queries_bucket', endpoint='x', le='1') == 1
+    assert sample(text, 'kanely_http_request_queries_bucket', endpoint='x', le='3') == 2
+    assert sample(text, 'kanely_http_request_queries_bucket', endpoint='x', le='5') == 3
+    assert sample(text, 'kanely_http_request_queries_bucket', endpoint='x', le='500') == 3
+    assert sample(text, 'kanely_http_request_queries_bucket', endpoint='x', le='+Inf') == 4
+    assert sample(text, 'kanely_http_request_queries_sum', endpoint='x') == 1007
+
+
+def test_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.inc('kanely_db_queries_total', (('endpoint', 'a"b\\c'),))
+
+    assert 'kanely_db_queries_total{endpoint="a\\"b\\\\c"} 1' in metrics.render()
+
+
+def test_processes_are_added_up(tmp_path):
+    labels = (('endpoint', 'kanban.board'),)
+    # Another worker's totals
+    other = Metrics(str(tmp_path))
+    other.inc('kanely_db_queries_total', labels, 5)
+    other.observe('kanely_http_request_duration_seconds', labels, 0.2)
+    other.flush(force=True)
+    os.rename(tmp_path / f'metrics-{os.getpid()}.json', tmp_path / 'metrics-1.json')
+
+    metrics = Metrics(str(tmp_path))
+    metrics.inc('kanely_db_queries_total', labels, 2)
+    metrics.observe('kanely_http_request_duration_seconds', labels, 0.02)
+    text = metrics.render()
+
+    assert sample(text, 'kanely_db_queries_total', endpoint='kanban.board') == 7
+    assert sample(text, 'kanely_http_request_duration_seconds_count', endpoint='kanban.board') == 2
+    assert sample(text, 'kanely_http_request_duration_seconds_bucket', endpoint='kanban.board', le='0.025') == 1
+
+
+def test_new_process_continues_from_its_file(tmp_path):
+    labels = (('endpoint', 'kanban.board'),)
+    dead = Metrics(str(tmp_path))
+    dead.inc('kanely_db_queries_total', labels, 5)
+    dead.flush(force=True)
+
+    # A process that got the same pid, e.g. a restarted worker
+    metrics = Metrics(str(tmp_path))
+    metrics.inc('kanely_db_queries_total', labels, 1)
+    metrics.flush(force=True)
+
+    assert sample(metrics.render(), 'kanely_db_queries_total', endpoint='kanban.board') == 6
+    assert os.listdir(tmp_path) == [f'metrics-{os.getpid()}.json']
+
+
+def test_flush_is_throttled(tmp_path):
+    metrics = Metrics(str(tmp_path), flush_interval=60)
+    metrics.inc('kanely_db_queries_total', (), 1)
+    metrics.flush()
+    metrics.inc('kanely_db_queries_total', (), 1)
+    metrics.flush()
+
+    with open(tmp_path / f'metrics-{os.getpid()}.json') as f:
+        assert json.load(f)['counters'] == [['kanely_db_queries_total', [], 1]]
+
+
+def test_queries_outside_requests_are_not_counted(app, init_database):
+    from app import db
+    from app.models import Card
+
+    db.session.execute(db.select(Card)).all()
+
+    assert 'kanely_db_queries_total{' not in get_metrics().render()
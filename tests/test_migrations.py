@@ -0,0 +1,241 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, event, inspect, text
+
+from app import create_app, db, migrations
+from config import Config
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / 'kanban.db'
+
+
+@pytest.fixture
+def engine(db_path):
+    engine = create_engine(f'sqlite:///{db_path}')
+    yield engine
+    engine.dispose()
+
+
+def make_legacy_database(db_path):
+    """A database as created by db.create_all() before migrations existed."""
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE user (
+            id INTEGER NOT NULL PRIMARY KEY,
+            username VARCHAR(20) NOT NULL UNIQUE,
+            email VARCHAR(120) NOT NULL UNIQUE,
+            password_hash VARCHAR(128),
+            dark_mode BOOLEAN
+        );
+        CREATE TABLE board (
+            id INTEGER NOT NULL PRIMARY KEY,
+            title VARCHAR(100) NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES user (id)
+        );
+        CREATE TABLE "column" (
+            id INTEGER NOT NULL PRIMARY KEY,
+            title VARCHAR(100) NOT NULL,
+            position INTEGER NOT NULL,
+            board_id INTEGER NOT NULL REFERENCES board (id)
+        );
+        CREATE TABLE card (
+            id INTEGER NOT NULL PRIMARY KEY,
+            title VARCHAR(100) NOT NULL,
+            description TEXT,
+            position INTEGER NOT NULL,
+            created_at DATETIME NOT NULL,
+            column_id INTEGER NOT NULL REFERENCES "column" (id)
+        );
+        INSERT INTO user VALUES (1, 'testuser', 'test@example.com', 'hash', 1);
+        INSERT INTO board VALUES (1, 'Old Board', 1);
+        INSERT INTO "column" VALUES (1, 'To Do', 0, 1);
+        INSERT INTO card VALUES (1, 'First', NULL, 0, '2024-01-01 00:00:00', 1);
+        INSERT INTO card VALUES (2, 'Second', NULL, 0, '2024-01-01 00:00:00', 1);
+    """)
+    conn.close()
+
+
+def assert_matches_models(engine):
+    inspector = inspect(engine)
+    for table in db.metadata.sorted_tables:
+        assert inspector.has_table(table.name), table.name
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        assert columns == {column.name for column in table.columns}, table.name
+        indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes, table.name
+        foreign_keys = {(tuple(fk['constrained_columns']), fk['referred_table'], fk['options'].get('ondelete'))
+                        for fk in inspector.get_foreign_keys(table.name)}
+        assert foreign_keys == {((fk.parent.name,), fk.column.table.name, fk.ondelete)
+                                for fk in table.foreign_keys}, table.name
+
+
+def test_migrations_are_numbered_in_order():
+    versions = [migration.version for migration in migrations.load_migrations()]
+    assert versions == list(range(1, len(versions) + 1))
+
+
+def test_upgrade_empty_database_matches_models(engine):
+    applied = migrations.upgrade(engine)
+
+    assert len(applied) == len(migrations.load_migrations())
+    assert_matches_models(engine)
+    with engine.connect() as conn:
+        assert migrations.current_version(conn) == applied[-1].version
+
+
+def test_upgrade_legacy_database_keeps_data(engine, db_path):
+    make_legacy_database(db_path)
+
+    migrations.upgrade(engine)
+
+    assert_matches_models(engine)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT username, dark_mode FROM user').fetchone() == ('testuser', 1)
+    assert conn.execute('SELECT title, version FROM board').fetchone() == ('Old Board', 1)
+    # Duplicate card positions were renumbered
+    assert conn.execute('SELECT position FROM card ORDER BY id').fetchall() == [(0,), (1,)]
+    # Cards count as having entered their column when they were created
+    assert conn.execute('SELECT COUNT(*) FROM card WHERE moved_at = created_at').fetchone()[0] == 2
+    conn.close()
+
+
+def test_upgrade_legacy_database_cascades_deletes(engine, db_path):
+    make_legacy_database(db_path)
+    conn = sqlite3.connect(db_path)
+    # A card whose column is already gone
+    conn.execute("INSERT INTO card VALUES (3, 'Orphan', NULL, 0, '2024-01-01 00:00:00', 99)")
+    conn.commit()
+    conn.close()
+
+    migrations.upgrade(engine)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA foreign_keys = ON')
+    assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+    assert conn.execute('SELECT COUNT(*) FROM card').fetchone()[0] == 2
+    # The search triggers survived the rebuild of the card table
+    conn.execute("INSERT INTO card (id, title, position, created_at, column_id) "
+                 "VALUES (4, 'Findable', 2.5, '2024-01-01 00:00:00', 1)")
+    assert conn.execute("SELECT rowid FROM card_fts WHERE card_fts MATCH 'findable'").fetchall() == [(4,)]
+    conn.execute('DELETE FROM board WHERE id = 1')
+    assert conn.execute('SELECT COUNT(*) FROM "column"').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM card').fetchone()[0] == 0
+    conn.close()
+
+
+def test_upgrade_restores_foreign_keys(engine):
+    event.listen(engine, 'connect', lambda dbapi_connection, record: dbapi_connection.execute('PRAGMA foreign_keys = ON'))
+
+    migrations.upgrade(engine)
+
+    # The pool hands back the connection the upgrade ran on
+    with engine.connect() as conn:
+        assert conn.execute(text('PRAGMA foreign_keys')).scalar() == 1
+
+
+def test_upgrade_is_idempotent(engine):
+    migrations.upgrade(engine)
+    assert migrations.upgrade(engine) == []
+
+
+def test_upgrade_stops_at_target(engine):
+    applied = migrations.upgrade(engine, target=3)
+
+    assert [migration.version for migration in applied] == [1, 2, 3]
+    with engine.connect() as conn:
+        assert [migration.version for migration in migrations.pending(conn)][0] == 4
+
+
+def test_backfill_commits_in_batches(engine, db_path):
+    migrations.upgrade(engine)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO user (id, username, email) VALUES (1, 'u', 'u@example.com')")
+    conn.executemany('INSERT INTO board (title, user_id, version, updated_at) VALUES (?, 1, 1, 0)',
+                     [(f'Board {i}',) for i in range(25)])
+    conn.commit()
+    conn.close()
+
+    commits = []
+    with engine.connect() as connection:
+        migrator = migrations.Migrator(connection, batch_size=10, echo=lambda message: None)
+        original_commit = migrator.commit
+        migrator.commit = lambda: (commits.append(1), original_commit())
+        updated = migrator.backfill('board', 'version = version + 1', where='id > :low', params={'low': 5})
+
+    assert updated == 20
+    # One commit before the first batch, then one per batch of ten rowids
+    assert len(commits) == 4
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM board WHERE version = 2').fetchone()[0] == 20
+    conn.close()
+
+
+def test_rebuild_table_copies_in_batches_and_keeps_concurrent_writes(engine, db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE note (id INTEGER NOT NULL PRIMARY KEY, body TEXT);
+        CREATE INDEX ix_note_body ON note (body);
+    """)
+    conn.executemany('INSERT INTO note VALUES (?, ?)', [(i, f'note {i}') for i in range(1, 26)])
+    conn.commit()
+
+    def write_between_batches():
+        # Another writer gets in once the first batch has been copied
+        if len(commits) == 2:
+            conn.execute("UPDATE note SET body = 'edited' WHERE id IN (2, 20)")
+            conn.execute('DELETE FROM note WHERE id IN (3, 21)')
+            conn.execute("INSERT INTO note VALUES (26, 'new')")
+            conn.commit()
+
+    commits = []
+    messages = []
+    with engine.connect() as connection:
+        migrator = migrations.Migrator(connection, batch_size=10, echo=messages.append)
+        original_commit = migrator.commit
+        migrator.commit = lambda: (commits.append(1), original_commit(), write_between_batches())
+        migrator.rebuild_table('note', 'CREATE TABLE {table} (id INTEGER NOT NULL PRIMARY KEY, body TEXT NOT NULL)')
+
+    # Setting up the triggers, three batches, then the swap
+    assert len(commits) == 5
+    expected = {i: f'note {i}' for i in range(1, 27) if i not in (3, 21)}
+    expected.update({2: 'edited', 20: 'edited', 26: 'new'})
+    assert dict(conn.execute('SELECT id, body FROM note')) == expected
+    assert [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE tbl_name = 'note' AND type IN ('index', 'trigger')")] == ['ix_note_body']
+    assert 'NOT NULL' in conn.execute("SELECT sql FROM sqlite_master WHERE name = 'note'").fetchone()[0]
+    assert any(message.startswith('  swapped in the new note') for message in messages)
+    conn.close()
+
+
+def test_create_app_does_not_create_tables(db_path):
+    class FileConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        assert inspect(db.engine).get_table_names() == []
+        db.engine.dispose()
+
+
+def test_upgrade_command(db_path):
+    class FileConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+
+    app = create_app(FileConfig)
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['db', 'upgrade'])
+    assert 'Database upgraded to version' in result.output
+
+    result = runner.invoke(args=['db', 'current'])
+    assert 'Pending' not in result.output
+
+    result = runner.invoke(args=['db', 'upgrade'])
+    assert 'Database already at version' in result.output
+    with app.app_context():
+        db.engine.dispose()
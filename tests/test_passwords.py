@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from app.models import User
+from app.passwords import PasswordHasher, HashingBusy, get_hasher
+
+FAST = 'pbkdf2:sha256:1000'
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(FAST, workers=1, queue=0)
+    pwhash = hasher.hash('secret')
+    assert pwhash.startswith('pbkdf2:sha256:1000$')
+    assert hasher.verify(pwhash, 'secret')
+    assert not hasher.verify(pwhash, 'wrong')
+
+
+def test_needs_rehash():
+    old = PasswordHasher(FAST, workers=1, queue=0).hash('secret')
+    assert not PasswordHasher(FAST, workers=1, queue=0).needs_rehash(old)
+    assert PasswordHasher('pbkdf2:sha256:2000', workers=1, queue=0).needs_rehash(old)
+
+
+def test_needs_rehash_fills_in_default_parameters():
+    hasher = PasswordHasher('scrypt', workers=1, queue=0)
+    assert not hasher.needs_rehash(PasswordHasher('scrypt:32768:8:1', workers=1, queue=0).hash('secret'))
+
+
+def test_full_queue_is_rejected():
+    hasher = PasswordHasher(FAST, workers=1, queue=1)
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    # One call running, one waiting in the queue
+    threads = [threading.Thread(target=hasher._run, args=(block,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    try:
+        with pytest.raises(HashingBusy):
+            hasher.hash('secret')
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    assert hasher.verify(hasher.hash('secret'), 'secret')
+
+
+def test_login_rehashes_outdated_password(client, app, init_database):
+    with app.app_context():
+        get_hasher().method = FAST
+        get_hasher()._prefix = None
+
+        response = client.post('/login', data={'email': 'test@example.com', 'password': 'password'})
+
+        assert response.status_code == 302
+        user = User.query.filter_by(email='test@example.com').first()
+        assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+        assert user.check_password('password')
+
+
+def test_login_sheds_load_when_busy(client, app, init_database, monkeypatch):
+    with app.app_context():
+        monkeypatch.setattr(get_hasher(), '_slots', threading.BoundedSemaphore(1))
+        get_hasher()._slots.acquire()
+
+        response = client.post('/login', data={'email': 'test@example.com', 'password': 'password'})
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == str(app.config['PASSWORD_HASH_RETRY_AFTER'])
@@ -0,0 +1,269 @@
+import io
+import itertools
+import json
+from datetime import datetime
+
+import pytest
+from flask import g
+
+from app import db
+from app.archive import archive_where
+from app.cloning import copy_board
+from app.models import User, Board, Column, Card, ArchivedCard, Job
+from app.user_cache import get_user_cache
+
+# The most SQL statements each endpoint may send, by (endpoint, method).
+# Each is requested against a board of 10 cards and again once the board
+# has 1000: both runs must fit the budget and send the same number of
+# statements, so a query per card or per column fails here. Budgets count
+# the statement loading the logged-in user, as if the user cache missed.
+BUDGETS = {
+    ('main.home', 'GET'): 0,
+    ('main.metrics', 'GET'): 0,
+    ('auth.register', 'GET'): 0,
+    ('auth.register', 'POST'): 3,
+    ('auth.login', 'GET'): 0,
+    ('auth.login', 'POST'): 1,
+    ('auth.logout', 'GET'): 1,
+    ('auth.settings', 'GET'): 1,
+    ('auth.settings', 'POST'): 2,
+    ('kanban.boards', 'GET'): 3,
+    ('kanban.import_board', 'POST'): 14,
+    ('kanban.job_list', 'GET'): 2,
+    ('kanban.job_status', 'GET'): 2,
+    ('kanban.search', 'GET'): 2,
+    ('kanban.new_board', 'POST'): 4,
+    ('kanban.duplicate_board', 'POST'): 6,
+    ('kanban.toggle_template', 'POST'): 6,
+    ('kanban.board', 'GET'): 4,
+    ('kanban.export_board', 'GET'): 4,
+    ('kanban.board_snapshot', 'GET'): 3,
+    ('kanban.column_cards', 'GET'): 4,
+    ('kanban.board_events', 'GET'): 4,
+    ('kanban.share_board', 'GET'): 3,
+    ('kanban.share_board', 'POST'): 8,
+    ('kanban.remove_share', 'POST'): 4,
+    ('kanban.update_share_permission', 'POST'): 4,
+    ('kanban.new_column', 'POST'): 6,
+    ('kanban.delete_column', 'POST'): 6,
+    ('kanban.new_card', 'POST'): 8,
+    ('kanban.delete_card', 'POST'): 7,
+    ('kanban.move_card', 'POST'): 9,
+    ('kanban.move_cards', 'POST'): 11,
+    ('kanban.delete_board', 'POST'): 11,
+    ('kanban.archive_card', 'POST'): 10,
+    ('kanban.archive_column', 'POST'): 9,
+    ('kanban.board_archive', 'GET'): 3,
+    ('kanban.archive_policy', 'POST'): 12,
+    ('kanban.restore_card', 'POST'): 11,
+}
+
+SIZES = (10, 1000)
+
+
+class Dataset:
+    """The Test Board of init_database, grown to a number of cards.
+
+    Holds ids only: the session is cleared before every measured request.
+    """
+
+    def __init__(self):
+        self.owner_id = User.query.filter_by(email='test@example.com').one().id
+        self.other_id = User.query.filter_by(email='other@example.com').one().id
+        self.board_id = Board.query.filter_by(title='Test Board').one().id
+        self.column_ids = [column.id for column in
+                           Column.query.filter_by(board_id=self.board_id).order_by(Column.position)]
+        self._names = itertools.count()
+
+    def grow(self, cards):
+        """Spread cards over the columns until the board holds ``cards``,
+        with a tenth as many in the archive."""
+        have = Card.query.join(Column).filter(Column.board_id == self.board_id).count()
+        db.session.execute(db.insert(Card), [
+            {'title': f'Card {i}', 'description': f'Card number {i}', 'position': float(i),
+             'column_id': self.column_ids[i % len(self.column_ids)]}
+            for i in range(have, cards)
+        ])
+        archived = ArchivedCard.query.count()
+        now = datetime.utcnow()
+        db.session.execute(db.insert(ArchivedCard), [
+            {'title': f'Old card {i}', 'position': float(i), 'column_id': self.column_ids[-1],
+             'created_at': now, 'moved_at': now, 'archived_at': now}
+            for i in range(archived, cards // 10)
+        ])
+        Board.bump_version(self.board_id)
+        db.session.commit()
+
+    def name(self, prefix):
+        return f'{prefix} {next(self._names)}'
+
+    def card(self):
+        card = Card(title=self.name('Card'), position=-1.0, column_id=self.column_ids[0])
+        db.session.add(card)
+        db.session.commit()
+        return card.id
+
+    def column(self):
+        column = Column(title=self.name('Column'), position=len(self.column_ids), board_id=self.board_id)
+        db.session.add(column)
+        db.session.commit()
+        return column.id
+
+    def archived(self):
+        archive_where(Card.id == self.card())
+        db.session.commit()
+        return ArchivedCard.query.order_by(ArchivedCard.id.desc()).first().id
+
+    def copy(self):
+        """A copy of the board and its cards, to delete."""
+        board_id = copy_board(self.board_id, self.owner_id, self.name('Copy')).id
+        db.session.commit()
+        return board_id
+
+    def job(self):
+        job = Job(kind='delete_board', user_id=self.owner_id, status='done', result='{}')
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+    def stranger(self):
+        """A user the board is not shared with yet."""
+        name = self.name('user').replace(' ', '')
+        user = User(username=name, email=f'{name}@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        return user.email
+
+
+def _import_file():
+    lines = [{'type': 'board', 'format': 1, 'title': 'Imported'},
+             {'type': 'column', 'id': 1, 'title': 'Only', 'position': 0}]
+    lines += [{'type': 'card', 'column': 1, 'title': f'Card {i}', 'position': i} for i in range(5)]
+    return '\n'.join(json.dumps(line) for line in lines).encode()
+
+
+def _register(d):
+    name = d.name('newuser').replace(' ', '')
+    return '/register', {'data': {'username': name, 'email': f'{name}@example.com',
+                                  'password': 'password', 'confirm_password': 'password'}}
+
+
+def _settings(d):
+    # Flip the setting, so that there is something to save
+    dark_mode = db.session.get(User, d.owner_id).dark_mode
+    return '/settings', {'data': {} if dark_mode else {'dark_mode': 'y'}}
+
+
+def _job_list(d):
+    d.job()
+    return '/jobs', {}
+
+
+# (endpoint, method) -> (logged in, function from a Dataset to the path
+# and keyword arguments of the request)
+REQUESTS = {
+    ('main.home', 'GET'): (False, lambda d: ('/', {})),
+    ('main.metrics', 'GET'): (False, lambda d: ('/metrics', {})),
+    ('auth.register', 'GET'): (False, lambda d: ('/register', {})),
+    ('auth.register', 'POST'): (False, _register),
+    ('auth.login', 'GET'): (False, lambda d: ('/login', {})),
+    ('auth.login', 'POST'): (False, lambda d: ('/login', {
+        'data': {'email': 'test@example.com', 'password': 'password'}})),
+    ('auth.logout', 'GET'): (True, lambda d: ('/logout', {})),
+    ('auth.settings', 'GET'): (True, lambda d: ('/settings', {})),
+    ('auth.settings', 'POST'): (True, _settings),
+    ('kanban.boards', 'GET'): (True, lambda d: ('/boards', {})),
+    ('kanban.import_board', 'POST'): (True, lambda d: ('/boards/import', {
+        'data': {'file': (io.BytesIO(_import_file()), 'board.jsonl')}, 'content_type': 'multipart/form-data'})),
+    ('kanban.job_list', 'GET'): (True, _job_list),
+    ('kanban.job_status', 'GET'): (True, lambda d: (f'/jobs/{d.job()}', {})),
+    ('kanban.search', 'GET'): (True, lambda d: ('/search', {'query_string': {'q': 'card'}})),
+    ('kanban.new_board', 'POST'): (True, lambda d: ('/board/new', {
+        'data': {'title': d.name('Board'), 'template': 0}})),
+    ('kanban.duplicate_board', 'POST'): (True, lambda d: (f'/board/{d.board_id}/duplicate', {
+        'data': {'title': d.name('Copy'), 'include_cards': 'y'}})),
+    ('kanban.toggle_template', 'POST'): (True, lambda d: (f'/board/{d.board_id}/template', {})),
+    ('kanban.board', 'GET'): (True, lambda d: (f'/board/{d.board_id}', {})),
+    ('kanban.export_board', 'GET'): (True, lambda d: (f'/board/{d.board_id}/export', {})),
+    ('kanban.board_snapshot', 'GET'): (True, lambda d: (f'/board/{d.board_id}/snapshot', {})),
+    ('kanban.column_cards', 'GET'): (True, lambda d: (f'/column/{d.column_ids[0]}/cards', {
+        'query_string': {'after_position': 0, 'after_id': 0}})),
+    ('kanban.board_events', 'GET'): (True, lambda d: (f'/board/{d.board_id}/events', {
+        'query_string': {'version': 0}, 'headers': {'Accept': 'application/json'}})),
+    ('kanban.share_board', 'GET'): (True, lambda d: (f'/board/{d.board_id}/share', {})),
+    ('kanban.share_board', 'POST'): (True, lambda d: (f'/board/{d.board_id}/share', {
+        'data': {'user_email': d.stranger(), 'permission': 'edit'}})),
+    ('kanban.remove_share', 'POST'): (True, lambda d: (f'/board/{d.board_id}/user/{d.other_id}/remove', {})),
+    ('kanban.update_share_permission', 'POST'): (True, lambda d: (
+        f'/board/{d.board_id}/user/{d.other_id}/permission', {'data': {'permission': 'edit'}})),
+    ('kanban.new_column', 'POST'): (True, lambda d: (f'/board/{d.board_id}/column/new', {
+        'data': {'title': 'New column'}})),
+    ('kanban.delete_column', 'POST'): (True, lambda d: (f'/column/{d.column()}/delete', {})),
+    ('kanban.new_card', 'POST'): (True, lambda d: (f'/column/{d.column_ids[0]}/card/new', {
+        'data': {'title': 'New card'}})),
+    ('kanban.delete_card', 'POST'): (True, lambda d: (f'/card/{d.card()}/delete', {})),
+    ('kanban.move_card', 'POST'): (True, lambda d: (f'/card/{d.card()}/move', {
+        'json': {'columnId': d.column_ids[1], 'position': 1}})),
+    ('kanban.move_cards', 'POST'): (True, lambda d: (f'/board/{d.board_id}/moves', {
+        'json': {'moves': [{'cardId': d.card(), 'columnId': d.column_ids[1], 'position': 2},
+                           {'cardId': d.card(), 'columnId': d.column_ids[2], 'afterId': None}]}})),
+    ('kanban.delete_board', 'POST'): (True, lambda d: (f'/board/{d.copy()}/delete', {})),
+    ('kanban.archive_card', 'POST'): (True, lambda d: (f'/card/{d.card()}/archive', {})),
+    ('kanban.archive_column', 'POST'): (True, lambda d: (f'/column/{d.column_ids[-1]}/archive', {})),
+    ('kanban.board_archive', 'GET'): (True, lambda d: (f'/board/{d.board_id}/archive', {})),
+    ('kanban.archive_policy', 'POST'): (True, lambda d: (f'/board/{d.board_id}/archive/policy', {
+        'data': {'days': 1}})),
+    ('kanban.restore_card', 'POST'): (True, lambda d: (f'/archive/{d.archived()}/restore', {})),
+}
+
+
+def measure(client, count_queries, endpoint, method, dataset):
+    """Send the request of an endpoint and return the statements it sent."""
+    logged_in, make_request = REQUESTS[(endpoint, method)]
+    # The app context, and with it Flask-Login's user in g, outlives requests
+    client.delete_cookie('session')
+    g.pop('_login_user', None)
+    if logged_in:
+        client.post('/login', data={'email': 'test@example.com', 'password': 'password'})
+    path, kwargs = make_request(dataset)
+    # Start from an empty session and make the request load its own user,
+    # as it would in an app context of its own
+    db.session.remove()
+    g.pop('_login_user', None)
+    with count_queries() as queries:
+        response = client.open(path, method=method, **kwargs)
+        # Streamed responses run their queries as they are read
+        response.get_data()
+    assert response.status_code < 400, f'{method} {path} returned {response.status_code}'
+    if logged_in:
+        assert not (response.location or '').startswith('/login'), f'{method} {path} was sent to the login page'
+    assert client.application.url_map.bind('localhost').match(path, method)[0] == endpoint
+    return queries
+
+
+@pytest.mark.parametrize('endpoint, method', list(BUDGETS))
+def test_query_budget(client, app, init_database, count_queries, endpoint, method):
+    get_user_cache().ttl = 0
+    dataset = Dataset()
+    budget = BUDGETS[(endpoint, method)]
+
+    counts = {}
+    for size in SIZES:
+        dataset.grow(size)
+        queries = measure(client, count_queries, endpoint, method, dataset)
+        counts[size] = queries.count
+        assert queries.count <= budget, (
+            f'{method} {endpoint} sent {queries.count} statements with {size} cards, over its budget of '
+            f'{budget}:\n' + '\n'.join(queries.statements))
+    assert counts[SIZES[0]] == counts[SIZES[-1]], f'{method} {endpoint} grows with the board: {counts}'
+
+
+def test_every_endpoint_has_a_budget(app):
+    routes = {(rule.endpoint, method) for rule in app.url_map.iter_rules()
+              if rule.endpoint.split('.')[0] in ('main', 'auth', 'kanban')
+              for method in rule.methods - {'HEAD', 'OPTIONS'}}
+
+    assert routes - set(BUDGETS) == set(), 'Give these endpoints a budget in BUDGETS'
+    assert set(BUDGETS) - routes == set(), 'These endpoints no longer exist'
+    assert set(REQUESTS) == set(BUDGETS)
@@ -0,0 +1,249 @@
+import math
+
+import pytest
+
+from app import db
+from app.models import Board, Column, Card
+from app.ranking import position_between, place_card, rebalance_column, REBALANCE_GAP
+
+
+def column_titles(column_id):
+    cards = Card.query.filter_by(column_id=column_id).order_by(Card.position, Card.id).all()
+    return [card.title for card in cards]
+
+
+def test_position_between():
+    assert position_between(None, None) == 0
+    assert position_between(None, 3) == 2
+    assert position_between(3, None) == 4
+    assert position_between(1, 2) == 1.5
+
+
+def test_place_card_within_column(app, init_database):
+    with app.app_context():
+        column = Column.query.filter_by(title='To Do').first()
+        db.session.add(Card(title='Test Card 3', position=2, column_id=column.id))
+        db.session.commit()
+
+        card = Card.query.filter_by(title='Test Card 3').first()
+        place_card(card, column.id, 1)
+        db.session.commit()
+        assert column_titles(column.id) == ['Test Card 1', 'Test Card 3', 'Test Card 2']
+
+        card = Card.query.filter_by(title='Test Card 1').first()
+        place_card(card, column.id, 99)
+        db.session.commit()
+        assert column_titles(column.id) == ['Test Card 3', 'Test Card 2', 'Test Card 1']
+
+        place_card(card, column.id, 0)
+        db.session.commit()
+        assert column_titles(column.id) == ['Test Card 1', 'Test Card 3', 'Test Card 2']
+
+
+def test_move_writes_only_moved_card(auth_client, app, init_database, count_queries):
+    with app.app_context():
+        column = Column.query.filter_by(title='To Do').first()
+        db.session.add_all([
+            Card(title=f'Bulk {i}', position=2 + i, column_id=column.id) for i in range(50)
+        ])
+        db.session.commit()
+        card = Card.query.filter_by(title='Bulk 49').first()
+
+        with count_queries() as queries:
+            response = auth_client.post(f'/card/{card.id}/move',
+                                        json={'columnId': column.id, 'position': 0})
+
+        assert response.status_code == 200
+        updates = [s for s in queries.statements if s.startswith('UPDATE card')]
+        assert len(updates) == 1
+        assert column_titles(column.id)[0] == 'Bulk 49'
+
+
+def test_move_rejects_column_of_other_board(auth_client, app, init_database):
+    with app.app_context():
+        card = Card.query.filter_by(title='Test Card 1').first()
+        other_board = Board(title='Other Board', user_id=card.column.board.user_id)
+        db.session.add(other_board)
+        db.session.flush()
+        other_column = Column(title='Elsewhere', position=0, board_id=other_board.id)
+        db.session.add(other_column)
+        db.session.commit()
+
+        response = auth_client.post(f'/card/{card.id}/move',
+                                    json={'columnId': other_column.id, 'position': 0})
+        assert response.status_code == 400
+
+
+def test_rebalance_column(app, init_database):
+    with app.app_context():
+        column = Column.query.filter_by(title='To Do').first()
+        cards = Card.query.filter_by(column_id=column.id).order_by(Card.position).all()
+        cards[0].position = 0.25
+        cards[1].position = 0.2500001
+        db.session.commit()
+
+        rebalance_column(column.id)
+        db.session.commit()
+
+        positions = db.session.execute(
+            db.select(Card.position).where(Card.column_id == column.id).order_by(Card.position)
+        ).scalars().all()
+        assert positions == [0, 1]
+        assert column_titles(column.id) == ['Test Card 1', 'Test Card 2']
+
+
+def test_repeated_inserts_trigger_rebalance(auth_client, app, init_database):
+    with app.app_context():
+        column = Column.query.filter_by(title='In Progress').first()
+        db.session.add_all([
+            Card(title='Left', position=0, column_id=column.id),
+            Card(title='Right', position=1, column_id=column.id),
+        ])
+        db.session.commit()
+
+        # Keep dropping cards right after "Left" until the gap runs out
+        moved = []
+        for i in range(60):
+            card = Card(title=f'Squeezed {i}', position=5 + i, column_id=column.id)
+            db.session.add(card)
+            db.session.commit()
+            response = auth_client.post(f'/card/{card.id}/move',
+                                        json={'columnId': column.id, 'position': 1})
+            assert response.status_code == 200
+            # Closing the response runs any rebalance scheduled for after it
+            response.close()
+            moved.insert(0, f'Squeezed {i}')
+
+        assert column_titles(column.id) == ['Left'] + moved + ['Right']
+        positions = db.session.execute(
+            db.select(Card.position).where(Card.column_id == column.id).order_by(Card.position)
+        ).scalars().all()
+        gaps = [b - a for a, b in zip(positions, positions[1:])]
+        assert min(gaps) >= REBALANCE_GAP / 2
+
+
+def test_rebalance_cards_command(runner, app, init_database):
+    with app.app_context():
+        card = Card.query.filter_by(title='Test Card 2').first()
+        card.position = 10.5
+        db.session.commit()
+
+    result = runner.invoke(args=['rebalance-cards'])
+    assert 'Rebalanced 3 columns' in result.output
+
+    with app.app_context():
+        card = Card.query.filter_by(title='Test Card 2').first()
+        assert card.position == 1
+
+
+def test_place_card_after_anchor(app, init_database):
+    with app.app_context():
+        column = Column.query.filter_by(title='To Do').first()
+        first = Card.query.filter_by(title='Test Card 1').first()
+        second = Card.query.filter_by(title='Test Card 2').first()
+        db.session.add(Card(title='Test Card 3', position=2, column_id=column.id))
+        db.session.commit()
+        card = Card.query.filter_by(title='Test Card 3').first()
+
+        place_card(card, column.id, after_id=first.id)
+        db.session.commit()
+        assert column_titles(column.id) == ['Test Card 1', 'Test Card 3', 'Test Card 2']
+
+        place_card(card, column.id, after_id=None)
+        db.session.commit()
+        assert column_titles(column.id) == ['Test Card 3', 'Test Card 1', 'Test Card 2']
+
+        place_card(card, column.id, after_id=second.id)
+        db.session.commit()
+        assert column_titles(column.id) == ['Test Card 1', 'Test Card 2', 'Test Card 3']
+
+
+def test_place_card_after_anchor_in_other_column(app, init_database):
+    with app.app_context():
+        card = Card.query.filter_by(title='Test Card 1').first()
+        anchor = Card.query.filter_by(title='Test Card 2').first()
+        other = Column.query.filter_by(title='Done').first()
+
+        with pytest.raises(ValueError):
+            place_card(card, other.id, after_id=anchor.id)
+        with pytest.raises(ValueError):
+            place_card(card, card.column_id, after_id=card.id)
+
+
+def test_rebalance_invalidates_board_page(auth_client, app, init_database):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        column = Column.query.filter_by(title='To Do').first()
+        for card in Card.query.filter_by(column_id=column.id):
+            card.position = card.position * 100
+        db.session.commit()
+        version = board.version
+
+        response = auth_client.get(f'/board/{board.id}')
+        etag = response.headers['ETag']
+        assert b'data-position="100.0"' in response.data
+
+        rebalance_column(column.id)
+        db.session.commit()
+
+        assert db.session.get(Board, board.id).version == version + 1
+        events = auth_client.get(f'/board/{board.id}/events?version={version}',
+                                 headers={'Accept': 'application/json'}).json['events']
+        assert [(event['kind'], event['data']) for event in events] == [
+            ('column_rebalanced', {'columnId': column.id})]
+
+        response = auth_client.get(f'/board/{board.id}', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert b'data-position="100.0"' not in response.data
+        assert b'data-position="1.0"' in response.data
+
+
+def test_batch_reports_positions_after_inline_rebalance(auth_client, app, init_database):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        column = Column.query.filter_by(title='In Progress').first()
+        done = Column.query.filter_by(title='Done').first()
+        # No key fits between these two, so a drop between them renumbers the column
+        db.session.add_all([
+            Card(title='Left', position=10.0, column_id=column.id),
+            Card(title='Right', position=math.nextafter(10.0, 11.0), column_id=column.id),
+            Card(title='Appended', position=0, column_id=done.id),
+            Card(title='Squeezed', position=1, column_id=done.id),
+        ])
+        db.session.commit()
+        appended = Card.query.filter_by(title='Appended').first()
+        squeezed = Card.query.filter_by(title='Squeezed').first()
+
+        response = auth_client.post(f'/board/{board.id}/moves', json={'moves': [
+            {'cardId': appended.id, 'columnId': column.id, 'position': 99},
+            {'cardId': squeezed.id, 'columnId': column.id, 'position': 1},
+        ]})
+
+        assert response.status_code == 200
+        stored = dict(db.session.execute(
+            db.select(Card.id, Card.position).where(Card.column_id == column.id)
+        ).all())
+        assert {card['id']: card['position'] for card in response.json['cards']} == {
+            appended.id: stored[appended.id], squeezed.id: stored[squeezed.id]}
+        assert stored[appended.id] == 2
+        assert column_titles(column.id) == ['Left', 'Squeezed', 'Right', 'Appended']
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'json': {'columnId': 'x', 'position': 0}},
+    {'json': {'columnId': [1], 'position': 0}},
+    {'json': {'columnId': 1, 'position': 'top'}},
+    {'json': {'columnId': 2 ** 70, 'position': 0}},
+    {'json': {'columnId': 1, 'position': 2 ** 70}},
+    {'json': {'columnId': 1, 'afterId': -2 ** 70}},
+    {'json': [1, 2]},
+    {'data': 'not json', 'content_type': 'text/plain'},
+])
+def test_move_rejects_malformed_request(auth_client, app, init_database, kwargs):
+    with app.app_context():
+        card = Card.query.filter_by(title='Test Card 1').first()
+
+        response = auth_client.post(f'/card/{card.id}/move', **kwargs)
+
+        assert response.status_code == 400
@@ -3,6 +3,7 @@ import json
 import sys
 import os
 
+from app.access import AccessResolver
 from app.models import User, Board, Column, Card
 from app import db
 
@@ -95,6 +96,108 @@ def test_board_page_route(auth_client, init_database):
         assert b'Test Card 2' in response.data
 
 
+def test_board_page_query_budget(auth_client, app, init_database, count_queries):
+    """Rendering a board must not issue a query per column"""
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        for i in range(15):
+            column = Column(title=f'Extra {i}', position=3 + i, board_id=board.id)
+            db.session.add(column)
+            db.session.flush()
+            db.session.add_all([
+                Card(title=f'Card {i}-{j}', position=j, column_id=column.id)
+                for j in range(5)
+            ])
+        db.session.commit()
+        board_id = board.id
+        db.session.expunge_all()
+        
+        with count_queries() as queries:
+            response = auth_client.get(f'/board/{board_id}')
+        
+        assert response.status_code == 200
+        assert b'Card 14-4' in response.data
+        # current_user, board with owner, columns, then the first cards of
+        # every column in one statement
+        assert queries.count <= 4
+
+
+def test_board_page_cards_ordered(auth_client, app, init_database):
+    with app.app_context():
+        column = Column.query.filter_by(title='To Do').first()
+        card = Card.query.filter_by(title='Test Card 1').first()
+        card.position = 5
+        db.session.commit()
+        
+        response = auth_client.get(f'/board/{column.board_id}')
+        assert response.data.index(b'Test Card 2') < response.data.index(b'Test Card 1')
+
+
+def test_board_page_renders_first_cards(auth_client, app, init_database):
+    with app.app_context():
+        app.config['BOARD_FIRST_CARDS'] = 3
+        column = Column.query.filter_by(title='Done').first()
+        db.session.add_all([Card(title=f'Done {i}', position=i, column_id=column.id) for i in range(5)])
+        db.session.commit()
+        
+        response = auth_client.get(f'/board/{column.board_id}')
+        
+        assert b'Done 2' in response.data
+        assert b'Done 3' not in response.data
+        assert response.data.count(b'data-after-id=') == 1
+
+
+def test_column_cards_pages(auth_client, app, init_database):
+    with app.app_context():
+        column = Column.query.filter_by(title='Done').first()
+        db.session.add_all([Card(title=f'Done {i}', position=i, column_id=column.id) for i in range(5)])
+        db.session.commit()
+        
+        titles, params = [], {'limit': 2}
+        while True:
+            data = auth_client.get(f'/column/{column.id}/cards', query_string=params).get_json()
+            titles += [card['title'] for card in data['cards']]
+            if data['next'] is None:
+                break
+            params = {'limit': 2, 'after_position': data['next']['afterPosition'],
+                      'after_id': data['next']['afterId']}
+        
+        assert titles == [f'Done {i}' for i in range(5)]
+
+
+def test_column_cards_html_fragment(auth_client, app, init_database):
+    with app.app_context():
+        column = Column.query.filter_by(title='Done').first()
+        db.session.add_all([Card(title=f'Done {i}', position=i, column_id=column.id) for i in range(3)])
+        db.session.commit()
+        first = Card.query.filter_by(title='Done 0').first()
+        
+        response = auth_client.get(f'/column/{column.id}/cards', headers={'Accept': 'text/html'},
+                                   query_string={'limit': 1, 'after_position': first.position, 'after_id': first.id})
+        
+        assert b'Done 1' in response.data
+        assert b'Done 0' not in response.data and b'Done 2' not in response.data
+        assert b'kanban-load-more' in response.data
+
+
+def test_column_cards_requires_access(app, init_database):
+    with app.app_context():
+        stranger = User(username='stranger', email='stranger@example.com')
+        stranger.set_password('password')
+        db.session.add(stranger)
+        db.session.commit()
+        column = Column.query.filter_by(title='To Do').first()
+        
+        client = app.test_client()
+        client.post('/login', data={'email': 'stranger@example.com', 'password': 'password'})
+        assert client.get(f'/column/{column.id}/cards').status_code == 403
+
+
+def test_missing_board_returns_404(auth_client):
+    response = auth_client.get('/board/9999')
+    assert response.status_code == 404
+
+
 def test_create_board(auth_client, app):
     with app.app_context():
         # Count boards before
@@ -194,6 +297,119 @@ def test_move_card(auth_client, app, init_database):
         assert card.position == 0
 
 
+def test_move_card_after_anchor(auth_client, app, init_database):
+    with app.app_context():
+        card1 = Card.query.filter_by(title='Test Card 1').first()
+        card2 = Card.query.filter_by(title='Test Card 2').first()
+        
+        response = auth_client.post(f'/card/{card1.id}/move',
+                                    json={'columnId': card1.column_id, 'afterId': card2.id})
+        assert response.status_code == 200
+        
+        cards = Card.query.filter_by(column_id=card1.column_id).order_by(Card.position).all()
+        assert [card.title for card in cards] == ['Test Card 2', 'Test Card 1']
+        
+        response = auth_client.post(f'/card/{card1.id}/move',
+                                    json={'columnId': card1.column_id, 'afterId': None})
+        assert response.status_code == 200
+        cards = Card.query.filter_by(column_id=card1.column_id).order_by(Card.position).all()
+        assert [card.title for card in cards] == ['Test Card 1', 'Test Card 2']
+
+
+def test_move_card_rejects_anchor_in_other_column(auth_client, app, init_database):
+    with app.app_context():
+        card1 = Card.query.filter_by(title='Test Card 1').first()
+        card2 = Card.query.filter_by(title='Test Card 2').first()
+        other = Column.query.filter_by(title='Done').first()
+        
+        response = auth_client.post(f'/card/{card1.id}/move', json={'columnId': other.id, 'afterId': card2.id})
+        
+        assert response.status_code == 400
+        assert db.session.get(Card, card1.id).column_id == card2.column_id
+
+
+def test_move_cards_batch_after_anchor(auth_client, app, init_database):
+    with app.app_context():
+        card1 = Card.query.filter_by(title='Test Card 1').first()
+        card2 = Card.query.filter_by(title='Test Card 2').first()
+        board_id = card1.column.board_id
+        target_column = Column.query.filter_by(title='Done').first()
+        
+        response = auth_client.post(f'/board/{board_id}/moves', json={'moves': [
+            {'cardId': card1.id, 'columnId': target_column.id, 'afterId': None},
+            {'cardId': card2.id, 'columnId': target_column.id, 'afterId': card1.id},
+        ]})
+        
+        assert response.status_code == 200
+        cards = Card.query.filter_by(column_id=target_column.id).order_by(Card.position).all()
+        assert [card.title for card in cards] == ['Test Card 1', 'Test Card 2']
+
+
+def test_move_cards_batch(auth_client, app, init_database):
+    with app.app_context():
+        card1 = Card.query.filter_by(title='Test Card 1').first()
+        card2 = Card.query.filter_by(title='Test Card 2').first()
+        board_id = card1.column.board_id
+        target_column = Column.query.filter_by(title='Done').first()
+        
+        response = auth_client.post(f'/board/{board_id}/moves', json={'moves': [
+            {'cardId': card1.id, 'columnId': target_column.id, 'position': 0},
+            {'cardId': card2.id, 'columnId': target_column.id, 'position': 0},
+        ]})
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['success'] is True
+        assert {card['id'] for card in data['cards']} == {card1.id, card2.id}
+        
+        cards = Card.query.filter_by(column_id=target_column.id).order_by(Card.position).all()
+        assert [card.title for card in cards] == ['Test Card 2', 'Test Card 1']
+
+
+def test_move_cards_batch_is_all_or_nothing(auth_client, app, init_database):
+    with app.app_context():
+        card = Card.query.filter_by(title='Test Card 1').first()
+        source_column_id = card.column_id
+        board_id = card.column.board_id
+        target_column = Column.query.filter_by(title='Done').first()
+        
+        response = auth_client.post(f'/board/{board_id}/moves', json={'moves': [
+            {'cardId': card.id, 'columnId': target_column.id, 'position': 0},
+            {'cardId': 9999, 'columnId': target_column.id, 'position': 0},
+        ]})
+        
+        assert response.status_code == 400
+        card = db.session.get(Card, card.id)
+        assert card.column_id == source_column_id
+
+
+def test_move_cards_batch_malformed(auth_client, app, init_database):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        
+        assert auth_client.post(f'/board/{board.id}/moves', json={}).status_code == 400
+        assert auth_client.post(f'/board/{board.id}/moves', json=[1, 2]).status_code == 400
+        assert auth_client.post(f'/board/{board.id}/moves', json='moves').status_code == 400
+        response = auth_client.post(f'/board/{board.id}/moves', json={'moves': [{'cardId': 'x'}]})
+        assert response.status_code == 400
+        for move in ({'cardId': 2 ** 70, 'columnId': 1, 'position': 0},
+                     {'cardId': 1, 'columnId': 1, 'afterId': 2 ** 70},
+                     {'cardId': 1, 'columnId': 1, 'position': 2 ** 70}):
+            response = auth_client.post(f'/board/{board.id}/moves', json={'moves': [move]})
+            assert response.status_code == 400
+
+
+def test_move_cards_batch_requires_edit(other_auth_client, app, init_database):
+    with app.app_context():
+        card = Card.query.filter_by(title='Test Card 1').first()
+        board_id = card.column.board_id
+        
+        response = other_auth_client.post(f'/board/{board_id}/moves', json={'moves': [
+            {'cardId': card.id, 'columnId': card.column_id, 'position': 1},
+        ]})
+        assert response.status_code == 403
+
+
 def test_delete_card(auth_client, app, init_database):
     with app.app_context():
         # Get the card
@@ -257,6 +473,113 @@ def test_delete_board(auth_client, app, init_database):
             assert len(cards) == 0
 
 
+def test_delete_board_is_one_statement(auth_client, app, init_database, count_queries):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        board_id = board.id
+        done = Column.query.filter_by(title='Done').first()
+        db.session.add_all([Card(title=f'Card {i}', position=i, column_id=done.id) for i in range(200)])
+        db.session.commit()
+        auth_client.post(f'/card/{Card.query.first().id}/move', json={'columnId': done.id, 'index': 0})
+        
+        with count_queries() as queries:
+            response = auth_client.post(f'/board/{board_id}/delete')
+        
+        assert response.status_code == 302
+        deletes = [s for s in queries.statements if s.startswith('DELETE')]
+        assert deletes == ['DELETE FROM board WHERE board.id = ?']
+        # Columns, cards, shares and events went with it
+        for table in ('"column"', 'card', 'board_shares', 'board_event'):
+            assert db.session.execute(db.text(f'SELECT COUNT(*) FROM {table}')).scalar() == 0, table
+
+
+def test_delete_column_does_not_load_cards(auth_client, app, init_database, count_queries):
+    with app.app_context():
+        column = Column.query.filter_by(title='To Do').first()
+        column_id = column.id
+        
+        with count_queries() as queries:
+            auth_client.post(f'/column/{column_id}/delete')
+        
+        assert not any('FROM card' in s for s in queries.statements)
+        assert Card.query.filter_by(column_id=column_id).count() == 0
+
+
+def test_board_page_etag(auth_client, app, init_database):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        
+        response = auth_client.get(f'/board/{board.id}')
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert response.headers['Last-Modified']
+        
+        response = auth_client.get(f'/board/{board.id}', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+
+def test_board_mutation_changes_etag(auth_client, app, init_database):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        column = Column.query.filter_by(title='To Do').first()
+        version = board.version
+        
+        etag = auth_client.get(f'/board/{board.id}').headers['ETag']
+        auth_client.post(f'/column/{column.id}/card/new', data={'title': 'Fresh Card'})
+        
+        board = db.session.get(Board, board.id)
+        assert board.version == version + 1
+        
+        response = auth_client.get(f'/board/{board.id}', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert b'Fresh Card' in response.data
+        assert response.headers['ETag'] != etag
+
+
+def test_board_revalidation_is_one_lookup(auth_client, app, init_database, count_queries):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        etag = auth_client.get(f'/board/{board.id}/snapshot').headers['ETag']
+        board_id = board.id
+        db.session.expunge_all()
+        
+        with count_queries() as queries:
+            response = auth_client.get(f'/board/{board_id}/snapshot', headers={'If-None-Match': etag})
+        
+        assert response.status_code == 304
+        # At most current_user and the board's version
+        assert queries.count <= 2
+        assert 'FROM board' in queries.statements[-1]
+
+
+def test_board_snapshot(other_auth_client, app, init_database):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        
+        response = other_auth_client.get(f'/board/{board.id}/snapshot')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['title'] == 'Test Board'
+        assert data['canEdit'] is False
+        assert [column['title'] for column in data['columns']] == ['To Do', 'In Progress', 'Done']
+        assert [card['title'] for card in data['columns'][0]['cards']] == ['Test Card 1', 'Test Card 2']
+
+
+def test_board_revalidation_checks_access(app, init_database):
+    with app.app_context():
+        board = Board.query.filter_by(title='Test Board').first()
+        stranger = User(username='stranger', email='stranger@example.com')
+        stranger.set_password('password')
+        db.session.add(stranger)
+        db.session.commit()
+        
+        with app.test_client() as client:
+            client.post('/login', data={'email': 'stranger@example.com', 'password': 'password'})
+            response = client.get(f'/board/{board.id}/snapshot', headers={'If-None-Match': '*'})
+            assert response.status_code == 403
+
+
 def test_share_board_page(auth_client, init_database):
     """Test the share board page."""
     with auth_client.application.app_context():
@@ -295,7 +618,7 @@ def test_share_board(auth_client, app, init_database):
         assert board in user.shared_boards
         
         # Check that the user has edit permission
-        assert board.can_edit(user) is True
+        assert AccessResolver(user).can_edit(board) is True
 
 
 def test_update_share_permission(auth_client, app, init_database):
@@ -306,8 +629,8 @@ def test_update_share_permission(auth_client, app, init_database):
         user = User.query.filter_by(email='other@example.com').first()
         
         # Initially, the user should have view-only permission
-        assert board.can_view(user) is True
-        assert board.can_edit(user) is False
+        assert AccessResolver(user).can_view(board) is True
+        assert AccessResolver(user).can_edit(board) is False
         
         # Update to edit permission
         response = auth_client.post(f'/board/{board.id}/user/{user.id}/permission', data={
@@ -318,7 +641,7 @@ def test_update_share_permission(auth_client, app, init_database):
         assert b'Permission updated' in response.data
         
         # Check that the permission was updated
-        assert board.can_edit(user) is True
+        assert AccessResolver(user).can_edit(board) is True
 
 
 def test_remove_share(auth_client, app, init_database):
@@ -0,0 +1,127 @@
+import sqlite3
+
+from sqlalchemy import create_engine
+
+from app import db, migrations
+from app.models import User, Column, Card
+from app.search import MAX_PAGE, match_expression, search
+
+
+def user_id(email):
+    return User.query.filter_by(email=email).first().id
+
+
+def titles(results):
+    return [result['title'] for result in results]
+
+
+def test_match_expression():
+    assert match_expression('fix login') == '"fix"* "login"*'
+    assert match_expression('"; DROP TABLE card; --') == '"DROP"* "TABLE"* "card"*'
+    assert match_expression('  *** ') is None
+
+
+def test_search_finds_cards_columns_and_boards(app, init_database):
+    results, has_more = search(user_id('test@example.com'), 'test')
+    assert {result['kind'] for result in results} == {'card', 'board'}
+    assert not has_more
+
+    results, _ = search(user_id('test@example.com'), 'progress')
+    assert [(result['kind'], result['title']) for result in results] == [('column', 'In Progress')]
+
+
+def test_search_matches_prefixes_and_descriptions(app, init_database):
+    results, _ = search(user_id('test@example.com'), 'descr 2')
+    assert titles(results) == ['Test Card 2']
+    assert results[0]['column_title'] == 'To Do'
+    assert results[0]['board_title'] == 'Test Board'
+
+
+def test_index_follows_edits_and_deletes(app, init_database):
+    owner = user_id('test@example.com')
+    card = Card.query.filter_by(title='Test Card 1').first()
+
+    card.title = 'Renamed pineapple'
+    db.session.commit()
+    assert titles(search(owner, 'pineapple')[0]) == ['Renamed pineapple']
+
+    db.session.delete(card)
+    db.session.commit()
+    assert search(owner, 'pineapple')[0] == []
+
+
+def test_search_only_covers_accessible_boards(app, init_database):
+    stranger = User(username='stranger', email='stranger@example.com')
+    stranger.set_password('password')
+    db.session.add(stranger)
+    db.session.commit()
+
+    # Shared with the other user, not with the stranger
+    assert 'Test Card 1' in titles(search(user_id('other@example.com'), 'card')[0])
+    assert search(stranger.id, 'card')[0] == []
+
+
+def test_search_paginates(app, init_database):
+    column = Column.query.filter_by(title='Done').first()
+    db.session.add_all(Card(title=f'Paged {i}', position=i, column_id=column.id) for i in range(5))
+    db.session.commit()
+    owner = user_id('test@example.com')
+
+    first, has_more = search(owner, 'paged', page=1, per_page=3)
+    assert len(first) == 3 and has_more
+    second, has_more = search(owner, 'paged', page=2, per_page=3)
+    assert len(second) == 2 and not has_more
+    assert not set(titles(first)) & set(titles(second))
+
+
+def test_search_route_escapes_card_text(auth_client, app, init_database):
+    column = Column.query.filter_by(title='Done').first()
+    db.session.add(Card(title='<script>alert(1)</script> widget', position=0, column_id=column.id))
+    db.session.commit()
+
+    response = auth_client.get('/search?q=widget')
+    assert response.status_code == 200
+    assert b'<script>alert(1)</script>' not in response.data
+    assert b'&lt;script&gt;' in response.data
+    assert b'<mark>widget</mark>' in response.data
+
+
+def test_search_route_json(auth_client, app, init_database):
+    response = auth_client.get('/search?q=card', headers={'Accept': 'application/json'})
+    data = response.get_json()
+    assert data['query'] == 'card'
+    assert sorted(result['title'] for result in data['results']) == ['Test Card 1', 'Test Card 2']
+    assert '<mark>Card</mark>' in data['results'][0]['snippet']
+
+
+def test_search_route_caps_page(auth_client, app, init_database):
+    response = auth_client.get(f'/search?q=card&page={2 ** 62}', headers={'Accept': 'application/json'})
+
+    assert response.status_code == 200
+    assert response.get_json()['page'] == MAX_PAGE
+    assert response.get_json()['results'] == []
+
+
+def test_search_route_requires_login(client):
+    assert client.get('/search?q=card').status_code == 302
+
+
+def test_migration_indexes_existing_rows(tmp_path):
+    db_path = tmp_path / 'kanban.db'
+    engine = create_engine(f'sqlite:///{db_path}')
+    migrations.upgrade(engine, target=7)
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        INSERT INTO user (id, username, email) VALUES (1, 'u', 'u@example.com');
+        INSERT INTO board (id, title, user_id) VALUES (1, 'Roadmap', 1);
+        INSERT INTO "column" (id, title, position, board_id) VALUES (1, 'Later', 0, 1);
+        INSERT INTO card (id, title, position, created_at, column_id) VALUES (1, 'Existing card', 0, 0, 1);
+    """)
+    conn.commit()
+
+    migrations.upgrade(engine)
+
+    assert conn.execute("SELECT rowid FROM card_fts WHERE card_fts MATCH 'existing'").fetchall() == [(1,)]
+    assert conn.execute("SELECT rowid FROM board_fts WHERE board_fts MATCH 'roadmap'").fetchall() == [(1,)]
+    conn.close()
+    engine.dispose()
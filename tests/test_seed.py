@@ -0,0 +1,89 @@
+from sqlalchemy import text
+
+from app import db
+from app.models import User, Board, Column, Card, board_shares
+from app.search import search
+from app.seed import seed_database
+
+
+def contents():
+    return [tuple(row) for row in db.session.execute(
+        db.select(Card.id, Card.title, Card.description, Card.position, Card.created_at, Card.moved_at,
+                  Card.column_id).order_by(Card.id))]
+
+
+def test_seed_command(runner, app):
+    result = runner.invoke(args=['seed', '--users', '3', '--boards', '4', '--shares', '2', '--columns', '3',
+                                 '--cards-per-column', '5', '--chunk-size', '7'])
+
+    assert 'Seeded 60 cards' in result.output
+    assert (User.query.count(), Board.query.count(), Column.query.count(), Card.query.count()) == (3, 4, 12, 60)
+    assert db.session.query(board_shares).count() == 8
+    # Every column holds consecutive card ids, in position order
+    column = Column.query.order_by(Column.id).first()
+    assert [(card.id, card.position) for card in Card.query.filter_by(column_id=column.id).order_by(Card.id)] == [
+        (i + 1, float(i)) for i in range(5)]
+    assert [column.title for column in Column.query.filter_by(board_id=1).order_by(Column.position)] == [
+        'To Do', 'In Progress', 'Done']
+    assert all(card.moved_at >= card.created_at for card in Card.query)
+
+
+def test_seed_command_rejects_negative_counts(runner, app):
+    result = runner.invoke(args=['seed', '--users', '3', '--boards', '4', '--shares', '-1'])
+
+    assert result.exit_code == 2
+    assert 'counts must not be negative' in result.output
+    assert User.query.count() == 0
+
+
+def test_seeded_users_can_log_in(client, app):
+    with app.app_context():
+        seed_database(users=2, boards=2, shares=1, password='s3cret')
+
+    response = client.post('/login', data={'email': 'user2@example.com', 'password': 's3cret'})
+
+    assert response.status_code == 302
+    assert client.get('/boards', headers={'Accept': 'application/json'}).json['boards'][0]['title'] in (
+        'Board 1', 'Board 2')
+
+
+def test_seed_is_deterministic(app):
+    seed_database(users=2, boards=2, columns=2, cards_per_column=20, seed=7)
+    first = contents()
+    db.session.execute(db.delete(Card))
+    db.session.commit()
+
+    seed_database(users=2, boards=2, columns=2, cards_per_column=20, seed=7, chunk_size=3)
+
+    # The new columns get other ids, but their cards do not depend on the chunk size
+    assert [row[2:4] for row in contents()] == [row[2:4] for row in first]
+
+
+def test_seed_adds_to_existing_data(app, init_database):
+    seed_database(users=2, boards=1, columns=1, cards_per_column=3)
+
+    assert User.query.count() == 4
+    assert Board.query.filter_by(title='Test Board').count() == 1
+    assert [card.title for card in Card.query.order_by(Card.id)][-1] == 'Card 4-2'
+
+
+def test_seed_indexes_cards_and_restores_triggers(app):
+    seed_database(users=1, boards=1, columns=1, cards_per_column=3)
+
+    results, _ = search(1, 'card')
+    assert len([result for result in results if result['kind'] == 'card']) == 3
+
+    # The insert trigger is back
+    db.session.add(Card(title='Needle', position=9, column_id=1))
+    db.session.commit()
+    assert [result['title'] for result in search(1, 'needle')[0]] == ['Needle']
+
+
+def test_seed_restores_pragmas(app):
+    with db.engine.connect() as conn:
+        before = [conn.execute(text(f'PRAGMA {name}')).scalar() for name in ('foreign_keys', 'synchronous')]
+
+    seed_database(users=1, boards=1)
+
+    with db.engine.connect() as conn:
+        assert [conn.execute(text(f'PRAGMA {name}')).scalar() for name in ('foreign_keys', 'synchronous')] == before
@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import text
+
+from app import create_app, db
+from app.sqlite import PROFILES, is_file_database, pragmas_for
+from config import Config
+
+
+def make_config(db_path, **overrides):
+    attrs = {'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}'}
+    attrs.update(overrides)
+    return type('FileConfig', (Config,), attrs)
+
+
+def read_pragma(name):
+    with db.engine.connect() as conn:
+        return conn.execute(text(f'PRAGMA {name}')).scalar()
+
+
+def test_is_file_database():
+    assert is_file_database('sqlite:///kanban.db')
+    assert not is_file_database('sqlite:///:memory:')
+    assert not is_file_database('sqlite://')
+    assert not is_file_database('postgresql://localhost/kanban')
+
+
+def test_pragmas_for_applies_overrides():
+    pragmas = pragmas_for({'SQLITE_PROFILE': 'production', 'SQLITE_PRAGMAS': {'busy_timeout': 100}})
+    assert pragmas['busy_timeout'] == 100
+    assert pragmas['journal_mode'] == PROFILES['production']['journal_mode']
+
+
+def test_pragmas_for_rejects_unknown_profile():
+    with pytest.raises(ValueError):
+        pragmas_for({'SQLITE_PROFILE': 'fast', 'SQLITE_PRAGMAS': {}})
+
+
+def test_production_profile(tmp_path):
+    app = create_app(make_config(tmp_path / 'kanban.db'))
+    with app.app_context():
+        assert read_pragma('journal_mode') == 'wal'
+        assert read_pragma('busy_timeout') == 5000
+        # NORMAL
+        assert read_pragma('synchronous') == 1
+        # MEMORY
+        assert read_pragma('temp_store') == 2
+        assert db.engine.pool.size() == app.config['SQLITE_POOL_SIZE']
+        db.engine.dispose()
+
+
+def test_default_profile_leaves_sqlite_settings(tmp_path):
+    app = create_app(make_config(tmp_path / 'kanban.db', SQLITE_PROFILE='default'))
+    with app.app_context():
+        assert read_pragma('journal_mode') == 'delete'
+        db.engine.dispose()
+
+
+@pytest.mark.parametrize('profile', PROFILES)
+def test_every_profile_enforces_foreign_keys(tmp_path, profile):
+    app = create_app(make_config(tmp_path / 'kanban.db', SQLITE_PROFILE=profile))
+    with app.app_context():
+        assert read_pragma('foreign_keys') == 1
+        db.engine.dispose()
+
+
+def test_memory_database_keeps_static_pool(app):
+    assert type(db.engine.pool).__name__ == 'StaticPool'
+    assert read_pragma('busy_timeout') == 5000
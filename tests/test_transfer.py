@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app import db
+from app.models import User, Board, Column, Card
+from app.transfer import import_board, TransferError
+
+
+def board_contents(board_id):
+    columns = Column.query.filter_by(board_id=board_id).order_by(Column.position).all()
+    return [(column.title, [(card.title, card.description, card.position)
+                            for card in Card.query.filter_by(column_id=column.id).order_by(Card.position)])
+            for column in columns]
+
+
+def test_export_jsonl(auth_client, app, init_database):
+    board = Board.query.filter_by(title='Test Board').first()
+
+    response = auth_client.get(f'/board/{board.id}/export?format=jsonl')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert 'attachment' in response.headers['Content-Disposition']
+    records = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert records[0] == {'type': 'board', 'format': 1, 'title': 'Test Board'}
+    assert [record['title'] for record in records if record['type'] == 'column'] == ['To Do', 'In Progress', 'Done']
+    assert [record['title'] for record in records if record['type'] == 'card'] == ['Test Card 1', 'Test Card 2']
+
+
+def test_export_csv(auth_client, app, init_database):
+    board = Board.query.filter_by(title='Test Board').first()
+
+    response = auth_client.get(f'/board/{board.id}/export?format=csv')
+
+    rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+    assert [(row['column'], row['title']) for row in rows] == [
+        ('To Do', 'Test Card 1'), ('To Do', 'Test Card 2'), ('In Progress', ''), ('Done', '')
+    ]
+
+
+def test_export_requires_access(app, init_database):
+    stranger = User(username='stranger', email='stranger@example.com')
+    stranger.set_password('password')
+    db.session.add(stranger)
+    db.session.commit()
+    board = Board.query.filter_by(title='Test Board').first()
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'stranger@example.com', 'password': 'password'})
+    assert client.get(f'/board/{board.id}/export').status_code == 403
+
+
+@pytest.mark.parametrize('fmt', ['jsonl', 'csv'])
+def test_round_trip(auth_client, app, init_database, fmt):
+    board = Board.query.filter_by(title='Test Board').first()
+    Card.query.filter_by(title='Test Card 2').first().position = 0.125
+    db.session.commit()
+    original = board_contents(board.id)
+    exported = auth_client.get(f'/board/{board.id}/export?format={fmt}').data
+
+    response = auth_client.post('/boards/import', data={
+        'file': (io.BytesIO(exported), f'board.{fmt}'),
+        'title': 'Imported'
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 302
+    imported = Board.query.filter_by(title='Imported').first()
+    assert imported.user_id == board.user_id
+    assert board_contents(imported.id) == original
+
+
+def test_import_inserts_cards_in_chunks(app, init_database, count_queries):
+    app.config['IMPORT_CHUNK_SIZE'] = 2
+    owner_id = User.query.filter_by(email='test@example.com').first().id
+    lines = [json.dumps({'type': 'board', 'format': 1, 'title': 'Bulk'}),
+             json.dumps({'type': 'column', 'id': 1, 'title': 'Only', 'position': 0})]
+    lines += [json.dumps({'type': 'card', 'column': 1, 'title': f'Card {i}', 'position': i}) for i in range(5)]
+
+    with count_queries() as queries:
+        board = import_board(lines, owner_id, 'jsonl')
+        db.session.commit()
+
+    card_inserts = [s for s in queries.statements if s.startswith('INSERT INTO card')]
+    assert len(card_inserts) == 3
+    assert [title for title, _, _ in board_contents(board.id)[0][1]] == [f'Card {i}' for i in range(5)]
+
+
+def test_import_rejects_bad_records(app, init_database):
+    owner_id = User.query.filter_by(email='test@example.com').first().id
+    board = json.dumps({'type': 'board', 'format': 1, 'title': 'Broken'})
+
+    with pytest.raises(TransferError, match='Line 2'):
+        import_board([board, '{not json'], owner_id, 'jsonl')
+    with pytest.raises(TransferError, match='unknown column'):
+        import_board([board, json.dumps({'type': 'card', 'column': 9, 'title': 'x'})], owner_id, 'jsonl')
+    with pytest.raises(TransferError, match='must start with the board'):
+        import_board([json.dumps({'type': 'column', 'id': 1, 'title': 'x'})], owner_id, 'jsonl')
+    with pytest.raises(TransferError, match='Line 2: id must be a number or text'):
+        import_board([board, json.dumps({'type': 'column', 'id': [1], 'title': 'x'})], owner_id, 'jsonl')
+    column = json.dumps({'type': 'column', 'id': 1, 'title': 'x'})
+    with pytest.raises(TransferError, match='Line 3: column must be a number or text'):
+        import_board([board, column, json.dumps({'type': 'card', 'column': {'id': 1}, 'title': 'x'})],
+                     owner_id, 'jsonl')
+
+
+@pytest.mark.parametrize('record', [
+    '{"type": "column", "id": 1, "title": "x", "position": Infinity}',
+    '{"type": "column", "id": 1, "title": "x", "position": NaN}',
+    '{"type": "column", "id": 1, "title": "x", "position": 1e300}',
+    '{"type": "column", "id": 1, "title": "x", "position": "-inf"}',
+])
+def test_import_rejects_numbers_that_are_not_finite(app, init_database, record):
+    owner_id = User.query.filter_by(email='test@example.com').first().id
+    board = json.dumps({'type': 'board', 'format': 1, 'title': 'Broken'})
+
+    with pytest.raises(TransferError, match='Line 2: position must be a finite number'):
+        import_board([board, record], owner_id, 'jsonl')
+    card = json.dumps({'type': 'card', 'column': 1, 'title': 'x'}).replace('}', ', "position": NaN}')
+    with pytest.raises(TransferError, match='Line 3: position must be a finite number'):
+        import_board([board, json.dumps({'type': 'column', 'id': 1, 'title': 'x'}), card], owner_id, 'jsonl')
+
+
+def test_failed_import_leaves_nothing(auth_client, app, init_database):
+    boards = Board.query.count()
+    content = b'{"type": "board", "format": 1, "title": "Broken"}\n{"type": "card", "column": 1, "title": "x"}\n'
+
+    response = auth_client.post('/boards/import', data={'file': (io.BytesIO(content), 'board.jsonl')},
+                                content_type='multipart/form-data', follow_redirects=True)
+
+    assert b'Import failed' in response.data
+    assert Board.query.count() == boards
+
+
+def test_cli_round_trip(runner, app, init_database, tmp_path):
+    board = Board.query.filter_by(title='Test Board').first()
+    path = tmp_path / 'board.jsonl'
+
+    result = runner.invoke(args=['export-board', str(board.id), '--output', str(path)])
+    assert result.exit_code == 0, result.output
+
+    result = runner.invoke(args=['import-board', str(path), '--owner', 'other@example.com', '--title', 'Copy'])
+    assert result.exit_code == 0, result.output
+    assert 'with 2 cards' in result.output
+    copy = Board.query.filter_by(title='Copy').first()
+    assert copy.owner.email == 'other@example.com'
+    assert board_contents(copy.id) == board_contents(board.id)
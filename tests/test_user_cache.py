@@ -0,0 +1,124 @@
+import time
+
+from flask import g
+
+from app import db
+from app.models import User, Card, Column, load_user
+from app.user_cache import UserCache, get_user_cache
+
+
+def test_cached_user_loads_without_query(app, init_database, count_queries):
+    user_id = User.query.filter_by(email='test@example.com').first().id
+    load_user(str(user_id))
+    db.session.expunge_all()
+
+    with count_queries() as queries:
+        user = load_user(str(user_id))
+        assert user.username == 'testuser'
+        assert user.dark_mode is False
+
+    assert queries.count == 0
+    assert user in db.session
+
+
+def test_password_hash_is_not_cached(app, init_database, count_queries):
+    user_id = User.query.filter_by(email='test@example.com').first().id
+    load_user(str(user_id))
+    db.session.expunge_all()
+
+    user = load_user(str(user_id))
+    with count_queries() as queries:
+        assert user.check_password('password')
+    assert queries.count == 1
+
+
+def test_expired_entry_is_reloaded(app, init_database, count_queries):
+    cache = UserCache(ttl=0.001, max_entries=10)
+    user_id = User.query.filter_by(email='test@example.com').first().id
+    cache.load(User, user_id)
+    db.session.expunge_all()
+    time.sleep(0.01)
+
+    with count_queries() as queries:
+        cache.load(User, user_id)
+    assert queries.count == 1
+
+
+def test_cache_is_bounded(app, init_database):
+    cache = UserCache(ttl=60, max_entries=1)
+    first, second = User.query.order_by(User.id).all()
+    cache.load(User, first.id)
+    cache.load(User, second.id)
+    assert first.id not in cache
+    assert second.id in cache
+
+
+def test_zero_ttl_disables_cache(app, init_database):
+    cache = UserCache(ttl=0, max_entries=10)
+    user = User.query.filter_by(email='test@example.com').first()
+    assert cache.load(User, user.id) is user
+    assert user.id not in cache
+
+
+def test_settings_change_invalidates_cache(auth_client, app, init_database):
+    user = User.query.filter_by(email='test@example.com').first()
+    load_user(str(user.id))
+    assert user.id in get_user_cache()
+
+    auth_client.post('/settings', data={'dark_mode': 'y'})
+
+    assert user.id not in get_user_cache()
+    db.session.expunge_all()
+    assert load_user(str(user.id)).dark_mode is True
+
+
+def test_card_move_does_not_query_user(auth_client, app, init_database, count_queries):
+    user = User.query.filter_by(email='test@example.com').first()
+    card = Card.query.filter_by(title='Test Card 1').first()
+    column = Column.query.filter_by(title='In Progress').first()
+    load_user(str(user.id))
+    db.session.expunge_all()
+    # Make Flask-Login call the user loader again, as it would in a new request
+    g.pop('_login_user', None)
+
+    with count_queries() as queries:
+        response = auth_client.post(f'/card/{card.id}/move', json={'columnId': column.id, 'position': 0})
+
+    assert response.status_code == 200
+    assert not any('FROM user' in statement for statement in queries.statements)
+
+
+def test_commit_invalidates_other_workers(app, init_database, tmp_path, count_queries):
+    # Two workers sharing a stamp directory, with the user cached in both
+    other = UserCache(ttl=60, max_entries=10, directory=str(tmp_path))
+    app.extensions['user_cache'] = UserCache(ttl=60, max_entries=10, directory=str(tmp_path))
+    user_id = User.query.filter_by(email='test@example.com').first().id
+    other.load(User, user_id)
+    db.session.expunge_all()
+    with count_queries() as queries:
+        other.load(User, user_id)
+    assert queries.count == 0
+
+    user = db.session.get(User, user_id)
+    user.dark_mode = True
+    db.session.flush()
+    db.session.expunge_all()
+    # Not until the change is committed
+    with count_queries() as queries:
+        assert other.load(User, user_id).dark_mode is False
+    assert queries.count == 0
+    db.session.rollback()
+
+    user = db.session.get(User, user_id)
+    user.dark_mode = True
+    db.session.commit()
+    db.session.expunge_all()
+
+    with count_queries() as queries:
+        assert other.load(User, user_id).dark_mode is True
+    assert queries.count == 1
+    # The reloaded copy is cached again
+    db.session.expunge_all()
+    with count_queries() as queries:
+        other.load(User, user_id)
+    assert queries.count == 0